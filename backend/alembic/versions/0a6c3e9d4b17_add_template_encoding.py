@@ -0,0 +1,25 @@
+"""add_template_encoding
+
+Revision ID: 0a6c3e9d4b17
+Revises: f5d29b8c0a13
+Create Date: 2026-10-18 17:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0a6c3e9d4b17'
+down_revision = 'f5d29b8c0a13'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Для существующих шаблонов кодировка остается пустой и подбирается при чтении
+    op.add_column('templates', sa.Column('encoding', sa.String(length=32), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('templates', 'encoding')
@@ -0,0 +1,25 @@
+"""add_template_file_size
+
+Revision ID: 1b7e4d2a8c95
+Revises: 0a6c3e9d4b17
+Create Date: 2026-10-18 18:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '1b7e4d2a8c95'
+down_revision = '0a6c3e9d4b17'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Размер существующих шаблонов заполняет фоновая задача очистки хранилища
+    op.add_column('templates', sa.Column('file_size', sa.BigInteger(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('templates', 'file_size')
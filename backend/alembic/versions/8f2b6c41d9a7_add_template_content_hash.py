@@ -0,0 +1,28 @@
+"""add_template_content_hash
+
+Revision ID: 8f2b6c41d9a7
+Revises: 6337d3f516c0
+Create Date: 2026-10-18 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8f2b6c41d9a7'
+down_revision = '6337d3f516c0'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('templates', sa.Column('content_hash', sa.String(length=64), nullable=True))
+    op.create_index(op.f('ix_templates_content_hash'), 'templates', ['content_hash'], unique=False)
+    op.create_index(op.f('ix_templates_file_path'), 'templates', ['file_path'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_templates_file_path'), table_name='templates')
+    op.drop_index(op.f('ix_templates_content_hash'), table_name='templates')
+    op.drop_column('templates', 'content_hash')
@@ -0,0 +1,26 @@
+"""add_google_token_expiry
+
+Revision ID: b4e1d7a92c35
+Revises: 8f2b6c41d9a7
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b4e1d7a92c35'
+down_revision = '8f2b6c41d9a7'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('users', sa.Column('google_token_expiry', sa.DateTime(), nullable=True))
+    op.create_index(op.f('ix_users_google_token_expiry'), 'users', ['google_token_expiry'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_users_google_token_expiry'), table_name='users')
+    op.drop_column('users', 'google_token_expiry')
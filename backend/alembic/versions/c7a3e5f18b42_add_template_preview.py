@@ -0,0 +1,26 @@
+"""add_template_preview
+
+Revision ID: c7a3e5f18b42
+Revises: b4e1d7a92c35
+Create Date: 2026-10-18 13:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c7a3e5f18b42'
+down_revision = 'b4e1d7a92c35'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('templates', sa.Column('preview_text', sa.Text(), nullable=True))
+    op.add_column('templates', sa.Column('preview_hash', sa.String(length=64), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('templates', 'preview_hash')
+    op.drop_column('templates', 'preview_text')
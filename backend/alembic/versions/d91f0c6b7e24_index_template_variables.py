@@ -0,0 +1,39 @@
+"""index_template_variables
+
+Revision ID: d91f0c6b7e24
+Revises: c7a3e5f18b42
+Create Date: 2026-10-18 14:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = 'd91f0c6b7e24'
+down_revision = 'c7a3e5f18b42'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.alter_column(
+        'templates', 'variables',
+        type_=postgresql.JSONB(astext_type=sa.Text()),
+        existing_type=sa.JSON(),
+        existing_nullable=False,
+        postgresql_using='variables::jsonb',
+    )
+    op.create_index('ix_templates_variables', 'templates', ['variables'], unique=False, postgresql_using='gin')
+
+
+def downgrade() -> None:
+    op.drop_index('ix_templates_variables', table_name='templates', postgresql_using='gin')
+    op.alter_column(
+        'templates', 'variables',
+        type_=sa.JSON(),
+        existing_type=postgresql.JSONB(astext_type=sa.Text()),
+        existing_nullable=False,
+        postgresql_using='variables::json',
+    )
@@ -0,0 +1,24 @@
+"""add_templates_user_keyset_index
+
+Revision ID: e2c84a1f5d60
+Revises: d91f0c6b7e24
+Create Date: 2026-10-18 15:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e2c84a1f5d60'
+down_revision = 'd91f0c6b7e24'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_index('ix_templates_user_created_id', 'templates', ['user_id', 'created_at', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_templates_user_created_id', table_name='templates')
@@ -0,0 +1,39 @@
+"""add_template_fulltext_search
+
+Revision ID: f5d29b8c0a13
+Revises: e2c84a1f5d60
+Create Date: 2026-10-18 16:00:00.000000
+
+"""
+import os
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = 'f5d29b8c0a13'
+down_revision = 'e2c84a1f5d60'
+branch_labels = None
+depends_on = None
+
+SEARCH_TEXT_CONFIG = os.getenv("SEARCH_TEXT_CONFIG", "russian")
+SEARCH_TEXT_MAX_CHARS = int(os.getenv("SEARCH_TEXT_MAX_CHARS", "200000"))
+
+
+def upgrade() -> None:
+    op.add_column('templates', sa.Column('content_text', sa.Text(), nullable=True))
+    op.add_column('templates', sa.Column('search_vector', postgresql.TSVECTOR(), nullable=True))
+    # Векторы для уже загруженных шаблонов; текст текстовых шаблонов появится при следующем изменении
+    op.execute(
+        f"UPDATE templates SET search_vector = to_tsvector('{SEARCH_TEXT_CONFIG}'::regconfig, "
+        f"left(concat_ws(E'\\n', filename, preview_text), {SEARCH_TEXT_MAX_CHARS}))"
+    )
+    op.create_index('ix_templates_search_vector', 'templates', ['search_vector'], unique=False, postgresql_using='gin')
+
+
+def downgrade() -> None:
+    op.drop_index('ix_templates_search_vector', table_name='templates', postgresql_using='gin')
+    op.drop_column('templates', 'search_vector')
+    op.drop_column('templates', 'content_text')
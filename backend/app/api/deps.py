@@ -2,18 +2,18 @@ from typing import Annotated, Optional, Union
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, OAuth2PasswordBearer, HTTPAuthorizationCredentials
 from jose import JWTError, jwt
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.core.config import settings
-from app.db.database import get_db
-from app.crud.user import get_user_by_email
+from app.db.database import get_async_db
+from app.crud.user import get_current_user_snapshot
 
 # Поддерживаем оба способа авторизации
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl=f"{settings.API_V1_STR}/auth/token")
 http_bearer = HTTPBearer()
 
 async def get_current_user(
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     token: str = Depends(oauth2_scheme),
     bearer_auth: Optional[HTTPAuthorizationCredentials] = Depends(http_bearer)
 ):
@@ -35,7 +35,20 @@ async def get_current_user(
     except JWTError:
         raise credentials_exception
         
-    user = get_user_by_email(db, email=email)
+    # Снимок пользователя берется из TTL-кэша, в базу идем только при промахе
+    user = await get_current_user_snapshot(db, email=email)
     if user is None:
         raise credentials_exception
     return user
+
+async def get_current_admin_user(current_user=Depends(get_current_user)):
+    """
+    Текущий пользователь, если он указан в ADMIN_EMAILS; иначе 403.
+    """
+    admins = {email.strip().lower() for email in settings.ADMIN_EMAILS.split(",") if email.strip()}
+    if current_user.email.lower() not in admins:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Not enough permissions",
+        )
+    return current_user
@@ -1,7 +1,9 @@
 from fastapi import APIRouter
-from app.api.v1.endpoints import auth, templates, google_auth
+from app.api.v1.endpoints import auth, templates, google_auth, metrics, jobs
 
 api_router = APIRouter()
 api_router.include_router(auth.router, prefix="/auth", tags=["auth"])
 api_router.include_router(templates.router, prefix="/templates", tags=["templates"])
 api_router.include_router(google_auth.router, prefix="/auth/google", tags=["auth"])
+api_router.include_router(jobs.router, prefix="/jobs", tags=["jobs"])
+api_router.include_router(metrics.router, prefix="/metrics", tags=["metrics"])
@@ -1,24 +1,24 @@
 from datetime import timedelta
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.core.config import settings
 from app.core.security import create_access_token
-from app.crud.user import authenticate_user, create_user, get_user_by_email
-from app.db.database import get_db
+from app.crud.user import authenticate_user_async, create_user_async, get_user_by_email_async
+from app.db.database import get_async_db
 from app.schemas.user import User, UserCreate
 
 router = APIRouter()
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
 @router.post("/register")
-async def register(user: UserCreate, db: Session = Depends(get_db)):
+async def register(user: UserCreate, db: AsyncSession = Depends(get_async_db)):
     """
     Регистрация нового пользователя
     """
     # Проверяем, существует ли пользователь
-    db_user = get_user_by_email(db, email=user.email)
+    db_user = await get_user_by_email_async(db, email=user.email)
     if db_user:
         raise HTTPException(
             status_code=400,
@@ -27,7 +27,8 @@ async def register(user: UserCreate, db: Session = Depends(get_db)):
     
     try:
         # Создаем нового пользователя
-        user = create_user(db=db, user=user)
+        # Хэширование пароля выполняется в отдельном пуле
+        user = await create_user_async(db=db, user=user)
         
         # Создаем токен доступа
         access_token = create_access_token(data={"sub": user.email})
@@ -44,11 +45,11 @@ async def register(user: UserCreate, db: Session = Depends(get_db)):
         )
 
 @router.post("/token")
-def login(
+async def login(
     form_data: OAuth2PasswordRequestForm = Depends(),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    user = authenticate_user(db, form_data.username, form_data.password)
+    user = await authenticate_user_async(db, form_data.username, form_data.password)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -1,11 +1,11 @@
+from datetime import datetime, timedelta
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 import httpx
 
 from app.api import deps
 from app.core.google_config import google_settings
-from app.crud.user import get_or_create_google_user
-from app.db.database import get_db
+from app.crud.user import get_or_create_google_user_async, invalidate_cached_user
 from app.core.security import create_access_token
 
 router = APIRouter()
@@ -31,7 +31,7 @@ async def google_login():
     return {"auth_url": auth_url}
 
 @router.post("/callback")
-async def google_callback(code_data: dict, db: Session = Depends(deps.get_db)):
+async def google_callback(code_data: dict, db: AsyncSession = Depends(deps.get_async_db)):
     """
     Обрабатывает callback от Google OAuth2
     """
@@ -79,7 +79,7 @@ async def google_callback(code_data: dict, db: Session = Depends(deps.get_db)):
             user_info = userinfo_response.json()
 
             # Создаем или получаем пользователя
-            user = get_or_create_google_user(
+            user = await get_or_create_google_user_async(
                 db=db,
                 email=user_info["email"],
                 google_id=user_info["id"]
@@ -88,7 +88,10 @@ async def google_callback(code_data: dict, db: Session = Depends(deps.get_db)):
             # Сохраняем токены
             user.google_token = token_json['access_token']
             user.google_refresh_token = token_json.get('refresh_token')
-            db.commit()
+            if 'expires_in' in token_json:
+                user.google_token_expiry = datetime.utcnow() + timedelta(seconds=int(token_json['expires_in']))
+            await db.commit()
+            invalidate_cached_user(user.email)
 
             # Создаем JWT токен
             access_token = create_access_token(data={"sub": user.email})
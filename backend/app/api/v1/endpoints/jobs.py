@@ -0,0 +1,116 @@
+import asyncio
+import time
+from typing import Any
+
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.api import deps
+from app.core.config import settings
+from app.db.database import AsyncSessionLocal
+from app.models.user import User
+from app.schemas.job import Job
+from app.services import jobs
+from app.services.output_cache import output_cache
+from app.utils.file_responses import file_download
+
+router = APIRouter()
+
+# Комментарий SSE раз в столько секунд не дает прокси закрыть простаивающее соединение
+SSE_KEEPALIVE = 15.0
+
+
+async def _get_user_job(db: AsyncSession, job_id: str, user_id: int):
+    job = await jobs.get_job(db, job_id, user_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+
+@router.get("/{job_id}", response_model=Job)
+async def read_job(
+    job_id: str,
+    db: AsyncSession = Depends(deps.get_async_db),
+    current_user: User = Depends(deps.get_current_user),
+) -> Any:
+    """
+    Состояние фоновой задачи.
+    """
+    return await _get_user_job(db, job_id, current_user.id)
+
+
+@router.get("/{job_id}/events")
+async def job_events(
+    job_id: str,
+    request: Request,
+    db: AsyncSession = Depends(deps.get_async_db),
+    current_user: User = Depends(deps.get_current_user),
+) -> Any:
+    """
+    Поток Server-Sent Events с изменениями состояния задачи.
+
+    Поток закрывается после перехода задачи в succeeded или failed.
+    """
+    await _get_user_job(db, job_id, current_user.id)
+    user_id = current_user.id
+
+    async def events():
+        last_state = None
+        last_sent = time.monotonic()
+        while not await request.is_disconnected():
+            # Отдельная короткая сессия на каждый опрос - соединение не держится между ними
+            async with AsyncSessionLocal() as session:
+                job = await jobs.get_job(session, job_id, user_id)
+            if job is None:
+                break
+
+            state = Job.model_validate(job).model_dump_json()
+            if state != last_state:
+                yield f"event: status\ndata: {state}\n\n"
+                last_state = state
+                last_sent = time.monotonic()
+            elif time.monotonic() - last_sent >= SSE_KEEPALIVE:
+                yield ": keep-alive\n\n"
+                last_sent = time.monotonic()
+
+            if job.status in jobs.TERMINAL_STATUSES:
+                break
+            await asyncio.sleep(settings.JOB_POLL_INTERVAL)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.get("/{job_id}/result")
+async def read_job_result(
+    job_id: str,
+    request: Request,
+    db: AsyncSession = Depends(deps.get_async_db),
+    current_user: User = Depends(deps.get_current_user),
+) -> Any:
+    """
+    Результат завершенной задачи: сгенерированный файл или ответ Google Docs.
+    """
+    job = await _get_user_job(db, job_id, current_user.id)
+    if job.status == "failed":
+        raise HTTPException(status_code=409, detail=f"Job failed: {job.error}")
+    if job.status != "succeeded":
+        raise HTTPException(status_code=409, detail=f"Job is {job.status}")
+
+    if job.kind != "generate":
+        return job.result
+
+    path = await output_cache.lookup(job.result["cache_key"], job.result.get("extension"))
+    if path is None:
+        raise HTTPException(status_code=410, detail="Generated document has expired, submit the job again")
+    return file_download(
+        request,
+        path,
+        filename=job.result["filename"],
+        media_type=job.result["content_type"],
+        etag=f'"{job.result["cache_key"]}"',
+    )
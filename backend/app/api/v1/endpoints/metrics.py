@@ -0,0 +1,90 @@
+from typing import Any
+
+from fastapi import APIRouter, Depends
+
+from app.api import deps
+from app.core.config import settings
+from app.core.security import password_hashing_stats
+from app.crud.user import user_cache
+from app.db.database import async_engine, engine
+from app.db.pool_stats import pool_status
+from app.services import jobs, render_pool, retention
+from app.services.google_docs import google_docs_stats
+from app.services.output_cache import output_cache
+
+# Служебная статистика доступна только администраторам
+router = APIRouter(dependencies=[Depends(deps.get_current_admin_user)])
+
+
+@router.get("/render-pool")
+def render_pool_stats() -> Any:
+    """
+    Состояние пула рендеринга: глубина очереди и время ожидания.
+    """
+    return render_pool.pool.stats()
+
+
+@router.get("/output-cache")
+async def output_cache_stats() -> Any:
+    """
+    Состояние кэша сгенерированных документов.
+    """
+    return await output_cache.stats()
+
+
+@router.get("/db-pool")
+def db_pool_stats() -> Any:
+    """
+    Состояние пулов соединений с базой данных и гистограмма ожидания.
+    """
+    return {
+        "settings": {
+            "pool_size": settings.DB_POOL_SIZE,
+            "max_overflow": settings.DB_MAX_OVERFLOW,
+            "pool_timeout": settings.DB_POOL_TIMEOUT,
+            "pool_recycle": settings.DB_POOL_RECYCLE,
+            "pool_pre_ping": settings.DB_POOL_PRE_PING,
+        },
+        "sync": pool_status(engine),
+        "async": pool_status(async_engine.sync_engine),
+    }
+
+
+@router.get("/auth-cache")
+def auth_cache_stats() -> Any:
+    """
+    Попадания и промахи кэша пользователей в get_current_user.
+    """
+    return user_cache.stats()
+
+
+@router.get("/password-hashing")
+def password_hashing_metrics() -> Any:
+    """
+    Нагрузка на пул хэширования паролей и задержки bcrypt.
+    """
+    return password_hashing_stats()
+
+
+@router.get("/google-docs")
+def google_docs_metrics() -> Any:
+    """
+    Задержки этапов создания документов Google Docs.
+    """
+    return google_docs_stats()
+
+
+@router.get("/retention")
+def retention_metrics() -> Any:
+    """
+    Результаты последнего прохода очистки хранилища.
+    """
+    return retention.retention_stats()
+
+
+@router.get("/jobs")
+def job_metrics() -> Any:
+    """
+    Состояние воркеров фоновых задач этого процесса.
+    """
+    return jobs.pool.stats()
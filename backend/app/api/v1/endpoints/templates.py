@@ -1,111 +1,210 @@
-from typing import List, Any, Dict
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File
-from fastapi.responses import FileResponse
-from sqlalchemy.orm import Session
+from typing import List, Any, Dict, Optional
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Query, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
 import os
-from datetime import datetime
-from docx import Document
+from datetime import datetime, timedelta
 import re
+from urllib.parse import quote
 from pydantic import BaseModel
 
 from app import crud
-from app.db.database import get_db
-from app.schemas.template import Template, TemplateCreate
+from app.core.config import settings
+from app.core.google_config import google_settings
+from app.schemas.job import Job as JobSchema
+from app.schemas.template import Template, TemplateCreate, TemplateSearchHit
 from app.api import deps
 from app.models.user import User
-from app.services.google_docs import GoogleDocsService
-from app.utils.document_parser import extract_text_from_docx
+from app.services.google_docs import GoogleDocsService, user_rate_limits
+from app.services.batch_generation import iter_batch_zip, parse_variable_rows, render_row
+from app.services.output_cache import cache_key, output_cache
+from app.services import generation, google_credentials, jobs, render_pool, storage
+from app.utils.document_parser import extract_docx_preview_text, extract_template_info
+from app.utils.encoding import read_text
+from app.utils.file_responses import CACHE_CONTROL, etag_matches, file_download, spooled_download
+from app.utils.pagination import decode_cursor, encode_cursor
+from app.utils.render_plan import file_content_hash, replace_variables
 
 router = APIRouter()
 
 # В начале файла добавим создание директории, если её нет
-UPLOAD_DIR = "uploads"
+UPLOAD_DIR = settings.UPLOAD_DIR
 os.makedirs(UPLOAD_DIR, exist_ok=True)
 
 class GoogleDocsRequest(BaseModel):
     variables: Dict[str, str]
 
+class GoogleDocsBulkRequest(BaseModel):
+    rows: List[Dict[str, str]]
+
 class TemplateContentUpdate(BaseModel):
     content: str
 
 @router.post("/", response_model=Template)
 async def create_template(
     *,
-    db: Session = Depends(deps.get_db),
+    db: AsyncSession = Depends(deps.get_async_db),
     file: UploadFile = File(...),
     current_user: User = Depends(deps.get_current_user),
 ) -> Any:
     """
     Загрузить новый шаблон.
     """
-    # Сохраняем файл
-    file_path = os.path.join(UPLOAD_DIR, f"{datetime.now().strftime('%Y%m%d_%H%M%S')}_{file.filename}")
-    with open(file_path, "wb") as buffer:
-        content = await file.read()
-        buffer.write(content)
+    # Сохраняем файл потоково в хранилище с адресацией по содержимому
+    # Текстовые шаблоны сразу перекодируются в UTF-8; запись прерывается при превышении квоты
+    stored = await storage.store_upload_within_quota(
+        db, current_user.id, file, normalize_text=(file.content_type or '').startswith('text/')
+    )
+    file_path = stored.file_path
     
     # Создаем запись в базе данных
     template_in = TemplateCreate(
         filename=file.filename,
         file_path=file_path,
+        content_hash=stored.content_hash,
+        file_size=stored.size,
         content_type=file.content_type,
+        encoding=stored.encoding,
         user_id=current_user.id,
         is_template=False,
         variables=[]
     )
     
-    return crud.template.create_with_variables(db=db, obj_in=template_in, file_path=file_path)
+    # Такое содержимое уже загружали - переменные известны, разбор не нужен
+    existing = await crud.template_async.get_by_content(db, content_hash=stored.content_hash, file_path=file_path)
+    if existing:
+        variables_info = {
+            "variables": list(existing.variables),
+            "is_template": existing.is_template,
+            "content_text": existing.content_text,
+        }
+        if existing.preview_hash == stored.content_hash:
+            variables_info["preview_text"] = existing.preview_text
+    else:
+        # Разбор документа (переменные и предпросмотр) выполняется в пуле процессов
+        variables_info = await render_pool.run(extract_template_info, file_path)
+
+    return await crud.template_async.create_with_variables(
+        db=db, obj_in=template_in, file_path=file_path, variables_info=variables_info
+    )
 
 @router.get("/", response_model=List[Template])
-def read_templates(
-    db: Session = Depends(get_db),
+async def read_templates(
+    response: Response,
+    db: AsyncSession = Depends(deps.get_async_db),
     skip: int = 0,
-    limit: int = 100,
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = None,
     current_user: User = Depends(deps.get_current_user),
 ) -> Any:
     """
     Получить список шаблонов пользователя.
+
+    Следующая страница запрашивается с cursor из заголовка X-Next-Cursor.
     """
-    templates = crud.template.get_by_user(db, user_id=current_user.id, skip=skip, limit=limit)
+    after = None
+    if cursor:
+        try:
+            after = decode_cursor(cursor)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+    templates = await crud.template_async.get_by_user(
+        db, user_id=current_user.id, skip=skip, limit=limit, after=after
+    )
+    if len(templates) == limit:
+        last = templates[-1]
+        response.headers["X-Next-Cursor"] = encode_cursor(last.created_at, last.id)
     return templates
 
+@router.get("/storage")
+async def read_storage_usage(
+    db: AsyncSession = Depends(deps.get_async_db),
+    current_user: User = Depends(deps.get_current_user),
+) -> Any:
+    """
+    Занятый пользователем объем хранилища и квота.
+    """
+    used = await storage.get_storage_used(db, current_user.id)
+    quota = settings.USER_STORAGE_QUOTA or None
+    return {
+        "used": used,
+        "quota": quota,
+        "remaining": max(0, quota - used) if quota else None,
+    }
+
+@router.get("/search", response_model=List[TemplateSearchHit])
+async def search_templates(
+    q: str = Query(..., min_length=1, max_length=500),
+    limit: int = Query(20, ge=1, le=100),
+    db: AsyncSession = Depends(deps.get_async_db),
+    current_user: User = Depends(deps.get_current_user),
+) -> Any:
+    """
+    Полнотекстовый поиск по содержимому шаблонов пользователя с фрагментами текста.
+    """
+    hits = await crud.template_async.search_text(db, user_id=current_user.id, query=q, limit=limit)
+    return [
+        TemplateSearchHit(**Template.model_validate(obj).model_dump(), rank=rank, snippet=snippet)
+        for obj, rank, snippet in hits
+    ]
+
+@router.get("/search/variables", response_model=List[Template])
+async def search_templates_by_variables(
+    name: List[str] = Query(..., description="Имя переменной без ##; можно передать несколько"),
+    match: str = Query("all", pattern="^(all|any)$"),
+    skip: int = 0,
+    limit: int = 100,
+    db: AsyncSession = Depends(deps.get_async_db),
+    current_user: User = Depends(deps.get_current_user),
+) -> Any:
+    """
+    Найти шаблоны пользователя, в которых используются указанные переменные.
+    """
+    return await crud.template_async.search_by_variables(
+        db, user_id=current_user.id, names=name, match_all=match == "all", skip=skip, limit=limit
+    )
+
 @router.get("/{template_id}", response_model=Template)
-def read_template(
+async def read_template(
     template_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(deps.get_async_db),
     current_user: User = Depends(deps.get_current_user)
 ):
-    template = crud.template.get(db, id=template_id)
+    template = await crud.template_async.get(db, id=template_id)
     if template is None or template.user_id != current_user.id:
         raise HTTPException(status_code=404, detail="Template not found")
     return template
 
 @router.delete("/{template_id}", response_model=Template)
-def delete_template(
+async def delete_template(
     template_id: int,
-    db: Session = Depends(deps.get_db),
+    db: AsyncSession = Depends(deps.get_async_db),
     current_user: User = Depends(deps.get_current_user),
 ) -> Any:
     """
     Удалить шаблон.
     """
-    template = crud.template.get(db, id=template_id)
+    template = await crud.template_async.get(db, id=template_id)
     if not template:
         raise HTTPException(status_code=404, detail="Template not found")
     if template.user_id != current_user.id:
         raise HTTPException(status_code=403, detail="Not enough permissions")
-    return crud.template.remove(db=db, id=template_id)
+    return await crud.template_async.remove(db=db, id=template_id)
 
 @router.get("/{template_id}/download")
-def download_template(
+async def download_template(
     template_id: int,
-    db: Session = Depends(deps.get_db),
+    request: Request,
+    db: AsyncSession = Depends(deps.get_async_db),
     current_user: User = Depends(deps.get_current_user),
 ) -> Any:
     """
     Скачать шаблон.
     """
-    template = crud.template.get(db, id=template_id)
+    template = await crud.template_async.get(db, id=template_id)
     if not template:
         raise HTTPException(status_code=404, detail="Template not found")
     if template.user_id != current_user.id:
@@ -114,24 +213,35 @@ def download_template(
     if not os.path.exists(template.file_path):
         raise HTTPException(status_code=404, detail="File not found")
     
-    return FileResponse(
+    # Объекты хранилища неизменяемы, поэтому хэш содержимого - сильный ETag
+    content_hash = template.content_hash or await run_in_threadpool(file_content_hash, template.file_path)
+    return file_download(
+        request,
         template.file_path,
         filename=template.filename,
-        media_type=template.content_type
+        media_type=template.content_type,
+        etag=f'"{content_hash}"',
     )
 
 @router.post("/{template_id}/generate")
 async def generate_document(
     template_id: int,
     variables: Dict[str, str],
-    db: Session = Depends(deps.get_db),
+    request: Request,
+    persist: bool = Query(False, description="Сохранить результат в кэш на диске для повторных скачиваний"),
+    background: bool = Query(False, description="Поставить генерацию в очередь и сразу вернуть задачу"),
+    db: AsyncSession = Depends(deps.get_async_db),
     current_user: User = Depends(deps.get_current_user),
 ) -> Any:
     """
     Сгенерировать заполненный документ из шаблона.
+
+    По умолчанию документ рендерится в память и сразу отдается клиенту;
+    с persist=true он сохраняется в кэше сгенерированных документов.
+    С background=true ответ 202 содержит задачу, результат - в /jobs/{id}/result.
     """
     try:
-        template = crud.template.get(db, id=template_id)
+        template = await crud.template_async.get(db, id=template_id)
         if not template:
             raise HTTPException(status_code=404, detail="Template not found")
         if template.user_id != current_user.id:
@@ -143,106 +253,82 @@ async def generate_document(
             print(error_msg)
             raise HTTPException(status_code=404, detail=error_msg)
         
-        # Создаем директорию для выходных файлов, если она не существует
-        output_dir = "uploads/generated"
-        os.makedirs(output_dir, exist_ok=True)
         output_filename = f"{datetime.now().strftime('%Y%m%d_%H%M%S')}_{template.filename}"
-        output_path = os.path.join(output_dir, output_filename)
+        values = generation.template_values(template, variables)
         
-        # Обработка в зависимости от типа файла
-        if template.file_path.endswith('.docx'):
-            try:
-                # Создаем копию файла
-                import shutil
-                shutil.copy2(template.file_path, output_path)
-                
-                # Открываем копию для редактирования
-                doc = Document(output_path)
-                
-                # Заменяем все переменные на значения в параграфах
-                for paragraph in doc.paragraphs:
-                    original_text = paragraph.text
-                    modified_text = original_text
-                    
-                    # Ищем все переменные и заменяем их
-                    for var_name in template.variables:
-                        placeholder = f"##{var_name}##"
-                        if placeholder in modified_text:
-                            modified_text = modified_text.replace(
-                                placeholder, 
-                                variables.get(var_name, "")
-                            )
-                    
-                    # Если текст изменился, обновляем параграф
-                    if modified_text != original_text:
-                        # Очищаем все runs в параграфе и добавляем новый
-                        for i in range(len(paragraph.runs)):
-                            paragraph.runs[0].text = ""
-                        
-                        paragraph.add_run(modified_text)
-                
-                # Заменяем переменные в таблицах
-                for table in doc.tables:
-                    for row in table.rows:
-                        for cell in row.cells:
-                            for paragraph in cell.paragraphs:
-                                original_text = paragraph.text
-                                modified_text = original_text
-                                
-                                # Ищем все переменные и заменяем их
-                                for var_name in template.variables:
-                                    placeholder = f"##{var_name}##"
-                                    if placeholder in modified_text:
-                                        modified_text = modified_text.replace(
-                                            placeholder, 
-                                            variables.get(var_name, "")
-                                        )
-                                
-                                # Если текст изменился, обновляем параграф
-                                if modified_text != original_text:
-                                    # Очищаем все runs в параграфе и добавляем новый
-                                    for i in range(len(paragraph.runs)):
-                                        paragraph.runs[0].text = ""
-                                    
-                                    paragraph.add_run(modified_text)
-                
-                # Сохраняем результат
-                doc.save(output_path)
-                
-                return FileResponse(
-                    output_path,
-                    filename=output_filename,
-                    media_type=template.content_type
-                )
-            except Exception as e:
-                error_msg = f"Error processing docx: {str(e)}"
-                print(error_msg)
-                raise HTTPException(status_code=500, detail=error_msg)
-        else:
-            # Для текстовых файлов
-            try:
-                # Читаем содержимое
-                with open(template.file_path, 'r', encoding='utf-8') as f:
-                    content = f.read()
-                
-                # Заменяем переменные
-                for var_name in template.variables:
-                    placeholder = f"##{var_name}##"
-                    content = content.replace(placeholder, variables.get(var_name, ""))
-                
-                # Сохраняем результат
-                with open(output_path, 'w', encoding='utf-8') as f:
-                    f.write(content)
-                
-                return FileResponse(
-                    output_path,
-                    filename=output_filename,
-                    media_type=template.content_type
-                )
-            except Exception as e:
-                error_msg = f"Error processing text file: {str(e)}"
-                print(error_msg)
-                raise HTTPException(status_code=500, detail=error_msg)
+        if background:
+            job = await jobs.enqueue(
+                db, user_id=current_user.id, kind="generate", template_id=template.id,
+                payload={"variables": values, "filename": output_filename},
+            )
+            return _job_accepted(job)
+        
+        # Одинаковый шаблон и одинаковые значения дают одинаковый файл,
+        # поэтому ключ кэша служит и ETag
+        content_hash = await generation.template_content_hash(template)
+        key = cache_key(content_hash, values)
+        etag = f'"{key}"'
+        if etag_matches(request, etag):
+            return Response(status_code=304, headers={"ETag": etag, "Cache-Control": CACHE_CONTROL})
+        
+        # Уже сохраненный результат отдаем с диска, остальные - из памяти
+        cached_path = None if persist else await output_cache.lookup(key)
+        if not persist and cached_path is None:
+            result = await generation.render_in_memory(template, values, content_hash)
+            return spooled_download(result, output_filename, template.content_type, etag)
+        
+        output_path = cached_path or (await generation.render_to_cache(template, values, content_hash))[1]
+        
+        return file_download(
+            request,
+            output_path,
+            filename=output_filename,
+            media_type=template.content_type,
+            etag=etag,
+        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        error_msg = f"Failed to generate document: {str(e)}"
+        print(error_msg)
+        raise HTTPException(status_code=500, detail=error_msg)
+
+@router.post("/{template_id}/generate/batch")
+async def generate_documents_batch(
+    template_id: int,
+    request: Request,
+    db: AsyncSession = Depends(deps.get_async_db),
+    current_user: User = Depends(deps.get_current_user),
+) -> Any:
+    """
+    Сгенерировать пакет документов из одного шаблона.
+
+    Тело запроса - CSV с заголовком (Content-Type: text/csv) или JSONL,
+    по одной строке переменных на документ. Ответ - ZIP-архив, который
+    отдается по мере рендеринга.
+    """
+    template = await crud.template_async.get(db, id=template_id)
+    if not template:
+        raise HTTPException(status_code=404, detail="Template not found")
+    if template.user_id != current_user.id:
+        raise HTTPException(status_code=403, detail="Not enough permissions")
+    if not os.path.exists(template.file_path):
+        raise HTTPException(status_code=404, detail=f"Template file not found: {template.file_path}")
+
+    try:
+        rows = parse_variable_rows(await request.body(), request.headers.get("content-type", ""))
+    except (ValueError, UnicodeDecodeError) as e:
+        raise HTTPException(status_code=400, detail=f"Invalid batch body: {str(e)}")
+    if not rows:
+        raise HTTPException(status_code=400, detail="Batch body contains no rows")
+
+    variables = list(template.variables)
+    try:
+        # Первая строка рендерится до начала ответа: ошибки шаблона и 503 приходят статусом
+        first_document = await render_row(
+            template.file_path, variables, rows[0],
+            content_hash=template.content_hash, encoding=template.encoding,
+        )
     except HTTPException:
         raise
     except Exception as e:
@@ -250,16 +336,34 @@ async def generate_document(
         print(error_msg)
         raise HTTPException(status_code=500, detail=error_msg)
 
+    archive_name = f"{os.path.splitext(template.filename)[0]}_batch.zip"
+    return StreamingResponse(
+        iter_batch_zip(
+            template.file_path, template.filename, variables, rows, first_document,
+            content_hash=template.content_hash, encoding=template.encoding,
+        ),
+        media_type="application/zip",
+        headers={"Content-Disposition": f"attachment; filename*=utf-8''{quote(archive_name)}"},
+    )
+
+def _job_accepted(job) -> JSONResponse:
+    return JSONResponse(
+        status_code=202,
+        content=jsonable_encoder(JobSchema.model_validate(job)),
+        headers={"Location": f"{settings.API_V1_STR}/jobs/{job.id}"},
+    )
+
 @router.post("/{template_id}/google-docs")
 async def create_google_doc(
     template_id: int,
     variables: Dict[str, str],
-    db: Session = Depends(deps.get_db),
+    background: bool = Query(False, description="Поставить создание документа в очередь и сразу вернуть задачу"),
+    db: AsyncSession = Depends(deps.get_async_db),
     current_user: User = Depends(deps.get_current_user)
 ):
     try:
         # Получаем шаблон
-        template = crud.template.get(db, id=template_id)
+        template = await crud.template_async.get(db, id=template_id)
         if not template:
             raise HTTPException(status_code=404, detail="Template not found")
         if template.user_id != current_user.id:
@@ -272,48 +376,16 @@ async def create_google_doc(
                 detail="Google authentication required"
             )
 
-        # Читаем содержимое файла шаблона
-        content = None
-        if template.file_path.endswith('.docx'):
-            content = extract_text_from_docx(template.file_path)
-        else:
-            try:
-                # Пробуем разные кодировки
-                encodings = ['utf-8', 'cp1251', 'latin-1']
-                
-                for encoding in encodings:
-                    try:
-                        with open(template.file_path, 'r', encoding=encoding) as f:
-                            content = f.read()
-                        break  # Если успешно прочитано, выходим из цикла
-                    except UnicodeDecodeError:
-                        continue
-                    
-                if content is None:
-                    # Если не удалось прочитать ни с одной кодировкой, читаем в бинарном режиме
-                    with open(template.file_path, 'rb') as f:
-                        content = f.read().decode('utf-8', errors='replace')
-            except Exception as e:
-                raise HTTPException(status_code=500, detail=f"Error reading file: {str(e)}")
-
-        # Заменяем переменные в контенте
-        for key, value in variables.items():
-            content = content.replace(f"##{key}##", value)
-
-        # Создаем Google Doc
-        google_service = GoogleDocsService(
-            access_token=current_user.google_token,
-            refresh_token=current_user.google_refresh_token
-        )
-        result = await google_service.create_document(
-            title=f"{template.filename} - {datetime.now().strftime('%Y-%m-%d %H:%M')}",
-            content=content
-        )
-
-        # Логируем результат
-        print("Created document:", result)
+        if background:
+            job = await jobs.enqueue(
+                db, user_id=current_user.id, kind="google_doc", template_id=template.id,
+                payload={"variables": variables},
+            )
+            return _job_accepted(job)
 
-        return result
+        return await generation.create_google_doc(current_user, template, variables)
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"Error in create_google_doc: {str(e)}")
         raise HTTPException(
@@ -321,17 +393,79 @@ async def create_google_doc(
             detail=f"Failed to create Google Doc: {str(e)}"
         )
 
+@router.post("/{template_id}/google-docs/bulk")
+async def create_google_docs_bulk(
+    template_id: int,
+    request: GoogleDocsBulkRequest,
+    db: AsyncSession = Depends(deps.get_async_db),
+    current_user: User = Depends(deps.get_current_user)
+):
+    """
+    Создает по документу Google Docs на каждый набор переменных.
+    """
+    template = await crud.template_async.get(db, id=template_id)
+    if not template:
+        raise HTTPException(status_code=404, detail="Template not found")
+    if template.user_id != current_user.id:
+        raise HTTPException(status_code=403, detail="Not enough permissions")
+    if not current_user.google_token:
+        raise HTTPException(status_code=401, detail="Google authentication required")
+    if not request.rows:
+        raise HTTPException(status_code=400, detail="No documents to create")
+    if len(request.rows) > google_settings.GOOGLE_EXPORT_MAX_DOCUMENTS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Too many documents: {len(request.rows)} > {google_settings.GOOGLE_EXPORT_MAX_DOCUMENTS}"
+        )
+
+    content = await generation.read_template_text(template)
+    created_at = datetime.now().strftime('%Y-%m-%d %H:%M')
+    documents = [
+        (f"{template.filename} - {created_at} #{number}", replace_variables(content, row))
+        for number, row in enumerate(request.rows, start=1)
+    ]
+
+    # Один набор учетных данных и клиентов на всю выгрузку. Токен обновляется
+    # до начала с запасом на всю выгрузку, а параллельные запросы его не обновляют
+    google_service = GoogleDocsService(
+        credentials=await google_credentials.get_credentials(
+            current_user, timedelta(seconds=google_settings.GOOGLE_EXPORT_TOKEN_MARGIN)
+        ),
+        rate_limiter=user_rate_limits.get(current_user.id),
+        auto_refresh=False,
+    )
+    results = await google_service.create_documents(documents)
+
+    created = sum(1 for result in results if result['status'] == 'created')
+    print(f"Bulk Google Docs export: {created}/{len(results)} created from {template.filename}")
+    return {"created": created, "failed": len(results) - created, "documents": results}
+
+async def _get_docx_preview(db: AsyncSession, template) -> str:
+    """
+    Текст предпросмотра docx: из базы, если он построен по текущему содержимому.
+    """
+    content_hash = template.content_hash or await run_in_threadpool(file_content_hash, template.file_path)
+    if template.preview_text is not None and template.preview_hash == content_hash:
+        return template.preview_text
+
+    # Шаблоны, загруженные до появления предпросмотра, дополняем при первом обращении
+    preview_text = await render_pool.run(extract_docx_preview_text, template.file_path)
+    await crud.template_async.update(
+        db, db_obj=template, obj_in={"preview_text": preview_text, "preview_hash": content_hash}
+    )
+    return preview_text
+
 @router.get("/{template_id}/content")
 async def get_template_content(
     template_id: int,
-    db: Session = Depends(deps.get_db),
+    db: AsyncSession = Depends(deps.get_async_db),
     current_user: User = Depends(deps.get_current_user)
 ):
     """
     Получить содержимое шаблона.
     """
     # Проверяем существование шаблона и права доступа
-    template = crud.template.get(db, id=template_id)
+    template = await crud.template_async.get(db, id=template_id)
     if not template:
         raise HTTPException(status_code=404, detail="Template not found")
     if template.user_id != current_user.id:
@@ -354,24 +488,8 @@ async def get_template_content(
         # Извлекаем текст из документа Word
         if template.file_path.endswith('.docx'):
             try:
-                # Извлекаем полный текст из docx
-                doc = Document(template.file_path)
-                
-                # Извлекаем текст из всех параграфов, сохраняя структуру
-                full_text = ""
-                for para in doc.paragraphs:
-                    if para.text.strip():  # Если параграф не пустой
-                        full_text += para.text + "\n\n"
-                
-                # Извлекаем текст из таблиц
-                for table in doc.tables:
-                    full_text += "\n--- Table ---\n"
-                    for row in table.rows:
-                        row_text = ""
-                        for cell in row.cells:
-                            row_text += cell.text + " | "
-                        full_text += row_text[:-3] + "\n"  # Убираем последний разделитель " | "
-                    full_text += "--- End Table ---\n\n"
+                # Текст предпросмотра строится один раз и хранится в базе
+                full_text = await _get_docx_preview(db, template)
                 
                 # Добавляем информацию о переменных
                 variables = template.variables if template.variables else []
@@ -393,6 +511,8 @@ async def get_template_content(
                     content += "You can add variables like ##client_name## or ##date## anywhere in the text.\n"
                 
                 return {"content": content, "is_binary": True}
+            except HTTPException:
+                raise
             except Exception as e:
                 print(f"Error extracting text from docx: {str(e)}")
                 return {
@@ -408,22 +528,8 @@ async def get_template_content(
     
     # Для текстовых файлов читаем содержимое
     try:
-        content = None
-        # Пробуем разные кодировки
-        encodings = ['utf-8', 'cp1251', 'latin-1']
-        
-        for encoding in encodings:
-            try:
-                with open(template.file_path, 'r', encoding=encoding) as f:
-                    content = f.read()
-                break  # Если успешно прочитано, выходим из цикла
-            except UnicodeDecodeError:
-                continue
-            
-        if content is None:
-            # Если не удалось прочитать ни с одной кодировкой, обрабатываем как бинарный файл
-            return {"content": "This file cannot be read as text. It may be a binary file.", "is_binary": True}
-                
+        # Кодировка определена при загрузке - файл читается за один проход
+        content = await run_in_threadpool(read_text, template.file_path, template.encoding)
         return {"content": content, "is_binary": False}
     except Exception as e:
         error_msg = f"Error reading template content: {str(e)}"
@@ -434,14 +540,14 @@ async def get_template_content(
 async def update_template_content(
     template_id: int,
     content_update: TemplateContentUpdate,
-    db: Session = Depends(deps.get_db),
+    db: AsyncSession = Depends(deps.get_async_db),
     current_user: User = Depends(deps.get_current_user)
 ):
     """
     Обновить содержимое шаблона.
     """
     # Проверяем существование шаблона и права доступа
-    template = crud.template.get(db, id=template_id)
+    template = await crud.template_async.get(db, id=template_id)
     if not template:
         raise HTTPException(status_code=404, detail="Template not found")
     if template.user_id != current_user.id:
@@ -465,59 +571,45 @@ async def update_template_content(
             if "This is a Word document and cannot be edited directly as text" in template_content:
                 if template.file_path.endswith('.docx'):
                     try:
-                        # Извлекаем полный текст из docx
-                        doc = Document(template.file_path)
-                        
-                        # Извлекаем текст из всех параграфов, сохраняя структуру
-                        full_text = ""
-                        for para in doc.paragraphs:
-                            if para.text.strip():  # Если параграф не пустой
-                                full_text += para.text + "\n\n"
-                        
-                        # Извлекаем текст из таблиц
-                        for table in doc.tables:
-                            full_text += "\n--- Table ---\n"
-                            for row in table.rows:
-                                row_text = ""
-                                for cell in row.cells:
-                                    row_text += cell.text + " | "
-                                full_text += row_text[:-3] + "\n"  # Убираем последний разделитель " | "
-                            full_text += "--- End Table ---\n\n"
+                        full_text = await _get_docx_preview(db, template)
                         
                         # Используем этот текст как основу для нового шаблона
                         template_content = full_text
+                    except HTTPException:
+                        raise
                     except Exception as e:
                         print(f"Error extracting text from docx: {str(e)}")
                         # Если не удалось извлечь текст, оставляем содержимое как есть
             
             # Извлекаем переменные из содержимого
             variables = []
-            import re
             for match in re.finditer(r'##([^#]+)##', template_content):
                 var_name = match.group(1)
                 if var_name not in variables:
                     variables.append(var_name)
             
-            # Создаем новый файл
+            # Записываем содержимое в хранилище
             new_filename = f"{os.path.splitext(template.filename)[0]}_text.txt"
-            new_file_path = os.path.join(UPLOAD_DIR, f"{datetime.now().strftime('%Y%m%d_%H%M%S')}_{new_filename}")
-            
-            # Записываем содержимое в новый файл
-            with open(new_file_path, 'w', encoding='utf-8') as f:
-                f.write(template_content)
+            data = template_content.encode('utf-8')
+            await storage.check_quota(db, current_user.id, len(data))
+            stored = await run_in_threadpool(storage.store_bytes, data, new_filename)
             
             # Создаем запись в базе данных для нового шаблона
             template_in = {
                 "filename": new_filename,
-                "file_path": new_file_path,
+                "file_path": stored.file_path,
+                "content_hash": stored.content_hash,
+                "file_size": stored.size,
                 "content_type": "text/plain",
+                "encoding": "utf-8",
                 "user_id": current_user.id,
                 "is_template": len(variables) > 0,
-                "variables": variables
+                "variables": variables,
+                "content_text": template_content
             }
             
             # Создаем новый шаблон
-            new_template = crud.template.create(db=db, obj_in=template_in)
+            new_template = await crud.template_async.create(db=db, obj_in=template_in)
             
             # Возвращаем информацию о новом шаблоне
             return {
@@ -525,29 +617,42 @@ async def update_template_content(
                 "original_template": template,
                 "new_template": new_template
             }
+        except HTTPException:
+            raise
         except Exception as e:
             error_msg = f"Error creating new template: {str(e)}"
             print(error_msg)
             raise HTTPException(status_code=500, detail=error_msg)
     
-    # Для текстовых файлов обновляем содержимое файла
+    # Для текстовых файлов сохраняем новое содержимое отдельным объектом:
+    # старый файл может использоваться другими шаблонами
     try:
-        with open(template.file_path, 'w', encoding='utf-8') as f:
-            f.write(content_update.content)
+        data = content_update.content.encode('utf-8')
+        await storage.check_quota(db, current_user.id, len(data), released=template.file_size or 0)
+        stored = await run_in_threadpool(storage.store_bytes, data, template.filename)
         
         # Извлекаем переменные из содержимого
         variables = []
-        import re
         for match in re.finditer(r'##([^#]+)##', content_update.content):
             var_name = match.group(1)
             if var_name not in variables:
                 variables.append(var_name)
         
         # Обновляем запись в базе данных
-        template_data = {"variables": variables, "is_template": len(variables) > 0}
-        updated_template = crud.template.update(db, db_obj=template, obj_in=template_data)
+        template_data = {
+            "file_path": stored.file_path,
+            "content_hash": stored.content_hash,
+            "file_size": stored.size,
+            "encoding": "utf-8",
+            "variables": variables,
+            "is_template": len(variables) > 0,
+            "content_text": content_update.content,
+        }
+        updated_template = await crud.template_async.update(db, db_obj=template, obj_in=template_data)
         
         return updated_template
+    except HTTPException:
+        raise
     except Exception as e:
         error_msg = f"Error updating template content: {str(e)}"
         print(error_msg)
@@ -11,15 +11,79 @@ class Settings(BaseSettings):
     API_V1_STR: str = "/api/v1"
     SECRET_KEY: str = os.getenv("SECRET_KEY")
     ACCESS_TOKEN_EXPIRE_MINUTES: int = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "11520"))
+    BCRYPT_ROUNDS: int = int(os.getenv("BCRYPT_ROUNDS", "12"))
+    PASSWORD_HASH_WORKERS: int = int(os.getenv("PASSWORD_HASH_WORKERS", "2"))
+    USER_CACHE_SIZE: int = int(os.getenv("USER_CACHE_SIZE", "10000"))
+    USER_CACHE_TTL: int = int(os.getenv("USER_CACHE_TTL", "60"))
+    # Email администраторов через запятую: им доступны служебные эндпоинты (/metrics)
+    ADMIN_EMAILS: str = os.getenv("ADMIN_EMAILS", "")
     
     # Database
     DATABASE_URL: str = os.getenv("DATABASE_URL")
+    DB_POOL_SIZE: int = int(os.getenv("DB_POOL_SIZE", "5"))
+    DB_MAX_OVERFLOW: int = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+    DB_POOL_TIMEOUT: int = int(os.getenv("DB_POOL_TIMEOUT", "30"))
+    DB_POOL_RECYCLE: int = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+    DB_POOL_PRE_PING: bool = os.getenv("DB_POOL_PRE_PING", "true").lower() == "true"
 
     # Google OAuth2
     GOOGLE_CLIENT_ID: str = os.getenv("GOOGLE_CLIENT_ID")
     GOOGLE_CLIENT_SECRET: str = os.getenv("GOOGLE_CLIENT_SECRET")
     GOOGLE_REDIRECT_URI: str = os.getenv("GOOGLE_REDIRECT_URI")
 
+    # Загрузка файлов
+    UPLOAD_DIR: str = os.getenv("UPLOAD_DIR", "uploads")
+    MAX_UPLOAD_SIZE: int = int(os.getenv("MAX_UPLOAD_SIZE", str(50 * 1024 * 1024)))
+    UPLOAD_CHUNK_SIZE: int = int(os.getenv("UPLOAD_CHUNK_SIZE", str(1024 * 1024)))
+    # Внутренняя location nginx для X-Accel-Redirect (например, /protected-uploads/);
+    # пусто - файлы отдает само приложение
+    X_ACCEL_REDIRECT_PREFIX: str = os.getenv("X_ACCEL_REDIRECT_PREFIX", "")
+
+    # Генерация документов
+    RENDER_PLAN_CACHE_SIZE: int = int(os.getenv("RENDER_PLAN_CACHE_SIZE", "64"))
+    # Байты шаблонов держатся в памяти процесса рендеринга; крупные файлы читаются с диска
+    TEMPLATE_BUFFER_CACHE_SIZE: int = int(os.getenv("TEMPLATE_BUFFER_CACHE_SIZE", "32"))
+    TEMPLATE_BUFFER_MAX_BYTES: int = int(os.getenv("TEMPLATE_BUFFER_MAX_BYTES", str(5 * 1024 * 1024)))
+    # Результат генерации больше этого порога сбрасывается во временный файл
+    GENERATE_SPOOL_MAX_SIZE: int = int(os.getenv("GENERATE_SPOOL_MAX_SIZE", str(8 * 1024 * 1024)))
+    RENDER_WORKERS: int = int(os.getenv("RENDER_WORKERS", str(os.cpu_count() or 1)))
+    RENDER_QUEUE_SIZE: int = int(os.getenv("RENDER_QUEUE_SIZE", "32"))
+    BATCH_MAX_ROWS: int = int(os.getenv("BATCH_MAX_ROWS", "1000"))
+    OUTPUT_CACHE_MAX_BYTES: int = int(os.getenv("OUTPUT_CACHE_MAX_BYTES", str(1024 * 1024 * 1024)))
+    # Сгенерированные документы, к которым не обращались дольше TTL, удаляются; 0 - без TTL
+    OUTPUT_CACHE_TTL: int = int(os.getenv("OUTPUT_CACHE_TTL", str(7 * 24 * 3600)))
+
+    # Хранилище: квота на пользователя (0 - без ограничения) и фоновая очистка
+    USER_STORAGE_QUOTA: int = int(os.getenv("USER_STORAGE_QUOTA", str(1024 * 1024 * 1024)))
+    RETENTION_INTERVAL: int = int(os.getenv("RETENTION_INTERVAL", "3600"))
+    # Файлы без ссылок в базе удаляются, только если они старше этого срока
+    ORPHAN_GRACE_PERIOD: int = int(os.getenv("ORPHAN_GRACE_PERIOD", "3600"))
+
+    # Фоновые задачи генерации (таблица jobs в PostgreSQL)
+    JOB_WORKERS: int = int(os.getenv("JOB_WORKERS", "2"))
+    JOB_POLL_INTERVAL: float = float(os.getenv("JOB_POLL_INTERVAL", "1.0"))
+    # Срок аренды задачи воркером; продлевается, пока задача выполняется
+    JOB_VISIBILITY_TIMEOUT: int = int(os.getenv("JOB_VISIBILITY_TIMEOUT", "300"))
+    JOB_MAX_ATTEMPTS: int = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+    JOB_RETRY_BACKOFF_BASE: float = float(os.getenv("JOB_RETRY_BACKOFF_BASE", "2.0"))
+    JOB_RETRY_BACKOFF_MAX: float = float(os.getenv("JOB_RETRY_BACKOFF_MAX", "300.0"))
+    # Сколько ждать завершения текущих задач при остановке
+    JOB_DRAIN_TIMEOUT: int = int(os.getenv("JOB_DRAIN_TIMEOUT", "30"))
+    # Завершенные задачи хранятся столько секунд, затем их удаляет очистка хранилища
+    JOB_RESULT_TTL: int = int(os.getenv("JOB_RESULT_TTL", str(7 * 24 * 3600)))
+
+    # Полнотекстовый поиск
+    SEARCH_TEXT_CONFIG: str = os.getenv("SEARCH_TEXT_CONFIG", "russian")
+    SEARCH_TEXT_MAX_CHARS: int = int(os.getenv("SEARCH_TEXT_MAX_CHARS", "200000"))
+
+    @field_validator("SEARCH_TEXT_CONFIG")
+    @classmethod
+    def validate_search_config(cls, v: str) -> str:
+        # Имя конфигурации подставляется в SQL как ::regconfig
+        if not v.replace("_", "").isalnum():
+            raise ValueError("SEARCH_TEXT_CONFIG must be a text search configuration name")
+        return v
+
     @field_validator("SECRET_KEY", "DATABASE_URL", "GOOGLE_CLIENT_ID", "GOOGLE_CLIENT_SECRET")
     @classmethod
     def validate_required(cls, v: str, info) -> str:
@@ -13,6 +13,26 @@ class GoogleSettings(BaseSettings):
         "https://www.googleapis.com/auth/documents",
         "https://www.googleapis.com/auth/drive.file"
     ]
+    # Пул потоков для блокирующих вызовов Google API
+    GOOGLE_API_WORKERS: int = 8
+    GOOGLE_API_TIMEOUT: int = 30
+    # Каталог с discovery-документами; по умолчанию - копии из googleapiclient
+    GOOGLE_DISCOVERY_DIR: str = ""
+    # Квота на пользователя и повторы при 429/5xx
+    GOOGLE_USER_RATE: float = 5.0
+    GOOGLE_USER_BURST: int = 10
+    GOOGLE_MAX_RETRIES: int = 5
+    GOOGLE_BACKOFF_BASE: float = 0.5
+    GOOGLE_BACKOFF_MAX: float = 32.0
+    # Обновляем токен заранее, если до истечения осталось меньше margin секунд
+    GOOGLE_TOKEN_REFRESH_MARGIN: int = 300
+    # Период фонового обновления токенов; 0 - отключить
+    GOOGLE_TOKEN_REFRESH_INTERVAL: int = 60
+    # Массовый экспорт
+    GOOGLE_EXPORT_CONCURRENCY: int = 4
+    GOOGLE_EXPORT_MAX_DOCUMENTS: int = 200
+    # Токен для массового экспорта обновляется заранее, если истечет раньше, чем через столько секунд
+    GOOGLE_EXPORT_TOKEN_MARGIN: int = 1800
 
     class Config:
         env_file = ".env"
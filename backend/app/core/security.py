@@ -1,11 +1,35 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import Any, Callable, Dict, Optional, Tuple
 from jose import jwt
 from passlib.context import CryptContext
 
 from app.core.config import settings
+from app.utils.histogram import LatencyHistogram
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# min_rounds = max_rounds = BCRYPT_ROUNDS: хэш с любой другой стоимостью
+# считается устаревшим и пересчитывается при следующем входе
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__default_rounds=settings.BCRYPT_ROUNDS,
+    bcrypt__min_rounds=settings.BCRYPT_ROUNDS,
+    bcrypt__max_rounds=settings.BCRYPT_ROUNDS,
+)
+
+# bcrypt отпускает GIL, поэтому хватает потоков; их число ограничивает
+# одновременные хэширования и не дает всплеску регистраций занять все ядра
+_hash_executor = ThreadPoolExecutor(
+    max_workers=settings.PASSWORD_HASH_WORKERS, thread_name_prefix="password-hash"
+)
+_hash_metrics: Dict[str, Any] = {
+    "in_flight": 0,
+    "wait": LatencyHistogram(),
+    "hash": LatencyHistogram(),
+    "verify": LatencyHistogram(),
+}
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     return pwd_context.verify(plain_password, hashed_password)
@@ -13,6 +37,47 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
 def get_password_hash(password: str) -> str:
     return pwd_context.hash(password)
 
+async def _run_hashing(operation: str, fn: Callable, *args: Any) -> Any:
+    submitted = time.perf_counter()
+
+    def timed():
+        started = time.perf_counter()
+        _hash_metrics["wait"].observe(started - submitted)
+        try:
+            return fn(*args)
+        finally:
+            _hash_metrics[operation].observe(time.perf_counter() - started)
+
+    _hash_metrics["in_flight"] += 1
+    try:
+        return await asyncio.get_running_loop().run_in_executor(_hash_executor, timed)
+    finally:
+        _hash_metrics["in_flight"] -= 1
+
+async def get_password_hash_async(password: str) -> str:
+    """
+    Хэширует пароль в выделенном пуле, не блокируя event loop.
+    """
+    return await _run_hashing("hash", pwd_context.hash, password)
+
+async def verify_and_update_password_async(
+    plain_password: str, hashed_password: str
+) -> Tuple[bool, Optional[str]]:
+    """
+    Проверяет пароль; если стоимость хэша устарела, возвращает новый хэш.
+    """
+    return await _run_hashing("verify", pwd_context.verify_and_update, plain_password, hashed_password)
+
+def password_hashing_stats() -> Dict[str, Any]:
+    return {
+        "rounds": settings.BCRYPT_ROUNDS,
+        "max_concurrency": settings.PASSWORD_HASH_WORKERS,
+        "in_flight": _hash_metrics["in_flight"],
+        "queue_wait": _hash_metrics["wait"].snapshot(),
+        "hash_latency": _hash_metrics["hash"].snapshot(),
+        "verify_latency": _hash_metrics["verify"].snapshot(),
+    }
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
     to_encode = data.copy()
     if expires_delta:
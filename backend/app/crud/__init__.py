@@ -1,3 +1,3 @@
-from app.crud.base import CRUDBase
+from app.crud.base import AsyncCRUDBase, CRUDBase
 from app.crud.user import authenticate_user, create_user, get_user_by_email
-from app.crud.template import template 
\ No newline at end of file
+from app.crud.template import template_async 
\ No newline at end of file
@@ -1,95 +1,195 @@
-from sqlalchemy.orm import Session
-from fastapi import UploadFile
-import os
 from datetime import datetime
-from typing import List, Optional
-from app.crud.base import CRUDBase
+from sqlalchemy import func, literal, select, tuple_, type_coerce
+from sqlalchemy.dialects.postgresql import JSONB, array
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import load_only
+from typing import Any, Dict, List, Optional, Tuple
+from app.core.config import settings
+from app.crud.base import AsyncCRUDBase
+from app.db.fulltext import search_document, to_tsquery, ts_config
 
 from app.models.template import Template
 from app.schemas.template import TemplateCreate, TemplateUpdate
-from app.utils.document_parser import extract_variables
-
-def get_template(db: Session, template_id: int):
-    return db.query(Template).filter(Template.id == template_id).first()
-
-async def create_template(db: Session, file: UploadFile, user_id: int) -> Template:
-    # Создаем директорию для файлов, если её нет
-    upload_dir = "uploads"
-    if not os.path.exists(upload_dir):
-        os.makedirs(upload_dir)
-    
-    # Генерируем уникальное имя файла
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    file_path = f"{upload_dir}/{timestamp}_{file.filename}"
-    
-    # Сохраняем файл
-    with open(file_path, "wb") as buffer:
-        content = await file.read()
-        buffer.write(content)
-    
-    # Создаем запись в БД
-    db_template = Template(
-        filename=file.filename,
-        file_path=file_path,
-        content_type=file.content_type,
-        user_id=user_id
-    )
-    db.add(db_template)
-    db.commit()
-    db.refresh(db_template)
-    return db_template
-
-def get_templates(db: Session, user_id: int, skip: int = 0, limit: int = 100):
-    return db.query(Template)\
-        .filter(Template.user_id == user_id)\
-        .offset(skip)\
-        .limit(limit)\
-        .all()
-
-def delete_template(db: Session, template_id: int):
-    template = get_template(db, template_id)
-    if template and os.path.exists(template.file_path):
-        os.remove(template.file_path)
-    db.delete(template)
-    db.commit()
-    return template
-
-class CRUDTemplate(CRUDBase[Template, TemplateCreate, TemplateUpdate]):
-    def create_with_variables(self, db: Session, *, obj_in: TemplateCreate, file_path: str) -> Template:
-        # Извлекаем переменные из документа
-        variables_info = extract_variables(file_path)
-        
-        # Создаем объект с информацией о переменных
+from app.utils.document_parser import extract_template_info
+from app.services import render_pool
+
+# Колонки для списка шаблонов: без текста предпросмотра
+LIST_COLUMNS = (
+    Template.id,
+    Template.filename,
+    Template.file_path,
+    Template.content_hash,
+    Template.file_size,
+    Template.content_type,
+    Template.encoding,
+    Template.created_at,
+    Template.user_id,
+    Template.is_template,
+    Template.variables,
+)
+
+SNIPPET_OPTIONS = "StartSel=<b>, StopSel=</b>, MaxWords=25, MinWords=10, MaxFragments=2"
+
+class AsyncCRUDTemplate(AsyncCRUDBase[Template, TemplateCreate, TemplateUpdate]):
+    async def create_with_variables(
+        self,
+        db: AsyncSession,
+        *,
+        obj_in: TemplateCreate,
+        file_path: str,
+        variables_info: Optional[Dict[str, Any]] = None,
+    ) -> Template:
+        # Разбираем документ в пуле процессов, если результат не передали уже готовым
+        if variables_info is None:
+            variables_info = await render_pool.run(extract_template_info, file_path)
+
+        preview_text = variables_info.get("preview_text")
         db_obj = Template(
             filename=obj_in.filename,
             file_path=obj_in.file_path,
+            content_hash=obj_in.content_hash,
+            file_size=obj_in.file_size,
             content_type=obj_in.content_type,
+            encoding=obj_in.encoding,
             user_id=obj_in.user_id,
             is_template=variables_info["is_template"],
-            variables=variables_info["variables"]
+            variables=variables_info["variables"],
+            preview_text=preview_text,
+            preview_hash=obj_in.content_hash if preview_text is not None else None,
+            content_text=variables_info.get("content_text")
         )
-        
+
         db.add(db_obj)
-        db.commit()
-        db.refresh(db_obj)
+        await db.commit()
+        await db.refresh(db_obj)
         return db_obj
 
-    def get_by_user(
-        self, db: Session, *, user_id: int, skip: int = 0, limit: int = 100
+    async def get_by_user(
+        self,
+        db: AsyncSession,
+        *,
+        user_id: int,
+        skip: int = 0,
+        limit: int = 100,
+        after: Optional[Tuple[datetime, int]] = None,
     ) -> List[Template]:
-        return (
-            db.query(self.model)
-            .filter(Template.user_id == user_id)
-            .offset(skip)
-            .limit(limit)
-            .all()
+        """
+        Шаблоны пользователя от новых к старым.
+
+        С after выборка продолжается сразу за позицией (created_at, id)
+        по индексу ix_templates_user_created_id, без OFFSET.
+        """
+        created_at = Template.created_at
+        if db.get_bind().dialect.name == "sqlite":
+            # SQLite хранит даты строками разного формата - сравниваем их как числа
+            created_at = func.julianday(Template.created_at)
+
+        query = (
+            select(self.model)
+            .options(load_only(*LIST_COLUMNS))
+            .where(Template.user_id == user_id)
+            .order_by(created_at.desc(), Template.id.desc())
         )
+        if after is not None:
+            after_created_at = literal(after[0], Template.created_at.type)
+            if db.get_bind().dialect.name == "sqlite":
+                after_created_at = func.julianday(after_created_at)
+            query = query.where(tuple_(created_at, Template.id) < tuple_(after_created_at, after[1]))
+        elif skip:
+            query = query.offset(skip)
+        result = await db.execute(query.limit(limit))
+        return list(result.scalars().all())
+
+    async def get_by_content(self, db: AsyncSession, *, content_hash: str, file_path: str) -> Optional[Template]:
+        result = await db.execute(
+            select(self.model)
+            .where(Template.content_hash == content_hash, Template.file_path == file_path)
+            .limit(1)
+        )
+        return result.scalars().first()
+
+    async def search_by_variables(
+        self,
+        db: AsyncSession,
+        *,
+        user_id: int,
+        names: List[str],
+        match_all: bool = True,
+        skip: int = 0,
+        limit: int = 100,
+    ) -> List[Template]:
+        query = select(self.model).where(Template.user_id == user_id).order_by(Template.id)
+
+        if db.get_bind().dialect.name == "postgresql":
+            # Операторы ?& и ?| обслуживаются GIN-индексом ix_templates_variables
+            variables = type_coerce(Template.variables, JSONB)
+            condition = variables.has_all(array(names)) if match_all else variables.has_any(array(names))
+            result = await db.execute(query.where(condition).offset(skip).limit(limit))
+            return list(result.scalars().all())
+
+        # Другие СУБД (SQLite при разработке) фильтруем на стороне приложения
+        result = await db.execute(query)
+        check = all if match_all else any
+        matched = [
+            obj for obj in result.scalars().all()
+            if check(name in (obj.variables or []) for name in names)
+        ]
+        return matched[skip:skip + limit]
+
+    async def search_text(
+        self, db: AsyncSession, *, user_id: int, query: str, limit: int = 20
+    ) -> List[Tuple[Template, float, str]]:
+        """
+        Ранжированный полнотекстовый поиск: (шаблон, релевантность, фрагмент).
+        """
+        if db.get_bind().dialect.name == "postgresql":
+            tsquery = to_tsquery(query)
+            rank = func.ts_rank_cd(Template.search_vector, tsquery).label("rank")
+            # Сначала отбираем лучшие совпадения по индексу, фрагменты строим только для них
+            ranked = (
+                select(Template.id, rank)
+                .where(Template.user_id == user_id, Template.search_vector.op("@@")(tsquery))
+                .order_by(rank.desc(), Template.id.desc())
+                .limit(limit)
+                .subquery()
+            )
+            source = func.left(
+                func.coalesce(Template.preview_text, Template.content_text, Template.filename),
+                settings.SEARCH_TEXT_MAX_CHARS,
+            )
+            snippet = func.ts_headline(ts_config(), source, tsquery, SNIPPET_OPTIONS)
+            result = await db.execute(
+                select(self.model, ranked.c.rank, snippet)
+                .options(load_only(*LIST_COLUMNS))
+                .join(ranked, ranked.c.id == Template.id)
+                .order_by(ranked.c.rank.desc(), Template.id.desc())
+            )
+            return [(obj, float(score), text) for obj, score, text in result.all()]
+
+        # Другие СУБД (SQLite при разработке): подстрочный поиск всех слов запроса
+        terms = [term.lower() for term in query.split() if term]
+        if not terms:
+            return []
+        result = await db.execute(select(self.model).where(Template.user_id == user_id))
+        hits = []
+        for obj in result.scalars().all():
+            document = search_document(obj.filename, obj.preview_text, obj.content_text)
+            lowered = document.lower()
+            if all(term in lowered for term in terms):
+                position = lowered.find(terms[0])
+                start = max(0, position - 60)
+                snippet = document[start:position + len(terms[0]) + 60].replace("\n", " ")
+                score = sum(lowered.count(term) for term in terms) / (1 + len(lowered) / 1000)
+                hits.append((obj, score, snippet))
+        hits.sort(key=lambda hit: (hit[1], hit[0].id), reverse=True)
+        return hits[:limit]
 
-    def remove(self, db: Session, *, id: int) -> Template:
-        obj = db.query(self.model).get(id)
+    async def remove(self, db: AsyncSession, *, id: int) -> Template:
+        obj = await db.get(self.model, id)
         if obj:
-            db.delete(obj)
-            db.commit()
+            # Файл без ссылок удалит сборщик сирот
+            await db.delete(obj)
+            await db.commit()
         return obj
 
-template = CRUDTemplate(Template)
+template_async = AsyncCRUDTemplate(Template)
@@ -1,12 +1,46 @@
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from app.models.user import User
-from app.schemas.user import UserCreate
-from app.core.security import get_password_hash, verify_password, create_access_token
+from app.schemas.user import CurrentUser, UserCreate
+from app.core.config import settings
+from app.core.security import (
+    create_access_token,
+    get_password_hash,
+    get_password_hash_async,
+    verify_and_update_password_async,
+    verify_password,
+)
+from app.utils.cache import TTLCache
 import secrets
 
+# Снимки пользователей по email (subject JWT) для get_current_user.
+# Кэш локален для процесса: в других воркерах запись живет до истечения TTL.
+user_cache = TTLCache(maxsize=settings.USER_CACHE_SIZE, ttl=settings.USER_CACHE_TTL)
+
+def invalidate_cached_user(email: str) -> None:
+    """
+    Сбрасывает снимок пользователя после изменения токенов Google или is_active.
+    """
+    user_cache.pop(email)
+
+async def get_current_user_snapshot(db: AsyncSession, email: str):
+    user = user_cache.get(email)
+    if user is None:
+        db_user = await get_user_by_email_async(db, email=email)
+        if db_user is None:
+            return None
+        user = CurrentUser.model_validate(db_user)
+        user_cache.set(email, user)
+    return user
+
 def get_user_by_email(db: Session, email: str):
     return db.query(User).filter(User.email == email).first()
 
+async def get_user_by_email_async(db: AsyncSession, email: str):
+    result = await db.execute(select(User).where(User.email == email))
+    return result.scalars().first()
+
 def create_user(db: Session, user: UserCreate):
     hashed_password = get_password_hash(user.password)
     db_user = User(email=user.email, hashed_password=hashed_password)
@@ -15,6 +49,14 @@ def create_user(db: Session, user: UserCreate):
     db.refresh(db_user)
     return db_user
 
+async def create_user_async(db: AsyncSession, user: UserCreate):
+    hashed_password = await get_password_hash_async(user.password)
+    db_user = User(email=user.email, hashed_password=hashed_password)
+    db.add(db_user)
+    await db.commit()
+    await db.refresh(db_user)
+    return db_user
+
 def authenticate_user(db: Session, email: str, password: str):
     user = get_user_by_email(db, email)
     if not user:
@@ -23,22 +65,36 @@ def authenticate_user(db: Session, email: str, password: str):
         return False
     return user
 
-def get_or_create_google_user(db: Session, email: str, google_id: str = None) -> User:
-    user = get_user_by_email(db, email=email)
-    
+async def authenticate_user_async(db: AsyncSession, email: str, password: str):
+    user = await get_user_by_email_async(db, email)
+    if not user:
+        return False
+    valid, new_hash = await verify_and_update_password_async(password, user.hashed_password)
+    if not valid:
+        return False
+    if new_hash:
+        # Стоимость bcrypt изменилась - прозрачно пересчитываем хэш
+        user.hashed_password = new_hash
+        await db.commit()
+    return user
+
+async def get_or_create_google_user_async(db: AsyncSession, email: str, google_id: str = None) -> User:
+    user = await get_user_by_email_async(db, email=email)
+
     if not user:
         # Создаем случайный пароль для Google-пользователя
         random_password = secrets.token_urlsafe(32)
         user = User(
             email=email,
-            hashed_password=get_password_hash(random_password),
+            hashed_password=await get_password_hash_async(random_password),
             is_active=True,
             google_id=google_id,
             google_token=None,  # будет обновлено позже
             google_refresh_token=None  # будет обновлено позже
         )
         db.add(user)
-        db.commit()
-        db.refresh(user)
-    
+        await db.commit()
+        await db.refresh(user)
+        invalidate_cached_user(email)
+
     return user
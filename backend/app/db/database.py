@@ -1,19 +1,63 @@
-from os import getenv
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 
-DATABASE_URL = getenv("DATABASE_URL")
+from app.core.config import settings
+from app.db.pool_stats import TimedAsyncAdaptedQueuePool, TimedQueuePool
+
+DATABASE_URL = settings.DATABASE_URL
 if not DATABASE_URL:
     raise ValueError("DATABASE_URL must be set in environment variables")
 
-engine = create_engine(DATABASE_URL)
+# Асинхронные драйверы для тех же баз данных
+ASYNC_DRIVERS = {
+    "postgresql": "postgresql+asyncpg",
+    "postgresql+psycopg2": "postgresql+asyncpg",
+    "postgres": "postgresql+asyncpg",
+    "sqlite": "sqlite+aiosqlite",
+}
+
+def get_async_database_url(url: str) -> str:
+    scheme, separator, rest = url.partition("://")
+    return f"{ASYNC_DRIVERS.get(scheme, scheme)}{separator}{rest}"
+
+def get_pool_options(url: str, poolclass) -> dict:
+    """
+    Настройки пула соединений из Settings; SQLite использует пул по умолчанию.
+    """
+    if url.startswith("sqlite"):
+        return {}
+    return {
+        "poolclass": poolclass,
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_timeout": settings.DB_POOL_TIMEOUT,
+        "pool_recycle": settings.DB_POOL_RECYCLE,
+        "pool_pre_ping": settings.DB_POOL_PRE_PING,
+    }
+
+engine = create_engine(DATABASE_URL, **get_pool_options(DATABASE_URL, TimedQueuePool))
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
+ASYNC_DATABASE_URL = get_async_database_url(DATABASE_URL)
+async_engine = create_async_engine(
+    ASYNC_DATABASE_URL, **get_pool_options(ASYNC_DATABASE_URL, TimedAsyncAdaptedQueuePool)
+)
+# expire_on_commit=False: после commit атрибуты объектов остаются доступны
+# без повторного (неявного и невозможного в async) запроса к базе
+AsyncSessionLocal = async_sessionmaker(
+    async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False
+)
+
 def get_db():
     db = SessionLocal()
     try:
         yield db
     finally:
         db.close()
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
@@ -0,0 +1,26 @@
+from typing import Optional
+
+from sqlalchemy import Text, cast, func, literal_column
+from sqlalchemy.sql.elements import ColumnElement
+
+from app.core.config import settings
+
+
+def ts_config() -> ColumnElement:
+    return literal_column(f"'{settings.SEARCH_TEXT_CONFIG}'::regconfig")
+
+
+def search_document(*parts: Optional[str]) -> str:
+    """
+    Текст, по которому строится поисковый вектор шаблона.
+    """
+    return "\n".join(part for part in parts if part)[:settings.SEARCH_TEXT_MAX_CHARS]
+
+
+def to_tsvector(text: str) -> ColumnElement:
+    return func.to_tsvector(ts_config(), cast(text, Text))
+
+
+def to_tsquery(query: str) -> ColumnElement:
+    # websearch_to_tsquery понимает "фразы", OR и -исключения и не падает на синтаксисе
+    return func.websearch_to_tsquery(ts_config(), cast(query, Text))
@@ -0,0 +1,46 @@
+import time
+from typing import Any, Dict
+
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+from app.utils.histogram import LatencyHistogram
+
+
+class _TimedCheckoutMixin:
+    wait_histogram: LatencyHistogram
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            self.wait_histogram.observe(time.perf_counter() - started)
+
+
+class TimedQueuePool(_TimedCheckoutMixin, QueuePool):
+    wait_histogram = LatencyHistogram()
+
+
+class TimedAsyncAdaptedQueuePool(_TimedCheckoutMixin, AsyncAdaptedQueuePool):
+    wait_histogram = LatencyHistogram()
+
+
+def pool_status(engine: Engine) -> Dict[str, Any]:
+    """
+    Текущее состояние пула соединений движка.
+    """
+    pool = engine.pool
+    status: Dict[str, Any] = {"pool_class": type(pool).__name__}
+    if isinstance(pool, QueuePool):
+        status.update({
+            "size": pool.size(),
+            "checked_out": pool.checkedout(),
+            "idle": pool.checkedin(),
+            # overflow() отрицателен, пока пул не заполнен до pool_size
+            "overflow": max(pool.overflow(), 0),
+        })
+    histogram = getattr(pool, "wait_histogram", None)
+    if histogram is not None:
+        status["checkout_wait"] = histogram.snapshot()
+    return status
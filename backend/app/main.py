@@ -1,11 +1,12 @@
-from fastapi import FastAPI, Depends
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.security import HTTPBearer
-from sqlalchemy.orm import Session
 
-from app.db.database import get_db
+from app.db.database import async_engine, engine
 from app.core.config import settings
 from app.api.v1.api import api_router
+from app.services import google_clients, google_credentials, jobs, render_pool, retention
 
 app = FastAPI(
     title=settings.PROJECT_NAME,
@@ -16,16 +17,83 @@ app = FastAPI(
 # Просто создаем экземпляр HTTPBearer
 security = HTTPBearer()
 
+# Запас на заголовки multipart поверх максимального размера файла
+UPLOAD_OVERHEAD = 64 * 1024
+
+@app.middleware("http")
+async def limit_request_size(request: Request, call_next):
+    # Отклоняем заведомо слишком большие запросы до чтения тела
+    content_length = request.headers.get("content-length")
+    if (
+        settings.MAX_UPLOAD_SIZE
+        and content_length
+        and content_length.isdigit()
+        and int(content_length) > settings.MAX_UPLOAD_SIZE + UPLOAD_OVERHEAD
+    ):
+        return JSONResponse(
+            status_code=413,
+            content={"detail": f"File is too large, maximum size is {settings.MAX_UPLOAD_SIZE} bytes"},
+        )
+    return await call_next(request)
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["http://localhost:3000"],
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "Location"],
 )
 
 app.include_router(api_router, prefix=settings.API_V1_STR)
 
 @app.get("/")
-async def root(db: Session = Depends(get_db)):
+async def root():
     return {"message": "Welcome to AutoDoc API"}
+
+
+@app.on_event("startup")
+async def start_job_workers():
+    jobs.start()
+
+
+# Воркеры задач дорабатывают до остановки пула рендеринга, которым они пользуются
+@app.on_event("shutdown")
+async def drain_job_workers():
+    await jobs.stop()
+
+
+@app.on_event("shutdown")
+def shutdown_render_pool():
+    render_pool.shutdown()
+
+
+@app.on_event("startup")
+async def start_google_token_refresher():
+    google_credentials.start_refresher()
+
+
+@app.on_event("shutdown")
+async def stop_google_token_refresher():
+    await google_credentials.stop_refresher()
+
+
+@app.on_event("startup")
+async def start_retention_job():
+    retention.start()
+
+
+@app.on_event("shutdown")
+async def stop_retention_job():
+    await retention.stop()
+
+
+@app.on_event("shutdown")
+def shutdown_google_clients():
+    google_clients.shutdown()
+
+
+@app.on_event("shutdown")
+async def dispose_engines():
+    await async_engine.dispose()
+    engine.dispose()
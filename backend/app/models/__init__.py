@@ -1,2 +1,3 @@
 from app.models.template import Template
 from app.models.user import User
+from app.models.job import Job
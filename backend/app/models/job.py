@@ -0,0 +1,37 @@
+from sqlalchemy import Column, DateTime, ForeignKey, Index, Integer, JSON, String, Text
+from sqlalchemy.sql import func
+
+from app.db.base_class import Base
+
+class Job(Base):
+    """
+    Фоновая задача генерации документа.
+
+    Воркеры забирают задачи через SELECT ... FOR UPDATE SKIP LOCKED;
+    locked_until - срок аренды: если воркер пропал, задачу заберет другой.
+    """
+    __tablename__ = "jobs"
+
+    id = Column(String(32), primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), index=True, nullable=False)
+    template_id = Column(Integer, ForeignKey("templates.id", ondelete="SET NULL"), nullable=True)
+    # generate | google_doc
+    kind = Column(String(32), nullable=False)
+    payload = Column(JSON, nullable=False, default=dict)
+    # queued | running | succeeded | failed
+    status = Column(String(16), nullable=False, default="queued")
+    attempts = Column(Integer, nullable=False, default=0)
+    max_attempts = Column(Integer, nullable=False)
+    # Не раньше этого времени (UTC) задачу можно забрать - используется для задержки повтора
+    run_after = Column(DateTime, nullable=False)
+    locked_until = Column(DateTime, nullable=True)
+    locked_by = Column(String(64), nullable=True)
+    result = Column(JSON, nullable=True)
+    error = Column(Text, nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    finished_at = Column(DateTime, nullable=True)
+
+    __table_args__ = (
+        # Выборка очереди: статус + время готовности
+        Index("ix_jobs_status_run_after", "status", "run_after"),
+    )
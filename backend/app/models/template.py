@@ -1,21 +1,66 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, JSON, Boolean
+from sqlalchemy import BigInteger, Column, Integer, String, ForeignKey, DateTime, JSON, Boolean, Text, Index, event, inspect
+from sqlalchemy.dialects.postgresql import JSONB, TSVECTOR
 from sqlalchemy.sql import func
-from sqlalchemy.orm import relationship
+from sqlalchemy.orm import deferred, relationship
 
+from app.core.config import settings
 from app.db.base_class import Base
+from app.db.fulltext import search_document, to_tsvector
 
 class Template(Base):
     __tablename__ = "templates"
 
     id = Column(Integer, primary_key=True, index=True)
     filename = Column(String, index=True)
-    file_path = Column(String)
+    file_path = Column(String, index=True)
+    content_hash = Column(String(64), index=True, nullable=True)
+    # Размер файла в байтах - для учета квоты пользователя
+    file_size = Column(BigInteger, nullable=True)
     content_type = Column(String)
+    # Кодировка текстового файла шаблона (после загрузки - utf-8); None для docx
+    encoding = Column(String(32), nullable=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     user_id = Column(Integer, ForeignKey("users.id"))
     
     # Добавляем значения по умолчанию
     is_template = Column(Boolean, default=False, nullable=False)
-    variables = Column(JSON, default=list, nullable=False)
+    # В PostgreSQL - JSONB с GIN-индексом для поиска по переменным
+    variables = Column(JSON().with_variant(JSONB(), "postgresql"), default=list, nullable=False)
+
+    # Текст предпросмотра docx и хэш содержимого, из которого он построен
+    preview_text = Column(Text, nullable=True)
+    preview_hash = Column(String(64), nullable=True)
+
+    # Текст текстовых шаблонов для поиска (у docx ищем по preview_text)
+    content_text = Column(Text, nullable=True)
+    # Поисковый вектор, только в PostgreSQL; обновляется при изменении текста
+    search_vector = deferred(Column(Text().with_variant(TSVECTOR(), "postgresql"), nullable=True))
     
     user = relationship("User", back_populates="templates")
+
+    __table_args__ = (
+        Index("ix_templates_variables", "variables", postgresql_using="gin"),
+        # Постраничный вывод шаблонов пользователя по ключу (created_at, id)
+        Index("ix_templates_user_created_id", "user_id", "created_at", "id"),
+        Index("ix_templates_search_vector", "search_vector", postgresql_using="gin"),
+    )
+
+
+SEARCH_SOURCE_FIELDS = ("filename", "preview_text", "content_text")
+
+
+@event.listens_for(Template, "before_insert")
+@event.listens_for(Template, "before_update")
+def _update_search_vector(mapper, connection, target):
+    if target.content_text and len(target.content_text) > settings.SEARCH_TEXT_MAX_CHARS:
+        target.content_text = target.content_text[:settings.SEARCH_TEXT_MAX_CHARS]
+
+    if connection.dialect.name != "postgresql":
+        return
+    # Вектор пересчитывается только для строки, у которой изменился текст
+    state = inspect(target)
+    if state.persistent and not any(state.attrs[name].history.has_changes() for name in SEARCH_SOURCE_FIELDS):
+        return
+    target.search_vector = to_tsvector(
+        search_document(target.filename, target.preview_text, target.content_text)
+    )
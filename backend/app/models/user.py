@@ -1,4 +1,4 @@
-from sqlalchemy import Boolean, Column, Integer, String
+from sqlalchemy import Boolean, Column, DateTime, Integer, String
 from sqlalchemy.orm import relationship
 from app.db.base_class import Base
 
@@ -12,5 +12,7 @@ class User(Base):
     google_id = Column(String, unique=True, nullable=True)
     google_token = Column(String, nullable=True)
     google_refresh_token = Column(String, nullable=True)
+    # Срок действия google_token (UTC, без часового пояса, как в google-auth)
+    google_token_expiry = Column(DateTime, nullable=True, index=True)
 
     templates = relationship("Template", back_populates="user")
@@ -0,0 +1,18 @@
+from datetime import datetime
+from typing import Any, Dict, Optional
+from pydantic import BaseModel
+
+class Job(BaseModel):
+    id: str
+    kind: str
+    status: str
+    template_id: Optional[int] = None
+    attempts: int
+    max_attempts: int
+    result: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
+    created_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
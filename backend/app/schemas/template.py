@@ -8,6 +8,9 @@ class TemplateBase(BaseModel):
     content_type: str
     is_template: bool = False
     variables: List[str] = []
+    content_hash: Optional[str] = None
+    encoding: Optional[str] = None
+    file_size: Optional[int] = None
 
 class TemplateCreate(TemplateBase):
     user_id: int
@@ -18,6 +21,9 @@ class TemplateUpdate(TemplateBase):
     content_type: Optional[str] = None
     is_template: Optional[bool] = None
     variables: Optional[List[str]] = None
+    content_hash: Optional[str] = None
+    encoding: Optional[str] = None
+    file_size: Optional[int] = None
 
 class Template(TemplateBase):
     id: int
@@ -26,3 +32,7 @@ class Template(TemplateBase):
 
     class Config:
         from_attributes = True
+
+class TemplateSearchHit(Template):
+    rank: float
+    snippet: str
@@ -1,3 +1,5 @@
+from datetime import datetime
+from typing import Optional
 from pydantic import BaseModel, EmailStr
 
 class UserBase(BaseModel):
@@ -15,3 +17,20 @@ class User(UserBase):
 
     class Config:
         from_attributes = True
+
+
+class CurrentUser(BaseModel):
+    """
+    Снимок пользователя для кэша аутентификации.
+    """
+    id: int
+    email: str
+    is_active: Optional[bool] = True
+    google_id: Optional[str] = None
+    google_token: Optional[str] = None
+    google_refresh_token: Optional[str] = None
+    google_token_expiry: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
+        frozen = True
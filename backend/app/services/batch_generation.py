@@ -0,0 +1,154 @@
+import asyncio
+import csv
+import io
+import json
+import os
+import time
+import zipfile
+from collections import deque
+from typing import AsyncIterator, Dict, List, Optional
+
+from app.core.config import settings
+from app.services import render_pool
+from app.utils.render_plan import render_docx_bytes, render_text_bytes
+from app.utils.zip_stream import aiter_zip
+
+
+def parse_variable_rows(data: bytes, content_type: str) -> List[Dict[str, str]]:
+    """
+    Разбирает тело запроса пакетной генерации: CSV с заголовком или JSONL.
+    """
+    text = data.decode("utf-8-sig")
+    rows: List[Dict[str, str]] = []
+
+    if "csv" in (content_type or ""):
+        for row in csv.DictReader(io.StringIO(text)):
+            rows.append({key: value or "" for key, value in row.items() if key is not None})
+    else:
+        for line_number, line in enumerate(text.splitlines(), start=1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except json.JSONDecodeError as e:
+                raise ValueError(f"Invalid JSON on line {line_number}: {e.msg}")
+            if not isinstance(row, dict):
+                raise ValueError(f"Line {line_number} must be a JSON object")
+            rows.append({key: "" if value is None else str(value) for key, value in row.items()})
+
+    if len(rows) > settings.BATCH_MAX_ROWS:
+        raise ValueError(f"Too many rows: {len(rows)} > {settings.BATCH_MAX_ROWS}")
+    return rows
+
+
+def render_template_bytes(
+    file_path: str,
+    values: Dict[str, str],
+    content_hash: Optional[str] = None,
+    encoding: Optional[str] = None,
+) -> bytes:
+    """
+    Рендерит один документ; выполняется в процессе пула.
+    """
+    if file_path.endswith('.docx'):
+        return render_docx_bytes(file_path, values, content_hash=content_hash)
+
+    return render_text_bytes(file_path, values, encoding, content_hash)
+
+
+def _row_values(variables: List[str], row: Dict[str, str]) -> Dict[str, str]:
+    return {var_name: row.get(var_name, "") for var_name in variables}
+
+
+async def render_row(
+    file_path: str,
+    variables: List[str],
+    row: Dict[str, str],
+    content_hash: Optional[str] = None,
+    encoding: Optional[str] = None,
+) -> bytes:
+    """
+    Рендерит одну строку пакета через общий пул с контролем очереди.
+
+    Вызывается для первой строки до начала ответа: ошибка шаблона или
+    переполненная очередь возвращаются клиенту обычным статусом, а не
+    оборванным архивом.
+    """
+    return await render_pool.run(
+        render_template_bytes, file_path, _row_values(variables, row), content_hash, encoding
+    )
+
+
+async def iter_batch_zip(
+    file_path: str,
+    filename: str,
+    variables: List[str],
+    rows: List[Dict[str, str]],
+    first_document: bytes,
+    content_hash: Optional[str] = None,
+    encoding: Optional[str] = None,
+) -> AsyncIterator[bytes]:
+    """
+    Рендерит остальные строки в пуле процессов и отдает ZIP по мере готовности.
+
+    Первая строка уже отрендерена (render_row). Каждая следующая занимает слот
+    пула, поэтому пакет учитывается в статистике и делит воркеры с обычными
+    запросами; одновременно в работе не больше RENDER_WORKERS строк. Строки,
+    которые не удалось отрендерить после начала ответа, перечисляются в
+    ERRORS.txt в конце архива.
+    """
+    window = max(1, settings.RENDER_WORKERS)
+    base_name, extension = os.path.splitext(filename)
+    compression = zipfile.ZIP_STORED if file_path.endswith('.docx') else zipfile.ZIP_DEFLATED
+    started = time.monotonic()
+    errors: List[str] = []
+
+    def member_name(number: int) -> str:
+        return f"{number:05d}_{base_name}{extension}"
+
+    def submit(row: Dict[str, str]) -> asyncio.Future:
+        return asyncio.ensure_future(render_pool.run_admitted(
+            render_template_bytes, file_path, _row_values(variables, row), content_hash, encoding
+        ))
+
+    async def collect(number: int, future: asyncio.Future) -> Optional[bytes]:
+        try:
+            return await future
+        except Exception as e:
+            message = str(getattr(e, "detail", "") or e) or e.__class__.__name__
+            print(f"Batch row {number} of {filename} failed: {message}")
+            errors.append(f"row {number}: {message}")
+            return None
+
+    async def members():
+        yield member_name(1), first_document
+        pending = deque()
+        try:
+            for number, row in enumerate(rows[1:], start=2):
+                pending.append((number, submit(row)))
+                if len(pending) >= window:
+                    number, future = pending.popleft()
+                    data = await collect(number, future)
+                    if data is not None:
+                        yield member_name(number), data
+            while pending:
+                number, future = pending.popleft()
+                data = await collect(number, future)
+                if data is not None:
+                    yield member_name(number), data
+        finally:
+            # Клиент мог отключиться - отменяем еще не выполненные строки
+            for _, future in pending:
+                future.cancel()
+        if errors:
+            yield "ERRORS.txt", ("\n".join(errors) + "\n").encode("utf-8")
+
+    async for chunk in aiter_zip(members(), compression=compression):
+        yield chunk
+
+    elapsed = time.monotonic() - started
+    rate = len(rows) / elapsed if elapsed > 0 else 0.0
+    print(
+        f"Batch generated {len(rows) - len(errors)} of {len(rows)} documents from {filename} "
+        f"in {elapsed:.2f}s ({rate:.1f} docs/s)"
+    )
@@ -0,0 +1,168 @@
+import os
+import shutil
+import uuid
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple, Union
+
+from fastapi import HTTPException
+from fastapi.concurrency import run_in_threadpool
+
+from app.services import google_credentials, render_pool, storage
+from app.services.google_docs import GoogleDocsService, user_rate_limits
+from app.services.output_cache import cache_key, output_cache
+from app.utils.document_parser import extract_text_from_docx
+from app.utils.encoding import read_text
+from app.utils.render_plan import file_content_hash, render_docx, render_spooled, render_text
+
+
+async def template_content_hash(template) -> str:
+    return template.content_hash or await run_in_threadpool(file_content_hash, template.file_path)
+
+
+def template_values(template, variables: Dict[str, str]) -> Dict[str, str]:
+    """
+    Значения только для переменных шаблона; отсутствующие заменяются пустой строкой.
+    """
+    return {var_name: variables.get(var_name, "") for var_name in template.variables}
+
+
+async def render_to_cache(template, values: Dict[str, str], content_hash: str) -> Tuple[str, str]:
+    """
+    Рендерит документ в кэш сгенерированных документов.
+
+    Возвращает ключ кэша и путь к файлу результата.
+    """
+    key = cache_key(content_hash, values)
+    is_docx = template.file_path.endswith('.docx')
+
+    async def render(output_path: str) -> None:
+        if is_docx:
+            # Рендерим по скомпилированному плану прямо в выходной файл
+            await render_pool.run(
+                render_docx, template.file_path, values, output_path,
+                content_hash=content_hash,
+            )
+        else:
+            await run_in_threadpool(
+                render_text, template.file_path, values, output_path, template.encoding, content_hash
+            )
+
+    try:
+        path = await output_cache.get_or_render(key, os.path.splitext(template.file_path)[1], render)
+    except HTTPException:
+        raise
+    except Exception as e:
+        kind = "docx" if is_docx else "text file"
+        error_msg = f"Error processing {kind}: {str(e)}"
+        print(error_msg)
+        raise HTTPException(status_code=500, detail=error_msg)
+    return key, path
+
+
+def _share_spooled(result: Union[bytes, str]) -> Union[bytes, str]:
+    # Временный файл удаляется после отправки, поэтому каждый запрос получает свою ссылку на него
+    if isinstance(result, bytes):
+        return result
+    copy = os.path.join(os.path.dirname(result), uuid.uuid4().hex)
+    try:
+        os.link(result, copy)
+    except OSError:
+        shutil.copyfile(result, copy)
+    return copy
+
+
+async def render_in_memory(template, values: Dict[str, str], content_hash: str) -> Union[bytes, str]:
+    """
+    Рендерит документ без сохранения в кэш (результат render_spooled).
+
+    Одновременные запросы с тем же шаблоном и значениями получают результат
+    одного рендеринга.
+    """
+    is_docx = template.file_path.endswith('.docx')
+
+    async def render() -> Union[bytes, str]:
+        if is_docx:
+            return await render_pool.run(
+                render_spooled, template.file_path, values, storage.TMP_DIR,
+                content_hash=content_hash,
+            )
+        return await run_in_threadpool(
+            render_spooled, template.file_path, values, storage.TMP_DIR,
+            content_hash=content_hash, encoding=template.encoding,
+        )
+
+    try:
+        # Отдельное пространство ключей: здесь результат - байты, а не файл кэша
+        return await output_cache.coalesce(
+            f"memory:{cache_key(content_hash, values)}", render, share=_share_spooled
+        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        kind = "docx" if is_docx else "text file"
+        error_msg = f"Error processing {kind}: {str(e)}"
+        print(error_msg)
+        raise HTTPException(status_code=500, detail=error_msg)
+
+
+async def read_template_text(template) -> str:
+    """
+    Текст шаблона для выгрузки в Google Docs.
+    """
+    content = None
+    if template.file_path.endswith('.docx'):
+        content = await render_pool.run(extract_text_from_docx, template.file_path)
+    else:
+        try:
+            # Кодировка определена при загрузке - файл читается за один проход
+            content = await run_in_threadpool(read_text, template.file_path, template.encoding)
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Error reading file: {str(e)}")
+    return content
+
+
+async def create_google_doc(
+    user,
+    template,
+    variables: Dict[str, str],
+    progress: Optional[Dict[str, Any]] = None,
+    on_progress: Optional[Callable[[Dict[str, Any]], Awaitable[None]]] = None,
+) -> Dict[str, Any]:
+    """
+    Создает документ Google Docs из шаблона с подставленными значениями.
+
+    progress и on_progress передаются в GoogleDocsService.create_document:
+    фоновая задача сохраняет по ним id созданного документа и при повторе
+    продолжает с него.
+    """
+    if not user.google_token:
+        raise HTTPException(
+            status_code=401,
+            detail="Google authentication required"
+        )
+
+    # Читаем содержимое файла шаблона
+    content = await read_template_text(template)
+
+    # Заменяем переменные в контенте
+    for key, value in variables.items():
+        content = content.replace(f"##{key}##", value)
+
+    # Создаем Google Doc
+    google_service = GoogleDocsService(
+        credentials=await google_credentials.get_credentials(user),
+        rate_limiter=user_rate_limits.get(user.id)
+    )
+    try:
+        result = await google_service.create_document(
+            title=f"{template.filename} - {datetime.now().strftime('%Y-%m-%d %H:%M')}",
+            content=content,
+            progress=progress,
+            on_progress=on_progress,
+        )
+    finally:
+        await google_credentials.save_if_refreshed(user, google_service.credentials)
+
+    # Логируем результат
+    print("Created document:", result)
+    return result
@@ -0,0 +1,99 @@
+import asyncio
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Optional, Tuple
+
+import httplib2
+from google.oauth2.credentials import Credentials
+from google_auth_httplib2 import AuthorizedHttp
+from googleapiclient import discovery_cache
+from googleapiclient.discovery import Resource, build_from_document
+
+from app.core.google_config import google_settings
+
+_services: Dict[Tuple[str, str], Resource] = {}
+_services_lock = threading.Lock()
+_local = threading.local()
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def _load_discovery(name: str, version: str) -> str:
+    """
+    Читает discovery-документ из статического файла без обращения к сети.
+    """
+    if google_settings.GOOGLE_DISCOVERY_DIR:
+        path = os.path.join(google_settings.GOOGLE_DISCOVERY_DIR, f"{name}.{version}.json")
+        with open(path, 'r', encoding='utf-8') as f:
+            return f.read()
+
+    document = discovery_cache.get_static_doc(name, version)
+    if document is None:
+        raise RuntimeError(f"No static discovery document for {name} {version}")
+    return document
+
+
+def get_service(name: str, version: str) -> Resource:
+    """
+    Возвращает клиент API, общий для всего процесса.
+
+    Клиент строится без учетных данных: авторизованный транспорт
+    передается в execute() для каждого запроса.
+    """
+    key = (name, version)
+    service = _services.get(key)
+    if service is None:
+        with _services_lock:
+            service = _services.get(key)
+            if service is None:
+                service = build_from_document(_load_discovery(name, version), http=httplib2.Http())
+                _services[key] = service
+    return service
+
+
+def _get_http() -> httplib2.Http:
+    # httplib2.Http не потокобезопасен, поэтому у каждого потока пула
+    # свой транспорт с переиспользуемыми соединениями
+    http = getattr(_local, "http", None)
+    if http is None:
+        http = httplib2.Http(timeout=google_settings.GOOGLE_API_TIMEOUT)
+        _local.http = http
+    return http
+
+
+def _execute(request: Any, credentials: Credentials, refresh: bool = True) -> Any:
+    if refresh:
+        return request.execute(http=AuthorizedHttp(credentials, http=_get_http()))
+    # Без обновления по 401: общий для нескольких потоков объект учетных данных
+    # обновлялся бы в каждом из них одновременно
+    return request.execute(http=AuthorizedHttp(credentials, http=_get_http(), refresh_status_codes=()))
+
+
+def get_executor() -> ThreadPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=google_settings.GOOGLE_API_WORKERS,
+                thread_name_prefix="google-api",
+            )
+        return _executor
+
+
+async def execute(request: Any, credentials: Credentials, refresh: bool = True) -> Any:
+    """
+    Выполняет подготовленный запрос Google API в пуле потоков, не блокируя event loop.
+
+    refresh=False отключает обновление токена по ответу 401.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_executor(), _execute, request, credentials, refresh)
+
+
+def shutdown() -> None:
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=True)
+            _executor = None
@@ -0,0 +1,173 @@
+import asyncio
+import weakref
+from datetime import datetime, timedelta
+from typing import Optional, Tuple
+
+import httplib2
+from google.oauth2.credentials import Credentials
+from google_auth_httplib2 import Request
+from sqlalchemy import select
+
+from app.core.google_config import google_settings
+from app.crud.user import invalidate_cached_user
+from app.db.database import AsyncSessionLocal
+from app.models.user import User
+from app.services import google_clients
+
+REFRESH_MARGIN = timedelta(seconds=google_settings.GOOGLE_TOKEN_REFRESH_MARGIN)
+
+# Одна блокировка на пользователя: параллельные запросы не обновляют токен дважды.
+# Слабые ссылки: блокировка живет, пока ее держат или ждут, и таблица не растет
+_refresh_locks: "weakref.WeakValueDictionary[int, asyncio.Lock]" = weakref.WeakValueDictionary()
+_refresher: Optional[asyncio.Task] = None
+
+
+def _lock_for(user_id: int) -> asyncio.Lock:
+    lock = _refresh_locks.get(user_id)
+    if lock is None:
+        lock = _refresh_locks[user_id] = asyncio.Lock()
+    return lock
+
+
+def build_credentials(
+    token: Optional[str],
+    refresh_token: Optional[str] = None,
+    expiry: Optional[datetime] = None,
+) -> Credentials:
+    return Credentials(
+        token=token,
+        refresh_token=refresh_token,
+        token_uri=google_settings.GOOGLE_TOKEN_URI,
+        client_id=google_settings.GOOGLE_CLIENT_ID,
+        client_secret=google_settings.GOOGLE_CLIENT_SECRET,
+        scopes=google_settings.GOOGLE_SCOPES,
+        expiry=expiry,
+    )
+
+
+def needs_refresh(expiry: Optional[datetime], margin: timedelta = REFRESH_MARGIN) -> bool:
+    """
+    Токен истек или истечет в пределах margin. Без срока считаем токен живым.
+    """
+    return expiry is not None and expiry - margin <= datetime.utcnow()
+
+
+def _refresh(credentials: Credentials) -> None:
+    credentials.refresh(Request(httplib2.Http(timeout=google_settings.GOOGLE_API_TIMEOUT)))
+
+
+async def save_credentials(user_id: int, credentials: Credentials) -> None:
+    """
+    Записывает обновленный токен и срок его действия в строку пользователя.
+    """
+    async with AsyncSessionLocal() as db:
+        user = await db.get(User, user_id)
+        if user is None:
+            return
+        user.google_token = credentials.token
+        user.google_token_expiry = credentials.expiry
+        # Google может выдать новый refresh token при обновлении
+        if credentials.refresh_token:
+            user.google_refresh_token = credentials.refresh_token
+        await db.commit()
+        invalidate_cached_user(user.email)
+
+
+async def _refresh_if_needed(user_id: int, margin: timedelta) -> Tuple[Optional[Credentials], bool]:
+    async with _lock_for(user_id):
+        # Пока ждали блокировку, токен мог обновить другой запрос - читаем заново
+        async with AsyncSessionLocal() as db:
+            user = await db.get(User, user_id)
+        if user is None or not user.google_token:
+            return None, False
+
+        credentials = build_credentials(user.google_token, user.google_refresh_token, user.google_token_expiry)
+        if not user.google_refresh_token or not needs_refresh(user.google_token_expiry, margin):
+            return credentials, False
+
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(google_clients.get_executor(), _refresh, credentials)
+        await save_credentials(user_id, credentials)
+        return credentials, True
+
+
+async def refresh_user_credentials(user_id: int, margin: timedelta = REFRESH_MARGIN) -> Optional[Credentials]:
+    """
+    Обновляет токен пользователя, если он близок к истечению, и сохраняет результат.
+    """
+    credentials, _ = await _refresh_if_needed(user_id, margin)
+    return credentials
+
+
+async def get_credentials(user, margin: timedelta = REFRESH_MARGIN) -> Credentials:
+    """
+    Учетные данные Google для запроса; истекающий в пределах margin токен обновляется заранее.
+    """
+    if user.google_refresh_token and needs_refresh(user.google_token_expiry, margin):
+        credentials = await refresh_user_credentials(user.id, margin)
+        if credentials is not None:
+            return credentials
+    return build_credentials(user.google_token, user.google_refresh_token, user.google_token_expiry)
+
+
+async def save_if_refreshed(user, credentials: Credentials) -> None:
+    """
+    Сохраняет токен, если библиотека обновила его во время запроса (ответ 401).
+    """
+    if credentials.token and credentials.token != user.google_token:
+        async with _lock_for(user.id):
+            await save_credentials(user.id, credentials)
+
+
+async def refresh_expiring_tokens() -> int:
+    """
+    Обновляет токены, которые истекут до следующего прохода фоновой задачи.
+    """
+    margin = REFRESH_MARGIN + timedelta(seconds=google_settings.GOOGLE_TOKEN_REFRESH_INTERVAL)
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(
+            select(User.id).where(
+                User.google_refresh_token.isnot(None),
+                User.google_token_expiry.isnot(None),
+                User.google_token_expiry <= datetime.utcnow() + margin,
+            )
+        )
+        user_ids = result.scalars().all()
+
+    refreshed = 0
+    for user_id in user_ids:
+        try:
+            # Токен мог уже обновить запрос пользователя - такие не считаем
+            _, did_refresh = await _refresh_if_needed(user_id, margin)
+            refreshed += did_refresh
+        except Exception as e:
+            print(f"Failed to refresh Google token for user {user_id}: {str(e)}")
+    return refreshed
+
+
+async def _run_refresher() -> None:
+    while True:
+        try:
+            refreshed = await refresh_expiring_tokens()
+            if refreshed:
+                print(f"Refreshed {refreshed} Google tokens ahead of expiry")
+        except Exception as e:
+            print(f"Google token refresher error: {str(e)}")
+        await asyncio.sleep(google_settings.GOOGLE_TOKEN_REFRESH_INTERVAL)
+
+
+def start_refresher() -> None:
+    global _refresher
+    if google_settings.GOOGLE_TOKEN_REFRESH_INTERVAL > 0 and _refresher is None:
+        _refresher = asyncio.get_running_loop().create_task(_run_refresher())
+
+
+async def stop_refresher() -> None:
+    global _refresher
+    if _refresher is not None:
+        _refresher.cancel()
+        try:
+            await _refresher
+        except asyncio.CancelledError:
+            pass
+        _refresher = None
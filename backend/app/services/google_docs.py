@@ -1,11 +1,49 @@
+import asyncio
+import time
 from google.oauth2.credentials import Credentials
-from googleapiclient.discovery import build
-from typing import Dict, Any
+from googleapiclient.errors import HttpError
+from typing import Awaitable, Callable, Dict, Any, List, Optional, Tuple
 from app.core.google_config import google_settings
+from app.services import google_clients
+from app.utils.histogram import LatencyHistogram
+from app.utils.rate_limit import TokenBucket, TokenBucketRegistry, backoff_delay
+
+DOCUMENT_URL = "https://docs.google.com/document/d/{document_id}/edit"
+RETRYABLE_STATUSES = {429, 500, 502, 503, 504}
+# 429 означает, что запрос отклонен до выполнения. После 5xx документ мог
+# быть создан (или заполнен), и повтор дал бы дубликат или ошибку ревизии
+CREATE_RETRYABLE_STATUSES = {429}
+
+# Квота запросов к Google API на пользователя
+user_rate_limits = TokenBucketRegistry(
+    rate=google_settings.GOOGLE_USER_RATE,
+    capacity=google_settings.GOOGLE_USER_BURST,
+)
+
+# Задержки этапов создания документа по всем запросам процесса
+phase_latency: Dict[str, LatencyHistogram] = {
+    phase: LatencyHistogram() for phase in ('create', 'fill', 'share', 'total')
+}
+
+
+def google_docs_stats() -> Dict[str, Any]:
+    return {phase: histogram.snapshot() for phase, histogram in phase_latency.items()}
+
+
+def _is_revision_mismatch(error: HttpError) -> bool:
+    return error.resp.status == 400 and b'revision' in (error.content or b'').lower()
+
 
 class GoogleDocsService:
-    def __init__(self, access_token: str, refresh_token: str = None):
-        self.credentials = Credentials(
+    def __init__(
+        self,
+        access_token: str = None,
+        refresh_token: str = None,
+        rate_limiter: Optional[TokenBucket] = None,
+        credentials: Optional[Credentials] = None,
+        auto_refresh: bool = True,
+    ):
+        self.credentials = credentials or Credentials(
             token=access_token,
             refresh_token=refresh_token,
             token_uri=google_settings.GOOGLE_TOKEN_URI,
@@ -13,22 +51,90 @@ class GoogleDocsService:
             client_secret=google_settings.GOOGLE_CLIENT_SECRET,
             scopes=google_settings.GOOGLE_SCOPES
         )
-        self.docs_service = build('docs', 'v1', credentials=self.credentials)
-        self.drive_service = build('drive', 'v3', credentials=self.credentials)
+        # Клиенты общие для процесса, учетные данные передаются при выполнении
+        self.docs_service = google_clients.get_service('docs', 'v1')
+        self.drive_service = google_clients.get_service('drive', 'v3')
+        self.rate_limiter = rate_limiter
+        # False - токен обновлен заранее и при параллельных запросах не обновляется
+        self.auto_refresh = auto_refresh
 
-    async def create_document(self, title: str, content: str = None) -> Dict[str, Any]:
+    async def _execute(self, request, retry_statuses=RETRYABLE_STATUSES) -> Dict[str, Any]:
+        """
+        Выполняет запрос с учетом квоты и повторяет его при статусах из retry_statuses.
+
+        По умолчанию повторяются 429/5xx - для идемпотентных запросов.
+        """
+        attempt = 0
+        while True:
+            if self.rate_limiter is not None:
+                await self.rate_limiter.acquire()
+            try:
+                return await google_clients.execute(request, self.credentials, self.auto_refresh)
+            except HttpError as e:
+                if e.resp.status not in retry_statuses or attempt >= google_settings.GOOGLE_MAX_RETRIES:
+                    raise
+                retry_after = e.resp.get('retry-after')
+                delay = backoff_delay(
+                    attempt,
+                    google_settings.GOOGLE_BACKOFF_BASE,
+                    google_settings.GOOGLE_BACKOFF_MAX,
+                    float(retry_after) if retry_after and retry_after.isdigit() else None,
+                )
+                attempt += 1
+                print(f"Google API returned {e.resp.status}, retry {attempt} in {delay:.2f}s")
+                await asyncio.sleep(delay)
+
+    async def _timed(self, timings: Dict[str, float], phase: str, request, **kwargs) -> Dict[str, Any]:
+        started = time.monotonic()
+        try:
+            return await self._execute(request, **kwargs)
+        finally:
+            elapsed = time.monotonic() - started
+            phase_latency[phase].observe(elapsed)
+            timings[phase] = round(elapsed * 1000, 2)
+
+    async def create_document(
+        self,
+        title: str,
+        content: str = None,
+        progress: Optional[Dict[str, Any]] = None,
+        on_progress: Optional[Callable[[Dict[str, Any]], Awaitable[None]]] = None,
+    ) -> Dict[str, Any]:
         """
         Создает документ Google Docs и опционально заполняет его содержимым
+
+        progress - состояние ранее начатого создания (id документа и пройденные
+        этапы): уже выполненные этапы пропускаются, документ повторно не создается.
+        on_progress(progress) вызывается после каждого этапа, чтобы состояние
+        можно было сохранить до следующего.
         """
-        # Создаем пустой документ
-        document = self.docs_service.documents().create(
-            body={'title': title}
-        ).execute()
+        timings: Dict[str, float] = {}
+        started = time.monotonic()
+        progress = progress if progress is not None else {}
+        done = progress.setdefault('done', [])
+
+        async def finished(phase: str) -> None:
+            done.append(phase)
+            if on_progress is not None:
+                await on_progress(progress)
+
+        # Документ создан предыдущей попыткой: ее заполнение могло пройти
+        resumed = bool(progress.get('documentId'))
+        if not resumed:
+            # Создаем пустой документ
+            document = await self._timed(timings, 'create', self.docs_service.documents().create(
+                body={'title': title}
+            ), retry_statuses=CREATE_RETRYABLE_STATUSES)
+            progress.update(
+                documentId=document['documentId'], revisionId=document.get('revisionId'), title=title
+            )
+            await finished('create')
         
-        document_id = document['documentId']
+        document_id = progress['documentId']
+        title = progress.get('title', title)
+        calls = []
         
-        # Если передан контент, заполняем документ
-        if content:
+        async def fill() -> None:
             requests = [{
                 'insertText': {
                     'location': {
@@ -38,33 +144,77 @@ class GoogleDocsService:
                 }
             }]
             
-            self.docs_service.documents().batchUpdate(
-                documentId=document_id,
-                body={'requests': requests}
-            ).execute()
-        
-        # Устанавливаем доступ для чтения всем, у кого есть ссылка
-        self.drive_service.permissions().create(
-            fileId=document_id,
-            body={
-                'role': 'reader',
-                'type': 'anyone'
-            }
-        ).execute()
-        
-        # Получаем информацию о файле, включая URL
-        file_info = self.drive_service.files().get(
-            fileId=document_id,
-            fields='id, name, webViewLink'
-        ).execute()
+            body = {'requests': requests}
+            if progress.get('revisionId'):
+                # Повтор не вставит текст второй раз: ревизия уже другая
+                body['writeControl'] = {'requiredRevisionId': progress['revisionId']}
+            try:
+                await self._timed(timings, 'fill', self.docs_service.documents().batchUpdate(
+                    documentId=document_id,
+                    body=body
+                ), retry_statuses=CREATE_RETRYABLE_STATUSES)
+            except HttpError as e:
+                # Ревизия сменилась - текст вставила прошлая попытка, потерялся только ответ
+                if not (resumed and 'writeControl' in body and _is_revision_mismatch(e)):
+                    raise
+            await finished('fill')
+
+        async def share() -> None:
+            # Устанавливаем доступ для чтения всем, у кого есть ссылка
+            await self._timed(timings, 'share', self.drive_service.permissions().create(
+                fileId=document_id,
+                body={
+                    'role': 'reader',
+                    'type': 'anyone'
+                }
+            ))
+            await finished('share')
+
+        # Если передан контент, заполняем документ
+        if content and 'fill' not in done:
+            calls.append(fill())
+        if 'share' not in done:
+            calls.append(share())
+
+        # Заполнение и выдача доступа не зависят друг от друга
+        await asyncio.gather(*calls)
+
+        elapsed = time.monotonic() - started
+        phase_latency['total'].observe(elapsed)
+        timings['total'] = round(elapsed * 1000, 2)
         
-        # Добавляем URL для открытия документа
+        # URL документа строим сами вместо отдельного запроса files().get
         return {
             'documentId': document_id,
             'title': title,
-            'url': file_info.get('webViewLink') or f"https://docs.google.com/document/d/{document_id}/edit"
+            'url': DOCUMENT_URL.format(document_id=document_id),
+            'timings_ms': timings
         }
 
+    async def create_documents(self, documents: List[Tuple[str, str]]) -> List[Dict[str, Any]]:
+        """
+        Создает несколько документов с ограниченной параллельностью.
+
+        Ошибка одного документа не прерывает остальные: результат
+        возвращается для каждого документа в исходном порядке.
+        """
+        semaphore = asyncio.Semaphore(google_settings.GOOGLE_EXPORT_CONCURRENCY)
+
+        async def create_one(index: int, title: str, content: str) -> Dict[str, Any]:
+            async with semaphore:
+                try:
+                    result = await self.create_document(title=title, content=content)
+                    return {'index': index, 'status': 'created', **result}
+                except HttpError as e:
+                    return {'index': index, 'status': 'failed', 'title': title,
+                            'error': f"Google API error {e.resp.status}: {e._get_reason()}"}
+                except Exception as e:
+                    return {'index': index, 'status': 'failed', 'title': title, 'error': str(e)}
+
+        return await asyncio.gather(*(
+            create_one(index, title, content) for index, (title, content) in enumerate(documents)
+        ))
+
     async def update_document(self, document_id: str, content: Dict[str, Any] = None) -> Dict[str, Any]:
         """
         Обновляет документ Google Docs
@@ -94,25 +244,8 @@ class GoogleDocsService:
             # Если передан какой-то другой формат, используем пустой список запросов
             requests = []
         
-        result = self.docs_service.documents().batchUpdate(
+        result = await self._execute(self.docs_service.documents().batchUpdate(
             documentId=document_id,
             body={'requests': requests}
-        ).execute()
+        ))
         return result
-
-    async def save_to_drive(self, document_id: str, folder_id: str = None) -> Dict[str, Any]:
-        file_metadata = {}
-        if folder_id:
-            file_metadata['parents'] = [folder_id]
-        
-        file = self.drive_service.files().get(
-            fileId=document_id,
-            fields='id, name, webViewLink'
-        ).execute()
-        return file
-
-    def _prepare_update_requests(self, content: Dict[str, Any]) -> list:
-        # Преобразуем контент в запросы для API Google Docs
-        requests = []
-        # Здесь будет логика формирования запросов для обновления документа
-        return requests
@@ -0,0 +1,396 @@
+import asyncio
+import os
+import socket
+import uuid
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from fastapi import HTTPException
+from sqlalchemy import and_, delete, or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.db.database import AsyncSessionLocal
+from app.models.job import Job
+from app.models.template import Template
+from app.models.user import User
+from app.services import generation
+from app.utils.rate_limit import backoff_delay
+
+TERMINAL_STATUSES = ("succeeded", "failed")
+
+
+class JobFailed(Exception):
+    """
+    Ошибка, после которой повторять задачу бессмысленно.
+    """
+
+
+async def enqueue(
+    db: AsyncSession,
+    *,
+    user_id: int,
+    kind: str,
+    template_id: Optional[int] = None,
+    payload: Optional[Dict[str, Any]] = None,
+) -> Job:
+    """
+    Ставит задачу в очередь и будит воркеры этого процесса.
+    """
+    job = Job(
+        id=uuid.uuid4().hex,
+        user_id=user_id,
+        template_id=template_id,
+        kind=kind,
+        payload=payload or {},
+        status="queued",
+        attempts=0,
+        max_attempts=settings.JOB_MAX_ATTEMPTS,
+        run_after=datetime.utcnow(),
+    )
+    db.add(job)
+    await db.commit()
+    await db.refresh(job)
+    pool.notify()
+    return job
+
+
+async def get_job(db: AsyncSession, job_id: str, user_id: int) -> Optional[Job]:
+    result = await db.execute(select(Job).where(Job.id == job_id, Job.user_id == user_id))
+    return result.scalar_one_or_none()
+
+
+async def claim(db: AsyncSession, worker_id: str) -> Optional[str]:
+    """
+    Забирает готовую задачу или задачу с истекшей арендой.
+
+    FOR UPDATE SKIP LOCKED: параллельные воркеры (в том числе в других
+    процессах) не ждут друг друга и никогда не получают одну задачу дважды.
+    """
+    while True:
+        now = datetime.utcnow()
+        result = await db.execute(
+            select(Job)
+            .where(
+                or_(
+                    and_(Job.status == "queued", Job.run_after <= now),
+                    and_(Job.status == "running", Job.locked_until < now),
+                )
+            )
+            .order_by(Job.run_after)
+            .limit(1)
+            .with_for_update(skip_locked=True)
+        )
+        job = result.scalar_one_or_none()
+        if job is None:
+            await db.rollback()
+            return None
+
+        # Условие на прежнее состояние защищает и там, где SKIP LOCKED нет (SQLite)
+        unchanged = update(Job).where(
+            Job.id == job.id, Job.status == job.status, Job.attempts == job.attempts
+        ).execution_options(synchronize_session=False)
+        if job.status == "running" and job.attempts >= job.max_attempts:
+            # Воркер пропадал на каждой попытке (например, упал процесс)
+            await db.execute(unchanged.values(
+                status="failed", error="Visibility timeout expired", finished_at=now,
+                locked_by=None, locked_until=None,
+            ))
+            await db.commit()
+            continue
+
+        claimed = await db.execute(unchanged.values(
+            status="running",
+            attempts=job.attempts + 1,
+            locked_by=worker_id,
+            locked_until=now + timedelta(seconds=settings.JOB_VISIBILITY_TIMEOUT),
+        ))
+        await db.commit()
+        if claimed.rowcount:
+            return job.id
+
+
+def _owned(job_id: str, worker_id: str):
+    # Изменять задачу может только воркер, который держит аренду
+    return update(Job).where(Job.id == job_id, Job.locked_by == worker_id, Job.status == "running")
+
+
+async def extend_lease(db: AsyncSession, job_id: str, worker_id: str) -> bool:
+    result = await db.execute(
+        _owned(job_id, worker_id).values(
+            locked_until=datetime.utcnow() + timedelta(seconds=settings.JOB_VISIBILITY_TIMEOUT)
+        )
+    )
+    await db.commit()
+    return result.rowcount > 0
+
+
+async def complete(db: AsyncSession, job_id: str, worker_id: str, result: Dict[str, Any]) -> bool:
+    updated = await db.execute(
+        _owned(job_id, worker_id).values(
+            status="succeeded", result=result, error=None,
+            locked_by=None, locked_until=None, finished_at=datetime.utcnow(),
+        )
+    )
+    await db.commit()
+    return updated.rowcount > 0
+
+
+async def fail(db: AsyncSession, job_id: str, worker_id: str, error: str, retryable: bool) -> Optional[str]:
+    """
+    Возвращает задачу в очередь с задержкой или помечает ее проваленной.
+    """
+    job = await db.get(Job, job_id)
+    if job is None or job.locked_by != worker_id or job.status != "running":
+        return None
+
+    now = datetime.utcnow()
+    job.error = error
+    job.locked_by = None
+    job.locked_until = None
+    if retryable and job.attempts < job.max_attempts:
+        job.status = "queued"
+        delay = backoff_delay(job.attempts - 1, settings.JOB_RETRY_BACKOFF_BASE, settings.JOB_RETRY_BACKOFF_MAX)
+        job.run_after = now + timedelta(seconds=delay)
+    else:
+        job.status = "failed"
+        job.finished_at = now
+    await db.commit()
+    return job.status
+
+
+async def release(db: AsyncSession, job_id: str, worker_id: str) -> None:
+    """
+    Возвращает незавершенную задачу в очередь без траты попытки (остановка воркера).
+    """
+    await db.execute(
+        _owned(job_id, worker_id).values(
+            status="queued", attempts=Job.attempts - 1, locked_by=None, locked_until=None,
+            run_after=datetime.utcnow(),
+        )
+    )
+    await db.commit()
+
+
+async def purge_finished(db: AsyncSession, older_than: timedelta) -> int:
+    result = await db.execute(
+        delete(Job).where(
+            Job.status.in_(TERMINAL_STATUSES),
+            Job.finished_at < datetime.utcnow() - older_than,
+        )
+    )
+    await db.commit()
+    return result.rowcount
+
+
+def _is_retryable(error: Exception) -> bool:
+    if isinstance(error, JobFailed):
+        return False
+    if isinstance(error, HTTPException):
+        # Ошибки клиента (нет шаблона, нет доступа к Google) повтором не исправить
+        return error.status_code >= 500 or error.status_code == 429
+    return True
+
+
+def _error_message(error: Exception) -> str:
+    if isinstance(error, HTTPException):
+        return str(error.detail)
+    return str(error) or error.__class__.__name__
+
+
+async def _job_template(db: AsyncSession, job: Job) -> Template:
+    template = await db.get(Template, job.template_id) if job.template_id else None
+    if template is None or template.user_id != job.user_id:
+        raise JobFailed("Template not found")
+    if not os.path.exists(template.file_path):
+        raise JobFailed(f"Template file not found: {template.file_path}")
+    return template
+
+
+async def _run_generate(db: AsyncSession, job: Job) -> Dict[str, Any]:
+    template = await _job_template(db, job)
+    values = generation.template_values(template, job.payload.get("variables", {}))
+    content_hash = await generation.template_content_hash(template)
+    key, path = await generation.render_to_cache(template, values, content_hash)
+    return {
+        "cache_key": key,
+        "filename": job.payload.get("filename") or template.filename,
+        "content_type": template.content_type,
+        "extension": os.path.splitext(path)[1],
+        "size": os.path.getsize(path),
+    }
+
+
+async def _run_google_doc(db: AsyncSession, job: Job) -> Dict[str, Any]:
+    """
+    Создание документа Google Docs.
+
+    Id созданного документа и пройденные этапы сохраняются в payload задачи
+    сразу после каждого этапа: повтор после сбоя заполняет и открывает тот же
+    документ, а не создает новый.
+    """
+    template = await _job_template(db, job)
+    user = await db.get(User, job.user_id)
+    progress = dict(job.payload.get("document") or {})
+    save_lock = asyncio.Lock()
+
+    async def save_progress(state: Dict[str, Any]) -> None:
+        # Заполнение и выдача доступа завершаются параллельно, а сессия одна
+        async with save_lock:
+            payload = {**job.payload, "document": dict(state, done=list(state.get("done", [])))}
+            await db.execute(
+                update(Job).where(Job.id == job.id).values(payload=payload)
+                .execution_options(synchronize_session=False)
+            )
+            await db.commit()
+
+    return await generation.create_google_doc(
+        user, template, job.payload.get("variables", {}),
+        progress=progress, on_progress=save_progress,
+    )
+
+
+HANDLERS: Dict[str, Callable[[AsyncSession, Job], Awaitable[Dict[str, Any]]]] = {
+    "generate": _run_generate,
+    "google_doc": _run_google_doc,
+}
+
+
+class JobWorkerPool:
+    """
+    Пул asyncio-воркеров, выполняющих задачи из таблицы jobs.
+
+    Пока задача выполняется, аренда продлевается; при остановке воркеры
+    дорабатывают текущие задачи JOB_DRAIN_TIMEOUT секунд, а незавершенные
+    возвращают в очередь.
+    """
+
+    def __init__(self, workers: int):
+        self.workers = workers
+        self._tasks: List[asyncio.Task] = []
+        self._stopping = False
+        self._wakeup: Optional[asyncio.Event] = None
+
+        self.running = 0
+        self.succeeded = 0
+        self.failed = 0
+        self.retried = 0
+        self.lost_leases = 0
+        self.released = 0
+
+    def notify(self) -> None:
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def _wait_for_work(self) -> None:
+        try:
+            await asyncio.wait_for(self._wakeup.wait(), timeout=settings.JOB_POLL_INTERVAL)
+        except asyncio.TimeoutError:
+            pass
+        self._wakeup.clear()
+
+    async def _heartbeat(self, job_id: str, worker_id: str) -> None:
+        while True:
+            await asyncio.sleep(settings.JOB_VISIBILITY_TIMEOUT / 3)
+            async with AsyncSessionLocal() as db:
+                if not await extend_lease(db, job_id, worker_id):
+                    return
+
+    async def process(self, job_id: str, worker_id: str) -> None:
+        """
+        Выполняет одну заранее забранную задачу.
+        """
+        self.running += 1
+        heartbeat = asyncio.create_task(self._heartbeat(job_id, worker_id))
+        try:
+            async with AsyncSessionLocal() as db:
+                job = await db.get(Job, job_id)
+                kind, attempt = job.kind, job.attempts
+                handler = HANDLERS.get(kind)
+                try:
+                    if handler is None:
+                        raise JobFailed(f"Unknown job kind: {kind}")
+                    result = await handler(db, job)
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    await db.rollback()
+                    status = await fail(db, job_id, worker_id, _error_message(e), _is_retryable(e))
+                    if status == "queued":
+                        self.retried += 1
+                    elif status == "failed":
+                        self.failed += 1
+                    print(f"Job {job_id} ({kind}) attempt {attempt} failed: {_error_message(e)}")
+                    return
+
+                if await complete(db, job_id, worker_id, result):
+                    self.succeeded += 1
+                else:
+                    # Аренда истекла, и задачу уже забрал другой воркер
+                    self.lost_leases += 1
+        except asyncio.CancelledError:
+            async with AsyncSessionLocal() as db:
+                await release(db, job_id, worker_id)
+            self.released += 1
+            raise
+        finally:
+            heartbeat.cancel()
+            self.running -= 1
+
+    async def _worker(self, number: int) -> None:
+        worker_id = f"{socket.gethostname()}:{os.getpid()}:{number}"
+        while not self._stopping:
+            try:
+                async with AsyncSessionLocal() as db:
+                    job_id = await claim(db, worker_id)
+            except Exception as e:
+                print(f"Job worker {worker_id} failed to claim a job: {str(e)}")
+                job_id = None
+
+            if job_id is None:
+                await self._wait_for_work()
+                continue
+            await self.process(job_id, worker_id)
+
+    def start(self) -> None:
+        if self.workers > 0 and not self._tasks:
+            self._stopping = False
+            self._wakeup = asyncio.Event()
+            loop = asyncio.get_running_loop()
+            self._tasks = [loop.create_task(self._worker(number)) for number in range(self.workers)]
+
+    async def stop(self) -> None:
+        """
+        Плавная остановка: новые задачи не забираются, текущие дорабатываются.
+        """
+        if not self._tasks:
+            return
+        self._stopping = True
+        self.notify()
+        _, pending = await asyncio.wait(self._tasks, timeout=settings.JOB_DRAIN_TIMEOUT)
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+        self._tasks = []
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "workers": len(self._tasks),
+            "running": self.running,
+            "succeeded": self.succeeded,
+            "failed": self.failed,
+            "retried": self.retried,
+            "lost_leases": self.lost_leases,
+            "released": self.released,
+        }
+
+
+pool = JobWorkerPool(settings.JOB_WORKERS)
+
+
+def start() -> None:
+    pool.start()
+
+
+async def stop() -> None:
+    await pool.stop()
@@ -0,0 +1,297 @@
+import asyncio
+import fcntl
+import hashlib
+import json
+import os
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from fastapi.concurrency import run_in_threadpool
+
+from app.core.config import settings
+
+CACHE_DIR = os.path.join(settings.UPLOAD_DIR, "cache")
+
+
+def cache_key(content_hash: str, values: Dict[str, str]) -> str:
+    """
+    Ключ результата: хэш содержимого шаблона + канонический JSON значений.
+    """
+    canonical = json.dumps(values, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(f"{content_hash}:{canonical}".encode("utf-8")).hexdigest()
+
+
+# Файл блокировки в каталоге кэша: вытеснение выполняет один процесс за раз
+LOCK_NAME = ".lock"
+
+# (mtime, ключ, путь, размер) файла результата
+Entry = Tuple[float, str, str, int]
+
+
+class OutputCache:
+    """
+    Дисковый LRU-кэш сгенерированных документов с ограничением по объему
+    и сроку хранения (ttl - секунды с последнего обращения, 0 - без срока).
+
+    Каталог общий для всех процессов приложения, поэтому лимит объема
+    проверяется по содержимому диска, а не по индексу процесса; меткой
+    последнего использования служит mtime файла. Работа с диском выполняется
+    в пуле потоков, индекс меняется только в event loop.
+
+    Одновременные запросы с одинаковым ключом объединяются в один рендеринг
+    (coalesce) - и при записи в кэш, и при рендеринге в память.
+    """
+
+    def __init__(self, directory: str, max_bytes: int, ttl: int = 0):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self._index: Optional["OrderedDict[str, Tuple[str, int]]"] = None
+        self._inflight: Dict[str, List[asyncio.Future]] = {}
+
+    def _scan(self) -> List[Entry]:
+        # Файлы результатов от давно использованных к свежим
+        entries = []
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                if name.startswith("."):
+                    # Незавершенный рендеринг или файл блокировки
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, os.path.splitext(name)[0], path, stat.st_size))
+        entries.sort()
+        return entries
+
+    def _apply_scan(self, entries: List[Entry]) -> "OrderedDict[str, Tuple[str, int]]":
+        self._index = OrderedDict((key, (path, size)) for _, key, path, size in entries)
+        self.total_bytes = sum(size for _, size in self._index.values())
+        return self._index
+
+    async def _load_index(self) -> "OrderedDict[str, Tuple[str, int]]":
+        if self._index is None:
+            entries = await run_in_threadpool(self._scan)
+            # Пока шел обход, индекс мог загрузить другой запрос
+            if self._index is None:
+                self._apply_scan(entries)
+        return self._index
+
+    def _path_for(self, key: str, extension: str) -> str:
+        return os.path.join(self.directory, key[:2], f"{key}{extension}")
+
+    @staticmethod
+    def _touch(path: str) -> Optional[int]:
+        # mtime служит меткой последнего использования для LRU и ttl
+        try:
+            os.utime(path)
+            return os.path.getsize(path)
+        except FileNotFoundError:
+            return None
+
+    async def lookup(self, key: str, extension: Optional[str] = None) -> Optional[str]:
+        index = await self._load_index()
+        entry = index.get(key)
+        if entry is not None:
+            path = entry[0]
+        elif extension is not None:
+            # Результат мог записать другой процесс после загрузки индекса
+            path = self._path_for(key, extension)
+        else:
+            return None
+
+        size = await run_in_threadpool(self._touch, path)
+        if size is None:
+            # Файл вытеснил другой процесс
+            if index.pop(key, None) is not None:
+                self.total_bytes -= entry[1]
+            return None
+        if key not in index:
+            index[key] = (path, size)
+            self.total_bytes += size
+        index.move_to_end(key)
+        return path
+
+    def _place(self, tmp_path: str, path: str) -> None:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        os.replace(tmp_path, path)
+        # Новый результат - самый свежий, даже если рендеринг начался давно
+        os.utime(path)
+
+    def _evict_on_disk(self, keep: Optional[str] = None) -> Tuple[int, List[Entry]]:
+        """
+        Удаляет давно использованные файлы, пока объем каталога больше max_bytes.
+
+        Возвращает число удаленных файлов и оставшиеся записи.
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        with open(os.path.join(self.directory, LOCK_NAME), "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            entries = self._scan()
+            total = sum(entry[3] for entry in entries)
+            kept = []
+            evicted = 0
+            for position, entry in enumerate(entries):
+                # Самый свежий элемент не вытесняем, даже если он больше лимита
+                last = position == len(entries) - 1
+                if total <= self.max_bytes or last or entry[2] == keep:
+                    kept.append(entry)
+                    continue
+                try:
+                    os.remove(entry[2])
+                except FileNotFoundError:
+                    pass
+                total -= entry[3]
+                evicted += 1
+        return evicted, kept
+
+    async def _insert(self, key: str, extension: str, tmp_path: str) -> str:
+        path = self._path_for(key, extension)
+        await run_in_threadpool(self._place, tmp_path, path)
+        evicted, entries = await run_in_threadpool(self._evict_on_disk, path)
+        self.evictions += evicted
+        self._apply_scan(entries)
+        return path
+
+    def _expire_on_disk(self, cutoff: float) -> Tuple[int, List[Entry]]:
+        entries = self._scan()
+        # Записи упорядочены по последнему использованию - старые в начале
+        expired = next((i for i, entry in enumerate(entries) if entry[0] >= cutoff), len(entries))
+        for _, _, path, _ in entries[:expired]:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+        if os.path.isdir(self.directory):
+            for name in os.listdir(self.directory):
+                path = os.path.join(self.directory, name)
+                # Временные файлы рендеринга начинаются с точки; свежие еще пишутся
+                if not name.startswith(".") or name == LOCK_NAME:
+                    continue
+                try:
+                    if os.path.getmtime(path) < cutoff:
+                        os.remove(path)
+                except FileNotFoundError:
+                    pass
+        return expired, entries[expired:]
+
+    async def expire(self) -> int:
+        """
+        Удаляет записи, к которым не обращались дольше ttl, и брошенные
+        временные файлы рендеринга. Возвращает число удаленных записей.
+        """
+        if not self.ttl:
+            return 0
+        expired, entries = await run_in_threadpool(self._expire_on_disk, time.time() - self.ttl)
+        self._apply_scan(entries)
+        self.expirations += expired
+        return expired
+
+    async def coalesce(
+        self,
+        key: str,
+        produce: Callable[[], Awaitable[Any]],
+        share: Callable[[Any], Any] = lambda result: result,
+    ) -> Any:
+        """
+        Выполняет produce() один раз для всех одновременных запросов с ключом key.
+
+        Присоединившийся запрос получает share(result). share вызывается до
+        того, как результат вернется инициатору, поэтому может, например,
+        выдать каждому запросу свою копию временного файла.
+
+        produce() выполняется отдельной задачей: отмена инициатора не отменяет
+        рендеринг, пока его ждет хотя бы один присоединившийся запрос.
+        """
+        waiters = self._inflight.get(key)
+        if waiters is not None:
+            # Такой же документ уже рендерится - ждем его
+            self.hits += 1
+            waiter = asyncio.get_running_loop().create_future()
+            waiters.append(waiter)
+            return await waiter
+
+        self.misses += 1
+        waiters = self._inflight[key] = []
+
+        def finish(task: asyncio.Task) -> None:
+            if self._inflight.get(key) is waiters:
+                del self._inflight[key]
+            for waiter in waiters:
+                # Запрос мог быть отменен, пока ждал
+                if waiter.done():
+                    continue
+                if task.cancelled():
+                    waiter.cancel()
+                elif task.exception() is not None:
+                    waiter.set_exception(task.exception())
+                else:
+                    try:
+                        waiter.set_result(share(task.result()))
+                    except Exception as e:
+                        waiter.set_exception(e)
+
+        task = asyncio.ensure_future(produce())
+        task.add_done_callback(finish)
+        try:
+            return await asyncio.shield(task)
+        except asyncio.CancelledError:
+            if not task.done() and all(waiter.done() for waiter in waiters):
+                # Результат больше никому не нужен; новые запросы начнут заново
+                if self._inflight.get(key) is waiters:
+                    del self._inflight[key]
+                task.cancel()
+            raise
+
+    async def get_or_render(
+        self,
+        key: str,
+        extension: str,
+        render: Callable[[str], Awaitable[None]],
+    ) -> str:
+        """
+        Возвращает путь к закэшированному результату, при промахе вызывает render(tmp_path).
+        """
+        path = await self.lookup(key)
+        if path is not None:
+            self.hits += 1
+            return path
+
+        async def produce() -> str:
+            tmp_path = os.path.join(self.directory, f".{uuid.uuid4().hex}{extension}")
+            try:
+                os.makedirs(self.directory, exist_ok=True)
+                await render(tmp_path)
+                return await self._insert(key, extension, tmp_path)
+            finally:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+
+        return await self.coalesce(key, produce)
+
+    async def stats(self) -> Dict[str, int]:
+        index = await self._load_index()
+        return {
+            "entries": len(index),
+            "total_bytes": self.total_bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "ttl": self.ttl,
+            "inflight": len(self._inflight),
+        }
+
+
+output_cache = OutputCache(CACHE_DIR, settings.OUTPUT_CACHE_MAX_BYTES, settings.OUTPUT_CACHE_TTL)
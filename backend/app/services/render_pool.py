@@ -0,0 +1,167 @@
+import asyncio
+import functools
+import multiprocessing
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+from fastapi import HTTPException
+
+from app.core.config import settings
+
+
+class RenderQueueFull(HTTPException):
+    """
+    Очередь пула переполнена - клиенту стоит повторить запрос позже.
+    """
+
+    def __init__(self):
+        super().__init__(
+            status_code=503,
+            detail="Document processing queue is full, try again later",
+            headers={"Retry-After": "1"},
+        )
+
+
+def _preload() -> None:
+    # Импортируем тяжелые модули один раз при старте процесса-воркера
+    import docx  # noqa: F401
+    import lxml.etree  # noqa: F401
+    import app.utils.document_parser  # noqa: F401
+    import app.utils.render_plan  # noqa: F401
+
+
+class RenderPool:
+    """
+    Ограниченный пул процессов для разбора и рендеринга документов.
+
+    Одновременно выполняется не больше max_workers задач, еще max_queue
+    ждут своей очереди; остальные запросы сразу получают 503.
+    """
+
+    def __init__(self, max_workers: int, max_queue: int):
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._executor_lock = threading.Lock()
+        self._slots = asyncio.Semaphore(max_workers)
+
+        self.queued = 0
+        self.running = 0
+        self.started = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    @property
+    def executor(self) -> ProcessPoolExecutor:
+        with self._executor_lock:
+            if self._executor is None:
+                # forkserver: воркеры не наследуют потоки, блокировки и соединения
+                # уже работающего приложения, как было бы при fork
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.max_workers,
+                    mp_context=multiprocessing.get_context("forkserver"),
+                    initializer=_preload,
+                )
+            return self._executor
+
+    async def run(self, fn: Callable, *args: Any, **kwargs: Any) -> Any:
+        """
+        Выполняет fn(*args, **kwargs) в процессе пула, не блокируя event loop.
+        """
+        if self.queued >= self.max_queue:
+            self.rejected += 1
+            raise RenderQueueFull()
+        return await self._run(fn, args, kwargs)
+
+    async def run_admitted(self, fn: Callable, *args: Any, **kwargs: Any) -> Any:
+        """
+        Как run, но без отказа при переполненной очереди.
+
+        Для задач уже принятого запроса (строки пакета): их число в очереди
+        ограничивает сам вызывающий.
+        """
+        return await self._run(fn, args, kwargs)
+
+    async def _run(self, fn: Callable, args: tuple, kwargs: Dict[str, Any]) -> Any:
+        self.queued += 1
+        enqueued_at = time.monotonic()
+        try:
+            await self._slots.acquire()
+        finally:
+            self.queued -= 1
+
+        wait = time.monotonic() - enqueued_at
+        self.started += 1
+        self.total_wait += wait
+        self.max_wait = max(self.max_wait, wait)
+
+        self.running += 1
+        loop = asyncio.get_running_loop()
+        try:
+            future = self.executor.submit(functools.partial(fn, *args, **kwargs))
+        except Exception:
+            self.running -= 1
+            self.failed += 1
+            self._slots.release()
+            raise
+        # Слот освобождается, когда процесс закончил задачу, а не когда
+        # перестал ждать запрос: отмена запроса не останавливает процесс
+        future.add_done_callback(lambda done: self._call_in_loop(loop, self._finish, done))
+        return await asyncio.wrap_future(future)
+
+    @staticmethod
+    def _call_in_loop(loop: asyncio.AbstractEventLoop, callback: Callable, *args: Any) -> None:
+        try:
+            loop.call_soon_threadsafe(callback, *args)
+        except RuntimeError:
+            # Event loop уже закрыт (остановка приложения)
+            pass
+
+    def _finish(self, future: Future) -> None:
+        self.running -= 1
+        self._slots.release()
+        if future.cancelled():
+            return
+        if future.exception() is not None:
+            self.failed += 1
+        else:
+            self.completed += 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "max_workers": self.max_workers,
+            "max_queue": self.max_queue,
+            "queue_depth": self.queued,
+            "running": self.running,
+            "completed": self.completed,
+            "failed": self.failed,
+            "rejected": self.rejected,
+            "avg_wait_ms": round(self.total_wait / self.started * 1000, 2) if self.started else 0.0,
+            "max_wait_ms": round(self.max_wait * 1000, 2),
+        }
+
+    def shutdown(self) -> None:
+        with self._executor_lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=True)
+                self._executor = None
+
+
+pool = RenderPool(max_workers=settings.RENDER_WORKERS, max_queue=settings.RENDER_QUEUE_SIZE)
+
+
+async def run(fn: Callable, *args: Any, **kwargs: Any) -> Any:
+    return await pool.run(fn, *args, **kwargs)
+
+
+async def run_admitted(fn: Callable, *args: Any, **kwargs: Any) -> Any:
+    return await pool.run_admitted(fn, *args, **kwargs)
+
+
+def shutdown() -> None:
+    pool.shutdown()
@@ -0,0 +1,211 @@
+import asyncio
+import os
+import time
+from datetime import timedelta
+from typing import Any, Dict, Iterable, Optional, Set
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import select, update
+
+from app.core.config import settings
+from app.db.database import AsyncSessionLocal
+from app.models.template import Template
+from app.services import jobs
+from app.services.output_cache import CACHE_DIR, output_cache
+from app.services.storage import TMP_DIR
+
+# Каталог, куда старые версии сохраняли каждый сгенерированный документ
+GENERATED_DIR = os.path.join(settings.UPLOAD_DIR, "generated")
+
+# Сколько шаблонов без размера дозаполнять за один проход
+BACKFILL_BATCH = 500
+
+_last_run: Dict[str, Any] = {}
+_runs = 0
+_task: Optional[asyncio.Task] = None
+
+
+def _remove_older_than(path: str, cutoff: float) -> int:
+    try:
+        if os.path.getmtime(path) >= cutoff:
+            return 0
+        size = os.path.getsize(path)
+        os.remove(path)
+    except FileNotFoundError:
+        return 0
+    return size
+
+
+def sweep_generated(directory: str = GENERATED_DIR, ttl: Optional[int] = None) -> Dict[str, int]:
+    """
+    Удаляет сгенерированные документы старше ttl из каталога generated.
+    """
+    ttl = settings.OUTPUT_CACHE_TTL if ttl is None else ttl
+    removed = freed = 0
+    if not ttl or not os.path.isdir(directory):
+        return {"removed": removed, "freed_bytes": freed}
+
+    cutoff = time.time() - ttl
+    for root, _, files in os.walk(directory):
+        for name in files:
+            size = _remove_older_than(os.path.join(root, name), cutoff)
+            if size:
+                removed += 1
+                freed += size
+    return {"removed": removed, "freed_bytes": freed}
+
+
+def _iter_storage_files(upload_dir: str) -> Iterable[str]:
+    # Кэш и generated чистятся по TTL, tmp - отдельно
+    skip = {os.path.basename(CACHE_DIR), os.path.basename(GENERATED_DIR), os.path.basename(TMP_DIR)}
+    for root, dirs, files in os.walk(upload_dir):
+        if root == upload_dir:
+            dirs[:] = [d for d in dirs if d not in skip]
+        for name in files:
+            yield os.path.join(root, name)
+
+
+def remove_orphans(
+    referenced: Set[str],
+    upload_dir: Optional[str] = None,
+    grace_period: Optional[int] = None,
+) -> Dict[str, int]:
+    """
+    Удаляет файлы хранилища, на которые не ссылается ни один шаблон.
+
+    Файлы моложе grace_period не трогаем: их могли только что сохранить,
+    а строку шаблона еще не закоммитить.
+    """
+    upload_dir = upload_dir or settings.UPLOAD_DIR
+    grace_period = settings.ORPHAN_GRACE_PERIOD if grace_period is None else grace_period
+    cutoff = time.time() - grace_period
+    referenced = {os.path.abspath(path) for path in referenced}
+    removed = freed = 0
+
+    for path in _iter_storage_files(upload_dir):
+        if os.path.abspath(path) in referenced:
+            continue
+        size = _remove_older_than(path, cutoff)
+        if size:
+            removed += 1
+            freed += size
+
+    # Брошенные временные файлы прерванных загрузок
+    tmp_dir = os.path.join(upload_dir, os.path.basename(TMP_DIR))
+    if os.path.isdir(tmp_dir):
+        for name in os.listdir(tmp_dir):
+            size = _remove_older_than(os.path.join(tmp_dir, name), cutoff)
+            if size:
+                removed += 1
+                freed += size
+
+    return {"removed": removed, "freed_bytes": freed}
+
+
+async def reconcile_orphans() -> Dict[str, int]:
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(select(Template.file_path).where(Template.file_path.isnot(None)))
+        referenced = set(result.scalars().all())
+    return await run_in_threadpool(remove_orphans, referenced)
+
+
+def _file_sizes(paths: Iterable[str]) -> Dict[str, int]:
+    sizes = {}
+    for path in paths:
+        try:
+            sizes[path] = os.path.getsize(path)
+        except OSError:
+            sizes[path] = 0
+    return sizes
+
+
+async def backfill_file_sizes() -> int:
+    """
+    Заполняет размер у шаблонов, загруженных до появления квот.
+    """
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(
+            select(Template.id, Template.file_path).where(Template.file_size.is_(None)).limit(BACKFILL_BATCH)
+        )
+        rows = result.all()
+        if not rows:
+            return 0
+        sizes = await run_in_threadpool(_file_sizes, {file_path for _, file_path in rows if file_path})
+        for template_id, file_path in rows:
+            await db.execute(
+                update(Template).where(Template.id == template_id).values(file_size=sizes.get(file_path, 0))
+            )
+        await db.commit()
+    return len(rows)
+
+
+async def purge_jobs() -> int:
+    """
+    Удаляет завершенные фоновые задачи старше JOB_RESULT_TTL.
+    """
+    if not settings.JOB_RESULT_TTL:
+        return 0
+    async with AsyncSessionLocal() as db:
+        return await jobs.purge_finished(db, timedelta(seconds=settings.JOB_RESULT_TTL))
+
+
+async def run_retention() -> Dict[str, Any]:
+    """
+    Один проход очистки: TTL сгенерированных файлов, сироты и размеры для квот.
+    """
+    global _last_run, _runs
+    started = time.monotonic()
+    summary = {
+        "generated": await run_in_threadpool(sweep_generated),
+        "output_cache_expired": await output_cache.expire(),
+        "orphans": await reconcile_orphans(),
+        "sizes_backfilled": await backfill_file_sizes(),
+        "jobs_purged": await purge_jobs(),
+    }
+    summary["duration_ms"] = round((time.monotonic() - started) * 1000, 2)
+    summary["finished_at"] = time.time()
+    _last_run = summary
+    _runs += 1
+    return summary
+
+
+def retention_stats() -> Dict[str, Any]:
+    return {
+        "interval": settings.RETENTION_INTERVAL,
+        "output_cache_ttl": settings.OUTPUT_CACHE_TTL,
+        "orphan_grace_period": settings.ORPHAN_GRACE_PERIOD,
+        "runs": _runs,
+        "last_run": _last_run,
+    }
+
+
+async def _run_periodically() -> None:
+    while True:
+        try:
+            summary = await run_retention()
+            freed = summary["generated"]["freed_bytes"] + summary["orphans"]["freed_bytes"]
+            if freed or summary["output_cache_expired"]:
+                print(
+                    f"Retention: freed {freed} bytes, "
+                    f"expired {summary['output_cache_expired']} cached documents"
+                )
+        except Exception as e:
+            print(f"Retention job error: {str(e)}")
+        await asyncio.sleep(settings.RETENTION_INTERVAL)
+
+
+def start() -> None:
+    global _task
+    if settings.RETENTION_INTERVAL > 0 and _task is None:
+        _task = asyncio.get_running_loop().create_task(_run_periodically())
+
+
+async def stop() -> None:
+    global _task
+    if _task is not None:
+        _task.cancel()
+        try:
+            await _task
+        except asyncio.CancelledError:
+            pass
+        _task = None
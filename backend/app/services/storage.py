@@ -0,0 +1,193 @@
+import hashlib
+import os
+import uuid
+from dataclasses import dataclass
+from typing import Optional, Tuple
+
+from fastapi import HTTPException, UploadFile
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.models.template import Template
+from app.utils.encoding import detect_file_encoding, iter_utf8
+from app.utils.uploads import UploadTooLarge, save_upload
+
+OBJECTS_DIR = os.path.join(settings.UPLOAD_DIR, "objects")
+TMP_DIR = os.path.join(settings.UPLOAD_DIR, "tmp")
+
+
+class StorageQuotaExceeded(HTTPException):
+    def __init__(self, quota: int):
+        super().__init__(
+            status_code=413,
+            detail=f"Storage quota exceeded, limit is {quota} bytes per user",
+        )
+
+
+class UnknownTextEncoding(HTTPException):
+    def __init__(self):
+        super().__init__(
+            status_code=415,
+            detail="Could not detect the text encoding, save the file as UTF-8",
+        )
+
+
+@dataclass(frozen=True)
+class StoredObject:
+    file_path: str
+    content_hash: str
+    size: int
+    existed: bool
+    # Кодировка текстового содержимого; None для двоичных файлов
+    encoding: Optional[str] = None
+
+
+def object_path(content_hash: str, filename: str) -> str:
+    """
+    Путь объекта в хранилище: uploads/objects/ab/cd/<sha256><расширение>.
+
+    Расширение сохраняется, так как по нему определяется тип шаблона.
+    Объекты без ссылок удаляет только retention.remove_orphans (после
+    ORPHAN_GRACE_PERIOD), а не запросы: иначе удаление последнего шаблона
+    может стереть объект, который параллельная загрузка уже переиспользовала.
+    """
+    extension = os.path.splitext(filename or "")[1].lower()
+    return os.path.join(OBJECTS_DIR, content_hash[:2], content_hash[2:4], f"{content_hash}{extension}")
+
+
+def _commit_object(
+    tmp_path: str, content_hash: str, size: int, filename: str, encoding: Optional[str] = None
+) -> StoredObject:
+    file_path = object_path(content_hash, filename)
+    if os.path.exists(file_path):
+        # Такое содержимое уже есть - второй экземпляр не нужен.
+        # Обновляем mtime, чтобы сборщик сирот не удалил объект до записи в базу
+        os.remove(tmp_path)
+        os.utime(file_path)
+        return StoredObject(file_path=file_path, content_hash=content_hash, size=size, existed=True, encoding=encoding)
+
+    os.makedirs(os.path.dirname(file_path), exist_ok=True)
+    os.replace(tmp_path, file_path)
+    return StoredObject(file_path=file_path, content_hash=content_hash, size=size, existed=False, encoding=encoding)
+
+
+def _normalize_text_file(tmp_path: str, content_hash: str, size: int) -> Tuple[str, int, Optional[str]]:
+    """
+    Перекодирует загруженный текст в UTF-8 до помещения в хранилище.
+
+    Файл читается и пишется по частям. Если кодировку определить не удалось,
+    загрузка отклоняется, а не перекодируется наугад.
+    """
+    source_encoding = detect_file_encoding(tmp_path)
+    if source_encoding is None:
+        raise UnknownTextEncoding()
+    if source_encoding == 'utf-8':
+        return content_hash, size, 'utf-8'
+
+    print(f"Normalized text upload from {source_encoding} to utf-8")
+    normalized_path = f"{tmp_path}.utf8"
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        with open(normalized_path, 'wb') as f:
+            for chunk in iter_utf8(tmp_path, source_encoding):
+                f.write(chunk)
+                digest.update(chunk)
+                size += len(chunk)
+        os.replace(normalized_path, tmp_path)
+    finally:
+        if os.path.exists(normalized_path):
+            os.remove(normalized_path)
+    return digest.hexdigest(), size, 'utf-8'
+
+
+async def store_upload(
+    file: UploadFile, normalize_text: bool = False, max_size: Optional[int] = None
+) -> StoredObject:
+    """
+    Сохраняет загрузку в хранилище с адресацией по содержимому.
+
+    С normalize_text (загрузки text/*) кодировка определяется один раз, а текст
+    хранится в UTF-8.
+    """
+    os.makedirs(TMP_DIR, exist_ok=True)
+    tmp_path = os.path.join(TMP_DIR, uuid.uuid4().hex)
+    stored = await save_upload(file, tmp_path, max_size=max_size)
+    content_hash, size, encoding = stored.content_hash, stored.size, None
+    if normalize_text:
+        try:
+            content_hash, size, encoding = await run_in_threadpool(_normalize_text_file, tmp_path, content_hash, size)
+        except Exception:
+            os.remove(tmp_path)
+            raise
+    return _commit_object(tmp_path, content_hash, size, file.filename, encoding)
+
+
+def store_bytes(data: bytes, filename: str, encoding: Optional[str] = None) -> StoredObject:
+    """
+    Сохраняет готовое содержимое (например, отредактированный текст) в хранилище.
+    """
+    os.makedirs(TMP_DIR, exist_ok=True)
+    tmp_path = os.path.join(TMP_DIR, uuid.uuid4().hex)
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    return _commit_object(tmp_path, hashlib.sha256(data).hexdigest(), len(data), filename, encoding)
+
+
+async def get_storage_used(db: AsyncSession, user_id: int) -> int:
+    """
+    Объем, занятый шаблонами пользователя (общие объекты считаются у каждого владельца).
+    """
+    result = await db.execute(
+        select(func.coalesce(func.sum(Template.file_size), 0)).where(Template.user_id == user_id)
+    )
+    return int(result.scalar_one())
+
+
+async def get_remaining_quota(db: AsyncSession, user_id: int) -> Optional[int]:
+    """
+    Сколько байт пользователь еще может загрузить; None - квота не ограничена.
+    """
+    if not settings.USER_STORAGE_QUOTA:
+        return None
+    return max(0, settings.USER_STORAGE_QUOTA - await get_storage_used(db, user_id))
+
+
+async def check_quota(db: AsyncSession, user_id: int, size: int, released: int = 0) -> None:
+    """
+    Проверяет, что после записи size байт (и освобождения released) квота не превышена.
+    """
+    remaining = await get_remaining_quota(db, user_id)
+    if remaining is not None and size - released > remaining:
+        raise StorageQuotaExceeded(settings.USER_STORAGE_QUOTA)
+
+
+async def store_upload_within_quota(
+    db: AsyncSession, user_id: int, file: UploadFile, normalize_text: bool = False
+) -> StoredObject:
+    """
+    Сохраняет загрузку, прерывая запись, как только она выходит за квоту пользователя.
+    """
+    remaining = await get_remaining_quota(db, user_id)
+    if remaining is None:
+        return await store_upload(file, normalize_text=normalize_text)
+    if remaining == 0:
+        raise StorageQuotaExceeded(settings.USER_STORAGE_QUOTA)
+
+    max_size = min(settings.MAX_UPLOAD_SIZE, remaining) if settings.MAX_UPLOAD_SIZE else remaining
+    try:
+        stored = await store_upload(file, normalize_text=normalize_text, max_size=max_size)
+    except UploadTooLarge:
+        # Лимит файла меньше остатка квоты - файл слишком велик сам по себе
+        if max_size < remaining:
+            raise
+        raise StorageQuotaExceeded(settings.USER_STORAGE_QUOTA)
+
+    # Перекодирование в UTF-8 может увеличить размер текста.
+    # Объект не удаляем: его могла только что переиспользовать параллельная
+    # загрузка, а без ссылок его уберет сборщик сирот
+    if stored.size > remaining:
+        raise StorageQuotaExceeded(settings.USER_STORAGE_QUOTA)
+    return stored
@@ -0,0 +1,69 @@
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import NullPool
+
+import app.models  # noqa: F401
+from app.api import deps
+from app.api.v1.endpoints import jobs as jobs_endpoints
+from app.db import database
+from app.db.base_class import Base
+from app.main import app
+from app.models.user import User
+from app.services import google_credentials, jobs, retention, storage
+from app.services.output_cache import output_cache
+
+# Модули, которые открывают сессии сами, а не через get_async_db
+SESSION_MODULES = (database, google_credentials, jobs, jobs_endpoints, retention)
+
+
+@pytest.fixture
+def database_url(tmp_path):
+    url = f"sqlite:///{tmp_path / 'test.db'}"
+    engine = create_engine(url)
+    Base.metadata.create_all(engine)
+    engine.dispose()
+    return url
+
+
+@pytest.fixture
+def session_factory(database_url, monkeypatch):
+    """
+    Фабрика async-сессий над SQLite во временном каталоге, подставленная вместо AsyncSessionLocal.
+    """
+    # NullPool: соединение не переживает event loop, в котором открыто
+    # (TestClient выполняет запросы в своем цикле)
+    engine = create_async_engine(database_url.replace("sqlite://", "sqlite+aiosqlite://"), poolclass=NullPool)
+    factory = async_sessionmaker(engine, expire_on_commit=False)
+    for module in SESSION_MODULES:
+        monkeypatch.setattr(module, "AsyncSessionLocal", factory)
+    return factory
+
+
+@pytest.fixture
+def user(database_url):
+    engine = create_engine(database_url)
+    with Session(engine, expire_on_commit=False) as db:
+        user = User(email="user@example.com", hashed_password="x")
+        db.add(user)
+        db.commit()
+    engine.dispose()
+    return user
+
+
+@pytest.fixture
+def client(session_factory, user, tmp_path, monkeypatch):
+    """
+    TestClient от имени user; хранилище и кэш результатов - во временном каталоге.
+
+    Без with: события startup (воркеры задач, очистка) не запускаются.
+    """
+    monkeypatch.setattr(storage, "OBJECTS_DIR", str(tmp_path / "objects"))
+    monkeypatch.setattr(storage, "TMP_DIR", str(tmp_path / "tmp"))
+    monkeypatch.setattr(output_cache, "directory", str(tmp_path / "cache"))
+    monkeypatch.setattr(output_cache, "_index", None)
+    app.dependency_overrides[deps.get_current_user] = lambda: user
+    yield TestClient(app)
+    app.dependency_overrides.clear()
@@ -0,0 +1,65 @@
+import io
+import zipfile
+
+from docx import Document
+
+from app.services import render_pool
+from app.services.batch_generation import iter_batch_zip, parse_variable_rows, render_row
+
+
+def test_parse_csv_rows():
+    rows = parse_variable_rows("name,amount\nИван,10\nПетр,\n".encode("utf-8"), "text/csv")
+    assert rows == [{"name": "Иван", "amount": "10"}, {"name": "Петр", "amount": ""}]
+
+
+def test_parse_jsonl_rows():
+    body = b'{"name": "A", "amount": 1}\n\n{"name": null}\n'
+    rows = parse_variable_rows(body, "application/x-ndjson")
+    assert rows == [{"name": "A", "amount": "1"}, {"name": ""}]
+
+
+def _letter(tmp_path) -> str:
+    path = str(tmp_path / "letter.docx")
+    doc = Document()
+    doc.add_paragraph("Здравствуйте, ##name##!")
+    doc.save(path)
+    return path
+
+
+async def _collect(chunks) -> bytes:
+    return b"".join([chunk async for chunk in chunks])
+
+
+async def test_iter_batch_zip(tmp_path):
+    path = _letter(tmp_path)
+    rows = [{"name": "Иван"}, {"name": "Петр"}, {"name": "Анна"}]
+    first = await render_row(path, ["name"], rows[0])
+    completed = render_pool.pool.completed
+
+    data = await _collect(iter_batch_zip(path, "letter.docx", ["name"], rows, first))
+
+    # Остальные строки прошли через пул и попали в его статистику
+    assert render_pool.pool.completed == completed + 2
+    with zipfile.ZipFile(io.BytesIO(data)) as archive:
+        names = archive.namelist()
+        assert names == ["00001_letter.docx", "00002_letter.docx", "00003_letter.docx"]
+        rendered = Document(io.BytesIO(archive.read(names[2])))
+        assert rendered.paragraphs[0].text == "Здравствуйте, Анна!"
+
+
+async def test_iter_batch_zip_lists_failed_rows(tmp_path, monkeypatch):
+    path = _letter(tmp_path)
+    rows = [{"name": "Иван"}, {"name": "Петр"}, {"name": "Анна"}]
+
+    async def run_admitted(fn, file_path, values, *args):
+        if values["name"] == "Петр":
+            raise RuntimeError("worker crashed")
+        return fn(file_path, values, *args)
+
+    monkeypatch.setattr(render_pool, "run_admitted", run_admitted)
+    data = await _collect(iter_batch_zip(path, "letter.docx", ["name"], rows, b"first"))
+
+    # Архив остается целым, а сбой виден клиенту
+    with zipfile.ZipFile(io.BytesIO(data)) as archive:
+        assert archive.namelist() == ["00001_letter.docx", "00003_letter.docx", "ERRORS.txt"]
+        assert archive.read("ERRORS.txt").decode() == "row 2: worker crashed\n"
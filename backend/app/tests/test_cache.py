@@ -0,0 +1,33 @@
+from app.utils.cache import LRUCache, TTLCache
+
+
+def test_lru_cache_evicts_oldest():
+    cache = LRUCache(maxsize=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+
+
+def test_ttl_cache_expires_entries():
+    cache = TTLCache(maxsize=10, ttl=0)
+    cache.set("user@example.com", "snapshot")
+
+    assert cache.get("user@example.com") is None
+    assert cache.stats()["misses"] == 1
+
+
+def test_ttl_cache_invalidation():
+    cache = TTLCache(maxsize=10, ttl=60)
+    cache.set("user@example.com", "snapshot")
+
+    assert cache.get("user@example.com") == "snapshot"
+    cache.pop("user@example.com")
+    assert cache.get("user@example.com") is None
+    assert cache.stats() == {
+        "size": 0, "maxsize": 10, "ttl": 60, "hits": 1, "misses": 1, "invalidations": 1,
+    }
@@ -0,0 +1,38 @@
+from docx import Document
+
+from app.utils.document_parser import extract_docx_preview_text, extract_template_info
+
+
+def test_extract_template_info_builds_preview(tmp_path):
+    path = str(tmp_path / "template.docx")
+    doc = Document()
+    doc.add_paragraph("Клиент: ##client_name##")
+    doc.add_paragraph("")
+    table = doc.add_table(rows=1, cols=2)
+    table.cell(0, 0).text = "Сумма"
+    table.cell(0, 1).text = "##amount##"
+    doc.save(path)
+
+    info = extract_template_info(path)
+
+    assert set(info["variables"]) == {"client_name", "amount"}
+    assert info["is_template"]
+    assert info["preview_text"] == (
+        "Клиент: ##client_name##\n\n"
+        "\n--- Table ---\n"
+        "Сумма | ##amount##\n"
+        "--- End Table ---\n\n"
+    )
+    assert info["preview_text"] == extract_docx_preview_text(path)
+
+
+def test_extract_template_info_finds_header_variables(tmp_path):
+    path = str(tmp_path / "template.docx")
+    doc = Document()
+    doc.sections[0].header.paragraphs[0].text = "##company##"
+    paragraph = doc.add_paragraph()
+    paragraph.add_run("##cli")
+    paragraph.add_run("ent##")
+    doc.save(path)
+
+    assert extract_template_info(path)["variables"] == ["client", "company"]
@@ -0,0 +1,31 @@
+from app.utils.encoding import detect_encoding, detect_file_encoding, iter_utf8, read_text
+
+
+def test_detect_encoding():
+    assert detect_encoding("Привет".encode("utf-8")) == "utf-8"
+    assert detect_encoding("Привет".encode("cp1251")) == "cp1251"
+    assert detect_encoding("﻿Привет".encode("utf-8")) == "utf-8-sig"
+    assert detect_encoding(b"%PDF-1.4\x00\x01") is None
+
+
+def test_detect_encoding_refuses_undecodable_text():
+    # Ни UTF-8, ни cp1251 (0x98 в cp1251 не определен) - угадывать не беремся
+    assert detect_encoding(b"\x98\xff") is None
+
+
+def test_transcode_in_chunks_and_read(tmp_path):
+    path = tmp_path / "bom.txt"
+    path.write_bytes("\ufeffСчет ##n##".encode("utf-8"))
+    assert detect_file_encoding(str(path), chunk_size=3) == "utf-8-sig"
+    assert b"".join(iter_utf8(str(path), "utf-8-sig", chunk_size=3)) == "Счет ##n##".encode("utf-8")
+
+    # Части по 3 байта режут двухбайтовые символы UTF-16 - декодер собирает их сам
+    path = tmp_path / "utf16.txt"
+    path.write_bytes("Счет ##n##".encode("utf-16"))
+    assert detect_file_encoding(str(path), chunk_size=3) == "utf-16"
+    assert b"".join(iter_utf8(str(path), "utf-16", chunk_size=3)) == "Счет ##n##".encode("utf-8")
+
+    path = tmp_path / "legacy.txt"
+    path.write_bytes("Счет ##n##".encode("cp1251"))
+    assert detect_file_encoding(str(path), chunk_size=3) == "cp1251"
+    assert read_text(str(path)) == "Счет ##n##"
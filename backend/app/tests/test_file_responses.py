@@ -0,0 +1,107 @@
+import pytest
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+
+from app.core.config import settings
+from app.utils.file_responses import file_download, parse_range, spooled_download
+
+
+def test_parse_range():
+    assert parse_range("bytes=0-9", 100) == (0, 9)
+    assert parse_range("bytes=90-", 100) == (90, 99)
+    assert parse_range("bytes=-10", 100) == (90, 99)
+    assert parse_range("bytes=0-1000", 100) == (0, 99)
+    assert parse_range("bytes=0-1,5-6", 100) is None
+    with pytest.raises(ValueError):
+        parse_range("bytes=100-", 100)
+
+
+def _client(path):
+    app = FastAPI()
+
+    @app.get("/file")
+    def download(request: Request):
+        return file_download(request, str(path), filename="шаблон.txt", media_type="text/plain", etag='"abc"')
+
+    return TestClient(app)
+
+
+def test_file_download_etag_and_range(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "X_ACCEL_REDIRECT_PREFIX", "")
+    path = tmp_path / "file.txt"
+    path.write_bytes(b"0123456789")
+    client = _client(path)
+
+    full = client.get("/file")
+    assert full.status_code == 200
+    assert full.headers["etag"] == '"abc"'
+    assert full.headers["accept-ranges"] == "bytes"
+
+    assert client.get("/file", headers={"If-None-Match": '"abc"'}).status_code == 304
+
+    partial = client.get("/file", headers={"Range": "bytes=2-4"})
+    assert partial.status_code == 206
+    assert partial.content == b"234"
+    assert partial.headers["content-range"] == "bytes 2-4/10"
+
+    stale = client.get("/file", headers={"Range": "bytes=2-4", "If-Range": '"old"'})
+    assert stale.status_code == 200
+    assert client.get("/file", headers={"Range": "bytes=20-"}).status_code == 416
+
+
+def test_file_download_offload(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "UPLOAD_DIR", str(tmp_path))
+    monkeypatch.setattr(settings, "X_ACCEL_REDIRECT_PREFIX", "/protected-uploads/")
+    path = tmp_path / "objects" / "ab" / "file.txt"
+    path.parent.mkdir(parents=True)
+    path.write_bytes(b"0123456789")
+
+    response = _client(path).get("/file")
+
+    assert response.status_code == 200
+    assert response.headers["x-accel-redirect"] == "/protected-uploads/objects/ab/file.txt"
+    assert response.headers["etag"] == '"abc"'
+    assert response.content == b""
+
+
+def test_file_download_offloads_to_nginx(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "UPLOAD_DIR", str(tmp_path))
+    monkeypatch.setattr(settings, "X_ACCEL_REDIRECT_PREFIX", "/protected-uploads/")
+    path = tmp_path / "objects" / "ab" / "file.txt"
+    path.parent.mkdir(parents=True)
+    path.write_bytes(b"0123456789")
+    client = _client(path)
+
+    response = client.get("/file", headers={"Range": "bytes=0-1"})
+    # Байты и Range отдает nginx; приложение задает путь и заголовки, в том числе ETag
+    assert response.status_code == 200
+    assert response.content == b""
+    assert response.headers["x-accel-redirect"] == "/protected-uploads/objects/ab/file.txt"
+    assert response.headers["etag"] == '"abc"'
+    assert "filename*=utf-8''" in response.headers["content-disposition"]
+
+    # 304 отвечает само приложение, до редиректа в nginx
+    not_modified = client.get("/file", headers={"If-None-Match": '"abc"'})
+    assert not_modified.status_code == 304
+    assert "x-accel-redirect" not in not_modified.headers
+
+
+def test_spooled_download_removes_spilled_file(tmp_path):
+    path = tmp_path / "spool"
+    path.write_bytes(b"rendered")
+    app = FastAPI()
+
+    @app.get("/memory")
+    def memory():
+        return spooled_download(b"in memory", filename="a.txt", media_type="text/plain", etag='"m"')
+
+    @app.get("/spilled")
+    def spilled():
+        return spooled_download(str(path), filename="a.txt", media_type="text/plain", etag='"s"')
+
+    client = TestClient(app)
+    assert client.get("/memory").content == b"in memory"
+    response = client.get("/spilled")
+    assert response.content == b"rendered"
+    assert response.headers["etag"] == '"s"'
+    assert not path.exists()
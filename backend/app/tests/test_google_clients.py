@@ -0,0 +1,44 @@
+import asyncio
+import json
+
+from google.oauth2.credentials import Credentials
+from googleapiclient.http import HttpMockSequence
+
+from app.services import google_clients
+
+
+def test_service_is_shared():
+    assert google_clients.get_service("docs", "v1") is google_clients.get_service("docs", "v1")
+
+
+def test_execute_uses_authorized_transport(monkeypatch):
+    http = HttpMockSequence([({"status": "200"}, json.dumps({"documentId": "abc"}))])
+    monkeypatch.setattr(google_clients, "_get_http", lambda: http)
+    request = google_clients.get_service("docs", "v1").documents().create(body={"title": "t"})
+
+    result = asyncio.run(google_clients.execute(request, Credentials(token="token")))
+
+    assert result == {"documentId": "abc"}
+
+
+def test_create_document_runs_fill_and_share_concurrently(monkeypatch):
+    from app.services import google_docs
+
+    active = []
+    peak = []
+
+    async def fake_execute(request, credentials, refresh=True):
+        active.append(request.methodId)
+        peak.append(len(active))
+        await asyncio.sleep(0.01)
+        active.remove(request.methodId)
+        return {"documentId": "abc"}
+
+    monkeypatch.setattr(google_docs.google_clients, "execute", fake_execute)
+    service = google_docs.GoogleDocsService(access_token="token")
+
+    result = asyncio.run(service.create_document("title", "content"))
+
+    assert result["url"] == "https://docs.google.com/document/d/abc/edit"
+    assert set(result["timings_ms"]) == {"create", "fill", "share", "total"}
+    assert max(peak) == 2
@@ -0,0 +1,62 @@
+import asyncio
+import time
+from datetime import datetime, timedelta
+
+from app.models.user import User
+from app.services import google_credentials
+
+
+async def test_concurrent_requests_refresh_once(session_factory, monkeypatch):
+    async with google_credentials.AsyncSessionLocal() as db:
+        user = User(
+            email="user@example.com",
+            hashed_password="x",
+            google_token="old",
+            google_refresh_token="refresh",
+            google_token_expiry=datetime.utcnow() + timedelta(seconds=30),
+        )
+        db.add(user)
+        await db.commit()
+
+    refreshes = []
+
+    def fake_refresh(credentials):
+        refreshes.append(credentials.token)
+        credentials.token = "new"
+        credentials.expiry = datetime.utcnow() + timedelta(hours=1)
+
+    monkeypatch.setattr(google_credentials, "_refresh", fake_refresh)
+
+    results = await asyncio.gather(*(google_credentials.get_credentials(user) for _ in range(5)))
+
+    assert refreshes == ["old"]
+    assert {credentials.token for credentials in results} == {"new"}
+    async with google_credentials.AsyncSessionLocal() as db:
+        stored = await db.get(User, user.id)
+        assert stored.google_token == "new"
+        assert not google_credentials.needs_refresh(stored.google_token_expiry)
+
+
+async def test_refresher_counts_only_real_refreshes(session_factory, monkeypatch):
+    async with google_credentials.AsyncSessionLocal() as db:
+        db.add(User(
+            email="user@example.com",
+            hashed_password="x",
+            google_token="old",
+            google_refresh_token="refresh",
+            google_token_expiry=datetime.utcnow() + timedelta(seconds=30),
+        ))
+        await db.commit()
+
+    def fake_refresh(credentials):
+        time.sleep(0.05)
+        credentials.token = "new"
+        credentials.expiry = datetime.utcnow() + timedelta(hours=1)
+
+    monkeypatch.setattr(google_credentials, "_refresh", fake_refresh)
+
+    # Оба прохода выбрали пользователя, но обновил токен только один
+    counts = await asyncio.gather(*(google_credentials.refresh_expiring_tokens() for _ in range(2)))
+    assert sorted(counts) == [0, 1]
+    # Блокировка не остается в таблице после использования
+    assert len(google_credentials._refresh_locks) == 0
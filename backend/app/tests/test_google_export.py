@@ -0,0 +1,139 @@
+import asyncio
+import json
+
+import httplib2
+from googleapiclient.errors import HttpError
+
+from app.core.google_config import google_settings
+from app.services import google_docs
+from app.utils.rate_limit import TokenBucket
+
+
+class FakeGoogleApi:
+    """
+    Имитация Docs/Drive: отвечает 429 на первые запросы и 400 на заголовки с "bad".
+    """
+
+    def __init__(self, throttle: int):
+        self.throttle = throttle
+        self.calls = 0
+        self.created = 0
+
+    async def execute(self, request, credentials, refresh=True):
+        self.calls += 1
+        await asyncio.sleep(0)
+        body = json.loads(request.body) if request.body else {}
+        if self.throttle > 0:
+            self.throttle -= 1
+            raise HttpError(httplib2.Response({"status": 429}), b'{"error": {"message": "Rate limit"}}')
+        if request.methodId == "docs.documents.create":
+            if "bad" in body["title"]:
+                raise HttpError(httplib2.Response({"status": 400}), b'{"error": {"message": "Bad title"}}')
+            self.created += 1
+            return {"documentId": f"doc{self.created}"}
+        return {}
+
+
+def test_create_documents_retries_and_reports(monkeypatch):
+    api = FakeGoogleApi(throttle=2)
+    monkeypatch.setattr(google_docs.google_clients, "execute", api.execute)
+    monkeypatch.setattr(google_settings, "GOOGLE_BACKOFF_BASE", 0.001)
+    service = google_docs.GoogleDocsService(access_token="token", rate_limiter=TokenBucket(rate=1000, capacity=10))
+
+    results = asyncio.run(service.create_documents([("one", "1"), ("bad", "2"), ("three", "3")]))
+
+    assert [result["index"] for result in results] == [0, 1, 2]
+    assert [result["status"] for result in results] == ["created", "failed", "created"]
+    assert "400" in results[1]["error"]
+    assert api.created == 2
+
+
+def test_create_is_not_retried_after_server_error(monkeypatch):
+    calls = []
+    failures = {"docs.documents.create": 1}
+
+    async def execute(request, credentials, refresh=True):
+        calls.append(request.methodId)
+        if failures.get(request.methodId):
+            failures[request.methodId] -= 1
+            raise HttpError(httplib2.Response({"status": 503}), b'{"error": {"message": "Backend error"}}')
+        return {"documentId": "doc1", "revisionId": "rev1"}
+
+    monkeypatch.setattr(google_docs.google_clients, "execute", execute)
+    monkeypatch.setattr(google_settings, "GOOGLE_BACKOFF_BASE", 0.001)
+    service = google_docs.GoogleDocsService(access_token="token")
+
+    # Документ мог быть создан - повтор дал бы дубликат
+    results = asyncio.run(service.create_documents([("one", "1")]))
+    assert results[0]["status"] == "failed"
+    assert calls == ["docs.documents.create"]
+
+    # Выдача доступа идемпотентна и повторяется
+    calls.clear()
+    failures["drive.permissions.create"] = 1
+    result = asyncio.run(service.create_document("two", "2"))
+    assert result["documentId"] == "doc1"
+    assert calls.count("docs.documents.create") == 1
+    assert calls.count("drive.permissions.create") == 2
+
+
+def test_create_document_resumes_from_progress(monkeypatch):
+    calls = []
+
+    async def execute(request, credentials, refresh=True):
+        calls.append(request.methodId)
+        return {}
+
+    monkeypatch.setattr(google_docs.google_clients, "execute", execute)
+    service = google_docs.GoogleDocsService(access_token="token")
+    saved = []
+
+    async def on_progress(progress):
+        saved.append(list(progress["done"]))
+
+    progress = {"documentId": "doc1", "title": "one", "done": ["create", "fill"]}
+    result = asyncio.run(service.create_document("ignored", "1", progress=progress, on_progress=on_progress))
+
+    # Документ не создается заново и не заполняется второй раз
+    assert calls == ["drive.permissions.create"]
+    assert saved == [["create", "fill", "share"]]
+    assert result["documentId"] == "doc1"
+    assert result["title"] == "one"
+
+
+def test_fill_is_not_retried_and_resumes_after_lost_response(monkeypatch):
+    calls = []
+    responses = {"docs.documents.batchUpdate": (503, b'{"error": {"message": "Backend error"}}')}
+
+    async def execute(request, credentials, refresh=True):
+        calls.append(request.methodId)
+        if request.methodId in responses:
+            status, content = responses[request.methodId]
+            raise HttpError(httplib2.Response({"status": status}), content)
+        return {"documentId": "doc1", "revisionId": "rev1"}
+
+    monkeypatch.setattr(google_docs.google_clients, "execute", execute)
+    monkeypatch.setattr(google_settings, "GOOGLE_BACKOFF_BASE", 0.001)
+    service = google_docs.GoogleDocsService(access_token="token")
+
+    # Вставка могла пройти - повтор в том же вызове не делается
+    results = asyncio.run(service.create_documents([("one", "1")]))
+    assert results[0]["status"] == "failed"
+    assert calls.count("docs.documents.batchUpdate") == 1
+
+    # Повтор задачи видит смененную ревизию и считает документ заполненным
+    responses["docs.documents.batchUpdate"] = (
+        400, b'{"error": {"message": "The required revision ID does not match the latest revision."}}'
+    )
+    progress = {"documentId": "doc1", "revisionId": "rev1", "title": "one", "done": ["create"]}
+    result = asyncio.run(service.create_document("one", "1", progress=progress))
+    assert result["documentId"] == "doc1"
+    assert sorted(progress["done"]) == ["create", "fill", "share"]
+
+
+def test_token_bucket_limits_rate():
+    bucket = TokenBucket(rate=10, capacity=2)
+
+    assert bucket.try_acquire() == 0
+    assert bucket.try_acquire() == 0
+    assert 0 < bucket.try_acquire() <= 0.1
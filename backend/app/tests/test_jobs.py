@@ -0,0 +1,170 @@
+import json
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import select, update
+from sqlalchemy.dialects import postgresql
+
+from app.models.job import Job
+from app.services import jobs
+
+
+@pytest.fixture(autouse=True)
+def owner(user):
+    # Владелец задач, которые ставит _enqueue
+    return user
+
+
+async def _enqueue(factory, kind="generate", user_id=1):
+    async with factory() as db:
+        return (await jobs.enqueue(db, user_id=user_id, kind=kind, payload={"variables": {}})).id
+
+
+async def _job(factory, job_id):
+    async with factory() as db:
+        return await db.get(Job, job_id)
+
+
+async def test_claim_uses_skip_locked(session_factory):
+    job_id = await _enqueue(session_factory)
+    issued = []
+
+    async with session_factory() as db:
+        execute = db.execute
+
+        async def capture(statement, *args, **kwargs):
+            issued.append(str(statement.compile(dialect=postgresql.dialect())))
+            return await execute(statement, *args, **kwargs)
+
+        db.execute = capture
+        assert await jobs.claim(db, "w1") == job_id
+
+    # Выборка задачи в claim не ждет строк, заблокированных другими воркерами
+    assert "FOR UPDATE SKIP LOCKED" in issued[0]
+
+
+async def test_claim_and_complete(session_factory):
+    job_id = await _enqueue(session_factory)
+
+    async with session_factory() as db:
+        assert await jobs.claim(db, "w1") == job_id
+        assert await jobs.claim(db, "w2") is None
+        assert await jobs.complete(db, job_id, "w1", {"ok": True})
+
+    job = await _job(session_factory, job_id)
+    assert job.status == "succeeded"
+    assert job.attempts == 1
+    assert job.result == {"ok": True}
+    assert job.locked_by is None
+
+
+async def test_failed_attempts_are_retried_with_backoff(session_factory, monkeypatch):
+    monkeypatch.setattr(jobs, "backoff_delay", lambda attempt, base, cap: 30.0)
+    job_id = await _enqueue(session_factory)
+
+    async with session_factory() as db:
+        assert await jobs.claim(db, "w1") == job_id
+        assert await jobs.fail(db, job_id, "w1", "boom", retryable=True) == "queued"
+        # Повтор не раньше run_after
+        assert await jobs.claim(db, "w1") is None
+
+        for attempt in range(2, jobs.settings.JOB_MAX_ATTEMPTS + 1):
+            await db.execute(update(Job).where(Job.id == job_id).values(run_after=datetime.utcnow()))
+            await db.commit()
+            assert await jobs.claim(db, "w1") == job_id
+            await jobs.fail(db, job_id, "w1", "boom", retryable=True)
+
+    job = await _job(session_factory, job_id)
+    assert job.status == "failed"
+    assert job.attempts == jobs.settings.JOB_MAX_ATTEMPTS
+    assert job.error == "boom"
+
+
+async def test_expired_lease_is_reclaimed(session_factory):
+    job_id = await _enqueue(session_factory)
+
+    async with session_factory() as db:
+        assert await jobs.claim(db, "w1") == job_id
+        await db.execute(
+            update(Job).where(Job.id == job_id).values(locked_until=datetime.utcnow() - timedelta(seconds=1))
+        )
+        await db.commit()
+
+        assert await jobs.claim(db, "w2") == job_id
+        # Первый воркер потерял аренду и не может записать результат
+        assert not await jobs.complete(db, job_id, "w1", {"ok": True})
+        assert await jobs.complete(db, job_id, "w2", {"ok": True})
+
+    assert (await _job(session_factory, job_id)).attempts == 2
+
+
+async def test_pool_process_records_result_and_permanent_failures(session_factory, monkeypatch):
+    async def succeed(db, job):
+        return {"kind": job.kind}
+
+    async def reject(db, job):
+        raise jobs.JobFailed("Template not found")
+
+    monkeypatch.setitem(jobs.HANDLERS, "ok", succeed)
+    monkeypatch.setitem(jobs.HANDLERS, "bad", reject)
+    pool = jobs.JobWorkerPool(workers=0)
+
+    for kind in ("ok", "bad"):
+        job_id = await _enqueue(session_factory, kind)
+        async with session_factory() as db:
+            assert await jobs.claim(db, "w1") == job_id
+        await pool.process(job_id, "w1")
+
+    assert pool.stats()["succeeded"] == 1
+    assert pool.stats()["failed"] == 1
+    async with session_factory() as db:
+        statuses = dict((await db.execute(select(Job.kind, Job.status))).all())
+    assert statuses == {"ok": "succeeded", "bad": "failed"}
+
+
+async def test_google_doc_retry_resumes_created_document(session_factory, monkeypatch):
+    calls = []
+
+    async def create_google_doc(user, template, variables, progress, on_progress):
+        calls.append(dict(progress))
+        if not progress.get("documentId"):
+            progress.update(documentId="doc1", done=["create"])
+            await on_progress(progress)
+            raise RuntimeError("Google API returned 503")
+        return {"documentId": progress["documentId"]}
+
+    async def job_template(db, job):
+        return None
+
+    monkeypatch.setattr(jobs, "_job_template", job_template)
+    monkeypatch.setattr(jobs.generation, "create_google_doc", create_google_doc)
+    pool = jobs.JobWorkerPool(workers=0)
+    job_id = await _enqueue(session_factory, "google_doc")
+
+    for _ in range(2):
+        async with session_factory() as db:
+            await db.execute(update(Job).where(Job.id == job_id).values(run_after=datetime.utcnow()))
+            await db.commit()
+            assert await jobs.claim(db, "w1") == job_id
+        await pool.process(job_id, "w1")
+
+    # Повтор получил id уже созданного документа
+    assert calls[1] == {"documentId": "doc1", "done": ["create"]}
+    job = await _job(session_factory, job_id)
+    assert job.status == "succeeded"
+    assert job.result == {"documentId": "doc1"}
+
+
+async def test_job_events_stream_until_finished(client, session_factory):
+    job_id = await _enqueue(session_factory)
+    async with session_factory() as db:
+        assert await jobs.claim(db, "w1") == job_id
+        assert await jobs.complete(db, job_id, "w1", {"ok": True})
+
+    response = client.get(f"/api/v1/jobs/{job_id}/events")
+
+    # Задача уже завершена: одно событие, после которого поток закрывается
+    assert response.headers["content-type"].startswith("text/event-stream")
+    events = [line[len("data: "):] for line in response.text.splitlines() if line.startswith("data: ")]
+    assert [json.loads(event)["status"] for event in events] == ["succeeded"]
+    assert client.get("/api/v1/jobs/missing/events").status_code == 404
@@ -0,0 +1,129 @@
+import asyncio
+import os
+
+from app.services.output_cache import OutputCache, cache_key
+
+
+def test_cache_key_is_canonical():
+    assert cache_key("abc", {"a": "1", "b": "2"}) == cache_key("abc", {"b": "2", "a": "1"})
+    assert cache_key("abc", {"a": "1"}) != cache_key("abd", {"a": "1"})
+
+
+async def test_concurrent_requests_render_once(tmp_path):
+    cache = OutputCache(str(tmp_path), max_bytes=1024)
+    calls = []
+
+    async def render(output_path):
+        calls.append(output_path)
+        await asyncio.sleep(0.01)
+        with open(output_path, "w") as f:
+            f.write("result")
+
+    paths = await asyncio.gather(*(cache.get_or_render("k" * 64, ".txt", render) for _ in range(5)))
+
+    assert len(calls) == 1
+    assert len(set(paths)) == 1
+    assert await cache.lookup("k" * 64) == paths[0]
+
+
+async def test_coalesce_shares_result_with_waiters(tmp_path):
+    cache = OutputCache(str(tmp_path), max_bytes=1024)
+    calls = []
+
+    async def produce():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return "result"
+
+    results = await asyncio.gather(*(
+        cache.coalesce("memory:k", produce, share=lambda result: result + "-copy") for _ in range(3)
+    ))
+
+    assert len(calls) == 1
+    # Инициатор получает сам результат, остальные - результат share
+    assert results == ["result", "result-copy", "result-copy"]
+    assert (await cache.stats())["inflight"] == 0
+
+
+async def test_coalesce_survives_initiator_cancellation(tmp_path):
+    cache = OutputCache(str(tmp_path), max_bytes=1024)
+    started = asyncio.Event()
+    calls = []
+
+    async def produce():
+        calls.append(1)
+        started.set()
+        await asyncio.sleep(0.05)
+        return "result"
+
+    initiator = asyncio.create_task(cache.coalesce("memory:k", produce))
+    await started.wait()
+    waiter = asyncio.create_task(cache.coalesce("memory:k", produce))
+    await asyncio.sleep(0)
+    initiator.cancel()
+
+    # Присоединившийся запрос получает результат, а не CancelledError
+    assert await waiter == "result"
+    assert initiator.cancelled()
+    assert len(calls) == 1
+    assert (await cache.stats())["inflight"] == 0
+
+
+async def test_evicts_least_recently_used(tmp_path):
+    cache = OutputCache(str(tmp_path), max_bytes=10)
+
+    def writer(data):
+        async def render(output_path):
+            with open(output_path, "w") as f:
+                f.write(data)
+        return render
+
+    first = await cache.get_or_render("a" * 64, ".txt", writer("123456"))
+    await cache.get_or_render("b" * 64, ".txt", writer("123456"))
+
+    assert not os.path.exists(first)
+    assert (await cache.stats())["evictions"] == 1
+
+
+async def test_expire_removes_entries_older_than_ttl(tmp_path):
+    cache = OutputCache(str(tmp_path), max_bytes=1024, ttl=60)
+
+    async def render(output_path):
+        with open(output_path, "w") as f:
+            f.write("result")
+
+    old = await cache.get_or_render("a" * 64, ".txt", render)
+    fresh = await cache.get_or_render("b" * 64, ".txt", render)
+    abandoned = tmp_path / ".abandoned.txt"
+    abandoned.write_text("partial")
+    stale = os.path.getmtime(old) - 120
+    os.utime(old, (stale, stale))
+    os.utime(abandoned, (stale, stale))
+
+    assert await cache.expire() == 1
+    assert not os.path.exists(old)
+    assert not abandoned.exists()
+    assert await cache.lookup("b" * 64) == fresh
+    assert (await cache.stats())["expirations"] == 1
+
+
+async def test_size_limit_counts_files_of_other_processes(tmp_path):
+    # Два экземпляра над одним каталогом - как воркеры uvicorn
+    first = OutputCache(str(tmp_path), max_bytes=10)
+    second = OutputCache(str(tmp_path), max_bytes=10)
+
+    def writer(data):
+        async def render(output_path):
+            with open(output_path, "w") as f:
+                f.write(data)
+        return render
+
+    # Индекс второго загружен до записи первого
+    assert (await second.stats())["entries"] == 0
+    old = await first.get_or_render("a" * 64, ".txt", writer("123456"))
+    fresh = await second.get_or_render("b" * 64, ".txt", writer("123456"))
+
+    # Второй процесс не знал о файле первого, но лимит проверяется по диску
+    assert not os.path.exists(old)
+    assert os.path.exists(fresh)
+    assert await first.lookup("a" * 64, ".txt") is None
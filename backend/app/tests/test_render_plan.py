@@ -0,0 +1,166 @@
+import io
+import os
+import zipfile
+
+from docx import Document
+
+from app.core.config import settings
+from app.utils import render_plan
+from app.utils.render_plan import compile_render_plan, get_render_plan, render_docx, render_spooled
+from app.utils.zip_stream import raw_member
+
+
+def _make_template(path):
+    doc = Document()
+    doc.add_paragraph("Без переменных")
+    paragraph = doc.add_paragraph("Клиент: ")
+    paragraph.add_run("##client_name##").bold = True
+    split = doc.add_paragraph()
+    split.add_run("Дата: ##da")
+    split.add_run("te##")
+    table = doc.add_table(rows=1, cols=2)
+    table.cell(0, 0).text = "Сумма ##amount##"
+    doc.save(path)
+
+
+def test_compile_render_plan(tmp_path):
+    path = str(tmp_path / "template.docx")
+    _make_template(path)
+
+    plan = compile_render_plan(path)
+
+    assert set(plan.variables) == {"client_name", "date", "amount"}
+    assert len(plan.slots) == 3
+    assert [slot.split for slot in plan.slots] == [False, True, False]
+
+
+def test_render_plan_is_cached(tmp_path):
+    path = str(tmp_path / "template.docx")
+    _make_template(path)
+
+    assert get_render_plan(path) is get_render_plan(path)
+
+
+def test_render_docx(tmp_path):
+    path = str(tmp_path / "template.docx")
+    output = str(tmp_path / "output.docx")
+    _make_template(path)
+
+    render_docx(path, {"client_name": "ООО Ромашка", "date": "01.01.2025", "amount": "100"}, output)
+
+    doc = Document(output)
+    texts = [p.text for p in doc.paragraphs]
+    assert "Клиент: ООО Ромашка" in texts
+    assert "Дата: 01.01.2025" in texts
+    assert doc.paragraphs[1].runs[1].bold
+    assert doc.tables[0].cell(0, 0).text == "Сумма 100"
+
+
+def test_render_docx_is_deterministic(tmp_path):
+    path = str(tmp_path / "template.docx")
+    _make_template(path)
+    values = {"client_name": "ООО Ромашка", "date": "01.01.2025", "amount": "100"}
+
+    first = str(tmp_path / "first.docx")
+    second = str(tmp_path / "second.docx")
+    render_docx(path, values, first)
+    render_docx(path, values, second)
+
+    with open(first, "rb") as f1, open(second, "rb") as f2:
+        assert f1.read() == f2.read()
+
+
+def test_render_spooled_keeps_small_results_in_memory(tmp_path, monkeypatch):
+    path = str(tmp_path / "template.docx")
+    _make_template(path)
+    values = {"client_name": "ООО Ромашка", "date": "01.01.2025", "amount": "100"}
+    spool_dir = str(tmp_path / "spool")
+
+    in_memory = render_spooled(path, values, spool_dir)
+    assert isinstance(in_memory, bytes)
+    assert Document(io.BytesIO(in_memory)).tables[0].cell(0, 0).text == "Сумма 100"
+    assert not os.path.exists(spool_dir)
+
+    monkeypatch.setattr(settings, "GENERATE_SPOOL_MAX_SIZE", 1024)
+    spilled = render_spooled(path, values, spool_dir)
+    with open(spilled, "rb") as f:
+        assert f.read() == in_memory
+    assert os.listdir(spool_dir) == [os.path.basename(spilled)]
+
+
+def test_template_bytes_are_cached(tmp_path):
+    path = tmp_path / "template.txt"
+    path.write_text("Привет ##name##", encoding="cp1251")
+    first = render_plan.render_text_bytes(str(path), {"name": "мир"}, "cp1251", content_hash="hash")
+    path.unlink()
+
+    # Повторный рендеринг не обращается к файлу
+    assert render_plan.render_text_bytes(str(path), {"name": "мир"}, "cp1251", content_hash="hash") == first
+    assert first.decode("utf-8") == "Привет мир"
+
+
+def test_render_docx_covers_headers_footers_and_merged_cells(tmp_path):
+    path = str(tmp_path / "template.docx")
+    output = str(tmp_path / "output.docx")
+    doc = Document()
+    section = doc.sections[0]
+    section.header.paragraphs[0].text = "Шапка ##company##"
+    footer = section.footer.paragraphs[0]
+    footer.add_run("Стр. ##pa")
+    footer.add_run("ge## из ##total##").italic = True
+    table = doc.add_table(rows=2, cols=2)
+    merged = table.cell(0, 0).merge(table.cell(1, 1))
+    merged.text = "##merged##"
+    doc.save(path)
+
+    plan = compile_render_plan(path)
+    assert {slot.part for slot in plan.slots} == {"word/document.xml", "word/header1.xml", "word/footer1.xml"}
+    # Объединенная ячейка - один параграф, а не по одному на каждую позицию сетки
+    assert sum("merged" in slot.variables for slot in plan.slots) == 1
+
+    render_docx(path, {"company": "Ромашка", "page": "1", "total": "2", "merged": "M"}, output)
+
+    result = Document(output)
+    assert result.sections[0].header.paragraphs[0].text == "Шапка Ромашка"
+    footer = result.sections[0].footer.paragraphs[0]
+    assert footer.text == "Стр. 1 из 2"
+    assert footer.runs[1].italic
+    assert result.tables[0].cell(1, 1).text == "M"
+
+
+def test_render_docx_copies_untouched_members_without_recompression(tmp_path):
+    path = str(tmp_path / "template.docx")
+    output = str(tmp_path / "output.docx")
+    _make_template(path)
+    with zipfile.ZipFile(path, "a", compression=zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr("word/media/letterhead.bin", os.urandom(64 * 1024) + b"\0" * 64 * 1024)
+
+    render_docx(path, {"client_name": "ООО Ромашка", "date": "01.01.2025", "amount": "100"}, output)
+
+    with open(path, "rb") as f:
+        source_data = f.read()
+    with open(output, "rb") as f:
+        output_data = f.read()
+    with zipfile.ZipFile(path) as source, zipfile.ZipFile(output) as result:
+        assert result.testzip() is None
+        assert result.namelist() == source.namelist()
+        for name in ("word/media/letterhead.bin", "word/styles.xml"):
+            assert bytes(raw_member(output_data, result.getinfo(name))) == bytes(
+                raw_member(source_data, source.getinfo(name))
+            )
+        assert result.read("word/document.xml") != source.read("word/document.xml")
+    assert Document(output).tables[0].cell(0, 0).text == "Сумма 100"
+
+
+def test_large_templates_render_from_disk(tmp_path, monkeypatch):
+    path = str(tmp_path / "template.docx")
+    _make_template(path)
+    values = {"client_name": "ООО Ромашка", "date": "01.01.2025", "amount": "100"}
+    expected = render_plan.render_docx_bytes(path, values, content_hash="small")
+
+    monkeypatch.setattr(settings, "TEMPLATE_BUFFER_MAX_BYTES", 0)
+    loaded = []
+    monkeypatch.setattr(render_plan, "load_template_bytes", lambda *args: loaded.append(args))
+
+    assert render_plan.render_docx_bytes(path, values, content_hash="large") == expected
+    assert loaded == []
@@ -0,0 +1,44 @@
+import asyncio
+import time
+
+import pytest
+
+from app.services.render_pool import RenderPool, RenderQueueFull
+
+
+async def test_run_in_pool():
+    pool = RenderPool(max_workers=1, max_queue=4)
+    try:
+        assert await pool.run(sum, [1, 2, 3]) == 6
+        stats = pool.stats()
+        assert stats["completed"] == 1
+        assert stats["queue_depth"] == 0
+    finally:
+        pool.shutdown()
+
+
+async def test_rejects_when_queue_is_full():
+    pool = RenderPool(max_workers=1, max_queue=0)
+    with pytest.raises(RenderQueueFull):
+        await pool.run(sum, [1])
+    assert pool.stats()["rejected"] == 1
+
+
+async def test_cancelled_request_keeps_slot_until_worker_finishes():
+    pool = RenderPool(max_workers=1, max_queue=4)
+    try:
+        await pool.run(sum, [1])
+        task = asyncio.create_task(pool.run(time.sleep, 0.3))
+        await asyncio.sleep(0.1)
+        task.cancel()
+        await asyncio.sleep(0)
+
+        # Процесс еще выполняет задачу - она учитывается, слот занят
+        assert pool.stats()["running"] == 1
+        assert pool._slots.locked()
+
+        assert await pool.run(sum, [2]) == 2
+        assert pool.stats()["running"] == 0
+        assert pool.stats()["completed"] == 3
+    finally:
+        pool.shutdown()
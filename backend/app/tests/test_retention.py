@@ -0,0 +1,96 @@
+import io
+import os
+import time
+
+import pytest
+from fastapi import UploadFile
+
+from app.core.config import settings
+from app.models.template import Template
+from app.services import retention, storage
+from app.utils.uploads import UploadTooLarge
+
+
+def _age(path, seconds):
+    stale = time.time() - seconds
+    os.utime(path, (stale, stale))
+
+
+def test_remove_orphans_keeps_referenced_and_recent_files(tmp_path):
+    objects = tmp_path / "objects" / "ab"
+    objects.mkdir(parents=True)
+    referenced = objects / "referenced.txt"
+    orphan = objects / "orphan.txt"
+    recent = objects / "recent.txt"
+    cached = tmp_path / "cache" / "cached.docx"
+    cached.parent.mkdir()
+    abandoned = tmp_path / "tmp" / "upload"
+    abandoned.parent.mkdir()
+    for path in (referenced, orphan, recent, cached, abandoned):
+        path.write_text("data")
+    for path in (referenced, orphan, cached, abandoned):
+        _age(path, 7200)
+
+    result = retention.remove_orphans({str(referenced)}, upload_dir=str(tmp_path), grace_period=3600)
+
+    assert result == {"removed": 2, "freed_bytes": 8}
+    assert referenced.exists()
+    assert recent.exists()
+    assert cached.exists()
+    assert not orphan.exists()
+    assert not abandoned.exists()
+
+
+def test_sweep_generated_uses_ttl(tmp_path):
+    old = tmp_path / "old.docx"
+    new = tmp_path / "new.docx"
+    old.write_text("old")
+    new.write_text("new")
+    _age(old, 7200)
+
+    assert retention.sweep_generated(str(tmp_path), ttl=3600) == {"removed": 1, "freed_bytes": 3}
+    assert new.exists()
+    assert retention.sweep_generated(str(tmp_path), ttl=0)["removed"] == 0
+
+
+@pytest.fixture
+async def db(session_factory, user):
+    async with session_factory() as session:
+        session.add(Template(filename="a.txt", file_path="a.txt", file_size=60, user_id=user.id))
+        await session.commit()
+        yield session, user.id
+
+
+async def test_upload_limit_and_quota_are_told_apart(db, tmp_path, monkeypatch):
+    session, user_id = db
+    monkeypatch.setattr(storage, "OBJECTS_DIR", str(tmp_path / "objects"))
+    monkeypatch.setattr(storage, "TMP_DIR", str(tmp_path / "tmp"))
+    monkeypatch.setattr(settings, "USER_STORAGE_QUOTA", 100)
+
+    # Остаток квоты (40) равен лимиту файла: превышена квота
+    monkeypatch.setattr(settings, "MAX_UPLOAD_SIZE", 40)
+    with pytest.raises(storage.StorageQuotaExceeded):
+        await storage.store_upload_within_quota(session, user_id, UploadFile(io.BytesIO(b"x" * 41), filename="a.txt"))
+
+    monkeypatch.setattr(settings, "MAX_UPLOAD_SIZE", 30)
+    with pytest.raises(UploadTooLarge):
+        await storage.store_upload_within_quota(session, user_id, UploadFile(io.BytesIO(b"x" * 31), filename="b.txt"))
+
+
+async def test_upload_over_quota_is_rejected(db, tmp_path, monkeypatch):
+    session, user_id = db
+    monkeypatch.setattr(storage, "OBJECTS_DIR", str(tmp_path / "objects"))
+    monkeypatch.setattr(storage, "TMP_DIR", str(tmp_path / "tmp"))
+    monkeypatch.setattr(settings, "USER_STORAGE_QUOTA", 100)
+
+    assert await storage.get_remaining_quota(session, user_id) == 40
+    stored = await storage.store_upload_within_quota(session, user_id, UploadFile(io.BytesIO(b"x" * 40), filename="b.txt"))
+    assert stored.size == 40
+
+    with pytest.raises(storage.StorageQuotaExceeded):
+        await storage.store_upload_within_quota(session, user_id, UploadFile(io.BytesIO(b"y" * 41), filename="c.txt"))
+    assert list((tmp_path / "tmp").iterdir()) == []
+
+    with pytest.raises(storage.StorageQuotaExceeded):
+        await storage.check_quota(session, user_id, 50)
+    await storage.check_quota(session, user_id, 50, released=10)
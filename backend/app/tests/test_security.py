@@ -0,0 +1,43 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+from passlib.context import CryptContext
+
+from app.api.deps import get_current_admin_user
+from app.core.config import settings
+from app.core.security import get_password_hash_async, verify_and_update_password_async
+
+
+def test_rehash_on_cost_change():
+    legacy = CryptContext(schemes=["bcrypt"], bcrypt__default_rounds=4).hash("secret")
+
+    valid, new_hash = asyncio.run(verify_and_update_password_async("secret", legacy))
+    assert valid
+    assert new_hash is not None
+
+    valid, again = asyncio.run(verify_and_update_password_async("secret", new_hash))
+    assert valid
+    assert again is None
+
+
+def test_wrong_password():
+    hashed = asyncio.run(get_password_hash_async("secret"))
+
+    valid, new_hash = asyncio.run(verify_and_update_password_async("other", hashed))
+    assert not valid
+    assert new_hash is None
+
+
+def test_admin_dependency_checks_admin_emails(monkeypatch):
+    monkeypatch.setattr(settings, "ADMIN_EMAILS", "ops@example.com, Root@Example.com")
+
+    class FakeUser:
+        def __init__(self, email):
+            self.email = email
+
+    admin = FakeUser("root@example.com")
+    assert asyncio.run(get_current_admin_user(admin)) is admin
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(get_current_admin_user(FakeUser("user@example.com")))
+    assert error.value.status_code == 403
@@ -0,0 +1,46 @@
+import io
+
+import pytest
+from fastapi import UploadFile
+
+from app.services import storage
+
+
+async def test_identical_uploads_share_one_object(tmp_path, monkeypatch):
+    monkeypatch.setattr(storage, "OBJECTS_DIR", str(tmp_path / "objects"))
+    monkeypatch.setattr(storage, "TMP_DIR", str(tmp_path / "tmp"))
+
+    first = await storage.store_upload(UploadFile(io.BytesIO(b"##name##"), filename="a.TXT"))
+    second = await storage.store_upload(UploadFile(io.BytesIO(b"##name##"), filename="b.txt"))
+
+    assert first.file_path == second.file_path
+    assert first.file_path.endswith(f"{first.content_hash[:2]}/{first.content_hash[2:4]}/{first.content_hash}.txt")
+    assert not first.existed
+    assert second.existed
+    assert list((tmp_path / "tmp").iterdir()) == []
+
+
+async def test_text_upload_is_normalized_to_utf8(tmp_path, monkeypatch):
+    monkeypatch.setattr(storage, "OBJECTS_DIR", str(tmp_path / "objects"))
+    monkeypatch.setattr(storage, "TMP_DIR", str(tmp_path / "tmp"))
+
+    cp1251 = await storage.store_upload(
+        UploadFile(io.BytesIO("Привет ##name##".encode("cp1251")), filename="a.txt"), normalize_text=True
+    )
+    utf8 = await storage.store_upload(
+        UploadFile(io.BytesIO("Привет ##name##".encode("utf-8")), filename="b.txt"), normalize_text=True
+    )
+
+    assert cp1251.encoding == "utf-8"
+    assert cp1251.file_path == utf8.file_path
+    with open(cp1251.file_path, "rb") as f:
+        assert f.read().decode("utf-8") == "Привет ##name##"
+
+
+async def test_text_upload_with_unknown_encoding_is_refused(tmp_path, monkeypatch):
+    monkeypatch.setattr(storage, "OBJECTS_DIR", str(tmp_path / "objects"))
+    monkeypatch.setattr(storage, "TMP_DIR", str(tmp_path / "tmp"))
+
+    with pytest.raises(storage.UnknownTextEncoding):
+        await storage.store_upload(UploadFile(io.BytesIO(b"\x98\xff ##name##"), filename="a.txt"), normalize_text=True)
+    assert list((tmp_path / "tmp").iterdir()) == []
@@ -0,0 +1,62 @@
+from datetime import datetime
+
+from app import crud
+from app.models.template import Template
+from app.models.user import User
+from app.utils.pagination import decode_cursor, encode_cursor
+
+
+async def test_search_by_variables(session_factory):
+    async with session_factory() as db:
+        db.add_all([User(id=1, email="a@example.com"), User(id=2, email="b@example.com")])
+        db.add_all([
+            Template(filename="a", user_id=1, variables=["client_name", "date"]),
+            Template(filename="b", user_id=1, variables=["client_name"]),
+            Template(filename="c", user_id=1, variables=["amount"]),
+            Template(filename="d", user_id=2, variables=["client_name", "date"]),
+        ])
+        await db.commit()
+
+        search = crud.template_async.search_by_variables
+        found = await search(db, user_id=1, names=["client_name", "date"])
+        assert [t.filename for t in found] == ["a"]
+        found = await search(db, user_id=1, names=["date", "amount"], match_all=False)
+        assert [t.filename for t in found] == ["a", "c"]
+
+
+async def test_get_by_user_keyset_pagination(session_factory):
+    async with session_factory() as db:
+        db.add(User(id=1, email="a@example.com"))
+        # Несколько шаблонов с одинаковым created_at: порядок решает id
+        created_at = [datetime(2025, 1, 1), datetime(2025, 1, 2), datetime(2025, 1, 2), datetime(2025, 1, 3)]
+        db.add_all([
+            Template(id=number, filename=str(number), user_id=1, variables=[], created_at=value)
+            for number, value in enumerate(created_at, start=1)
+        ])
+        await db.commit()
+
+        pages = []
+        after = None
+        while True:
+            page = await crud.template_async.get_by_user(db, user_id=1, limit=3, after=after)
+            pages.append([t.id for t in page])
+            if len(page) < 3:
+                break
+            after = decode_cursor(encode_cursor(page[-1].created_at, page[-1].id))
+
+        assert pages == [[4, 3, 2], [1]]
+
+
+async def test_search_text(session_factory):
+    async with session_factory() as db:
+        db.add(User(id=1, email="a@example.com"))
+        db.add_all([
+            Template(filename="договор.docx", user_id=1, variables=[], preview_text="Договор поставки с ##client##"),
+            Template(filename="счет.txt", user_id=1, variables=[], content_text="Счет на оплату по договору"),
+            Template(filename="акт.txt", user_id=1, variables=[], content_text="Акт выполненных работ"),
+        ])
+        await db.commit()
+
+        hits = await crud.template_async.search_text(db, user_id=1, query="Договор")
+        assert [obj.filename for obj, _, _ in hits] == ["договор.docx", "счет.txt"]
+        assert "Договор поставки" in hits[0][2]
@@ -0,0 +1,90 @@
+import io
+import os
+
+from docx import Document
+
+from app.core.config import settings
+from app.services.output_cache import output_cache
+
+DOCX = "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+
+
+def _docx(text):
+    doc = Document()
+    doc.add_paragraph(text)
+    output = io.BytesIO()
+    doc.save(output)
+    return output.getvalue()
+
+
+def _upload(client, filename, data, content_type="text/plain"):
+    return client.post("/api/v1/templates/", files={"file": (filename, data, content_type)})
+
+
+def test_identical_uploads_share_one_object(client):
+    first = _upload(client, "a.txt", "Привет ##name##".encode("cp1251"))
+    second = _upload(client, "b.txt", "Привет ##name##".encode("utf-8"))
+
+    assert first.status_code == 200
+    assert second.status_code == 200
+    # После перекодирования в UTF-8 содержимое совпадает
+    assert first.json()["file_path"] == second.json()["file_path"]
+    assert second.json()["variables"] == ["name"]
+
+
+def test_upload_over_quota_is_rejected(client, monkeypatch):
+    monkeypatch.setattr(settings, "USER_STORAGE_QUOTA", 20)
+
+    assert _upload(client, "a.txt", b"x" * 15).status_code == 200
+    response = _upload(client, "b.txt", b"y" * 10)
+
+    assert response.status_code == 413
+    assert client.get("/api/v1/templates/storage").json() == {"used": 15, "quota": 20, "remaining": 5}
+
+
+def test_list_pages_with_next_cursor(client):
+    for number in range(3):
+        _upload(client, f"{number}.txt", f"Шаблон {number}".encode("utf-8"))
+
+    first = client.get("/api/v1/templates/", params={"limit": 2})
+    cursor = first.headers["X-Next-Cursor"]
+    second = client.get("/api/v1/templates/", params={"limit": 2, "cursor": cursor})
+
+    assert [t["filename"] for t in first.json()] == ["2.txt", "1.txt"]
+    assert [t["filename"] for t in second.json()] == ["0.txt"]
+    assert "X-Next-Cursor" not in second.headers
+    assert client.get("/api/v1/templates/", params={"cursor": "broken"}).status_code == 400
+
+
+def test_search_text_and_variables(client):
+    _upload(client, "договор.txt", "Договор поставки с ##client## от ##date##".encode("utf-8"))
+    _upload(client, "акт.txt", "Акт для ##client##".encode("utf-8"))
+
+    hits = client.get("/api/v1/templates/search", params={"q": "поставки"}).json()
+    assert [hit["filename"] for hit in hits] == ["договор.txt"]
+    assert "Договор поставки" in hits[0]["snippet"]
+
+    found = client.get("/api/v1/templates/search/variables", params={"name": ["client", "date"]}).json()
+    assert [t["filename"] for t in found] == ["договор.txt"]
+    found = client.get("/api/v1/templates/search/variables", params={"name": ["date", "client"], "match": "any"})
+    assert sorted(t["filename"] for t in found.json()) == ["акт.txt", "договор.txt"]
+
+
+def test_generate_revalidates_and_persists(client):
+    template_id = _upload(client, "t.docx", _docx("Hello ##name##"), DOCX).json()["id"]
+    url = f"/api/v1/templates/{template_id}/generate"
+
+    response = client.post(url, json={"name": "World"})
+    assert response.status_code == 200
+    assert Document(io.BytesIO(response.content)).paragraphs[0].text == "Hello World"
+    etag = response.headers["ETag"]
+
+    assert client.post(url, json={"name": "World"}, headers={"If-None-Match": etag}).status_code == 304
+
+    # Результат в памяти не попадает в кэш, persist=true сохраняет его
+    assert not os.path.isdir(output_cache.directory)
+    persisted = client.post(url, params={"persist": "true"}, json={"name": "World"})
+    assert persisted.content == response.content
+    assert persisted.headers["ETag"] == etag
+    key = etag.strip('"')
+    assert os.path.exists(os.path.join(output_cache.directory, key[:2], f"{key}.docx"))
@@ -0,0 +1,29 @@
+import hashlib
+import io
+import os
+
+import pytest
+from fastapi import UploadFile
+
+from app.utils.uploads import UploadTooLarge, save_upload
+
+
+async def test_save_upload_in_chunks(tmp_path):
+    data = os.urandom(10_000)
+    path = str(tmp_path / "upload.bin")
+
+    stored = await save_upload(UploadFile(io.BytesIO(data), filename="upload.bin"), path, chunk_size=1024)
+
+    assert stored.size == len(data)
+    assert stored.content_hash == hashlib.sha256(data).hexdigest()
+    with open(path, "rb") as f:
+        assert f.read() == data
+
+
+async def test_save_upload_rejects_large_file(tmp_path):
+    path = str(tmp_path / "upload.bin")
+
+    with pytest.raises(UploadTooLarge):
+        await save_upload(UploadFile(io.BytesIO(b"x" * 5000), filename="upload.bin"), path, max_size=4096, chunk_size=1024)
+
+    assert not os.path.exists(path)
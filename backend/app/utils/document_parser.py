@@ -1,6 +1,16 @@
+import io
 import re
 from docx import Document
-from typing import List, Dict
+from typing import Any, Dict, List, Optional
+
+from app.utils.docx_xml import extract_placeholders
+from app.utils.encoding import detect_encoding
+
+VARIABLE_PATTERN = re.compile(r'##([^#]+)##')
+
+def _document_variables(data: bytes) -> List[str]:
+    # Переменные из XML всех частей: тело, таблицы, надписи, колонтитулы и сноски
+    return extract_placeholders(data, VARIABLE_PATTERN)
 
 def extract_variables(file_path: str) -> Dict[str, List[str]]:
     """
@@ -16,23 +26,11 @@ def extract_variables(file_path: str) -> Dict[str, List[str]]:
         - is_template: является ли документ шаблоном
     """
     try:
-        doc = Document(file_path)
-        variables = set()
-        
-        # Ищем переменные во всех параграфах
-        for paragraph in doc.paragraphs:
-            matches = re.findall(r'##([^#]+)##', paragraph.text)
-            variables.update(matches)
-            
-        # Ищем переменные в таблицах
-        for table in doc.tables:
-            for row in table.rows:
-                for cell in row.cells:
-                    matches = re.findall(r'##([^#]+)##', cell.text)
-                    variables.update(matches)
+        with open(file_path, 'rb') as f:
+            variables = _document_variables(f.read())
         
         return {
-            "variables": list(variables),
+            "variables": variables,
             "is_template": len(variables) > 0
         }
     except Exception as e:
@@ -59,4 +57,65 @@ def extract_text_from_docx(file_path):
             for cell in row.cells:
                 full_text.append(cell.text)
     
-    return '\n'.join(full_text) 
\ No newline at end of file
+    return '\n'.join(full_text) 
+
+def _docx_preview_text(doc) -> str:
+    # Собираем части в список и склеиваем один раз
+    parts = []
+
+    # Извлекаем текст из всех параграфов, сохраняя структуру
+    for para in doc.paragraphs:
+        if para.text.strip():  # Если параграф не пустой
+            parts.append(para.text + "\n\n")
+
+    # Извлекаем текст из таблиц
+    for table in doc.tables:
+        parts.append("\n--- Table ---\n")
+        for row in table.rows:
+            parts.append(" | ".join(cell.text for cell in row.cells) + "\n")
+        parts.append("--- End Table ---\n\n")
+
+    return "".join(parts)
+
+def extract_docx_preview_text(file_path: str) -> str:
+    """
+    Извлекает текст docx для предпросмотра: непустые параграфы и таблицы
+    """
+    return _docx_preview_text(Document(file_path))
+
+def _read_text_file(file_path: str) -> Optional[str]:
+    with open(file_path, 'rb') as f:
+        data = f.read()
+    encoding = detect_encoding(data)
+    return data.decode(encoding) if encoding else None
+
+def extract_template_info(file_path: str) -> Dict[str, Any]:
+    """
+    Разбирает документ один раз при загрузке: переменные, текст предпросмотра docx
+    или текст текстового шаблона для поиска.
+    """
+    if not file_path.endswith('.docx'):
+        content_text = _read_text_file(file_path)
+        if content_text is None:
+            return extract_variables(file_path)
+        # Переменные текстового шаблона ищем прямо в тексте
+        variables = list(dict.fromkeys(VARIABLE_PATTERN.findall(content_text)))
+        return {
+            "variables": variables,
+            "is_template": len(variables) > 0,
+            "content_text": content_text,
+        }
+
+    try:
+        with open(file_path, 'rb') as f:
+            data = f.read()
+        variables = _document_variables(data)
+        doc = Document(io.BytesIO(data))
+    except Exception as e:
+        return {"variables": [], "is_template": False, "error": str(e)}
+
+    return {
+        "variables": variables,
+        "is_template": len(variables) > 0,
+        "preview_text": _docx_preview_text(doc),
+    }
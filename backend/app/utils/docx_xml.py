@@ -0,0 +1,143 @@
+import io
+import re
+import zipfile
+from typing import Callable, Iterator, List, Tuple
+
+from lxml import etree
+
+W_NS = "http://schemas.openxmlformats.org/wordprocessingml/2006/main"
+W_P = f"{{{W_NS}}}p"
+W_T = f"{{{W_NS}}}t"
+XML_SPACE = "{http://www.w3.org/XML/1998/namespace}space"
+
+# Части документа с текстом: тело, колонтитулы и сноски.
+# Надписи (w:txbxContent) лежат внутри этих же частей
+STORY_PART_PATTERN = re.compile(r"^word/(document|header\d*|footer\d*|footnotes|endnotes)\.xml$")
+
+
+def story_parts(archive: zipfile.ZipFile) -> List[str]:
+    """
+    Имена частей пакета, в которых может встретиться текст шаблона.
+    """
+    names = [name for name in archive.namelist() if STORY_PART_PATTERN.match(name)]
+    # Тело документа первым - в этом порядке пользователь видит переменные
+    return sorted(names, key=lambda name: (name != "word/document.xml", name))
+
+
+def parse_part(data: bytes) -> etree._Element:
+    # Внешние сущности не разрешаем; большие документы разбираем без ограничений libxml2
+    parser = etree.XMLParser(resolve_entities=False, huge_tree=True)
+    return etree.fromstring(data, parser)
+
+
+def serialize_part(root: etree._Element) -> bytes:
+    return etree.tostring(root, xml_declaration=True, encoding="UTF-8", standalone=True)
+
+
+def iter_paragraphs(root: etree._Element) -> Iterator[etree._Element]:
+    """
+    Все w:p части в порядке следования, включая ячейки таблиц и надписи.
+
+    Объединенная ячейка - это один w:tc, поэтому ее параграфы встречаются один раз.
+    """
+    return root.iter(W_P)
+
+
+def text_nodes(paragraph: etree._Element) -> List[etree._Element]:
+    """
+    Узлы w:t параграфа без текста вложенных параграфов (надписей внутри runs).
+    """
+    return [
+        node for node in paragraph.iter(W_T)
+        if next(node.iterancestors(W_P)) is paragraph
+    ]
+
+
+def paragraph_text(paragraph: etree._Element) -> str:
+    return "".join(node.text or "" for node in text_nodes(paragraph))
+
+
+def find_placeholders(paragraph: etree._Element, pattern: re.Pattern) -> Tuple[List[re.Match], bool]:
+    """
+    Находит плейсхолдеры в тексте параграфа.
+
+    Второе значение - True, если хотя бы один из них разбит между несколькими w:t.
+    """
+    nodes = text_nodes(paragraph)
+    matches = list(pattern.finditer("".join(node.text or "" for node in nodes)))
+    if not matches:
+        return matches, False
+
+    ends = []
+    offset = 0
+    for node in nodes:
+        offset += len(node.text or "")
+        ends.append(offset)
+
+    split = False
+    for match in matches:
+        start_node = next(i for i, end in enumerate(ends) if match.start() < end)
+        last_node = next(i for i, end in enumerate(ends) if match.end() <= end)
+        if start_node != last_node:
+            split = True
+            break
+    return matches, split
+
+
+def replace_in_paragraph(
+    paragraph: etree._Element,
+    pattern: re.Pattern,
+    replacement: Callable[[re.Match], str],
+) -> bool:
+    """
+    Заменяет плейсхолдеры прямо в узлах w:t, сохраняя форматирование runs.
+
+    Значение записывается в узел, где начинается плейсхолдер; его остаток
+    вырезается из следующих узлов, поэтому разбиение по runs не мешает замене.
+    """
+    nodes = text_nodes(paragraph)
+    texts = [node.text or "" for node in nodes]
+    matches = list(pattern.finditer("".join(texts)))
+    if not matches:
+        return False
+
+    starts = []
+    offset = 0
+    for text in texts:
+        starts.append(offset)
+        offset += len(text)
+
+    changed = set()
+    # С конца, чтобы смещения более ранних совпадений не сдвигались
+    for match in reversed(matches):
+        value = replacement(match)
+        if value == match.group(0):
+            continue
+        for i, text in enumerate(texts):
+            node_start, node_end = starts[i], starts[i] + len(text)
+            if node_end <= match.start() or node_start >= match.end():
+                continue
+            cut_from = max(match.start(), node_start) - node_start
+            cut_to = min(match.end(), node_end) - node_start
+            inserted = value if node_start <= match.start() < node_end else ""
+            texts[i] = text[:cut_from] + inserted + text[cut_to:]
+            changed.add(i)
+
+    for i in changed:
+        nodes[i].text = texts[i]
+        # Пробелы по краям иначе потеряются
+        nodes[i].set(XML_SPACE, "preserve")
+    return bool(changed)
+
+
+def extract_placeholders(data: bytes, pattern: re.Pattern) -> List[str]:
+    """
+    Имена переменных во всех частях документа в порядке появления.
+    """
+    names = {}
+    with zipfile.ZipFile(io.BytesIO(data)) as archive:
+        for name in story_parts(archive):
+            for paragraph in iter_paragraphs(parse_part(archive.read(name))):
+                for match in pattern.finditer(paragraph_text(paragraph)):
+                    names.setdefault(match.group(1), None)
+    return list(names)
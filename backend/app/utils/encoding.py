@@ -0,0 +1,83 @@
+import codecs
+from typing import Iterator, Optional
+
+# Кодировки, которые встречаются в загружаемых текстовых шаблонах, по приоритету.
+# latin-1 декодирует любые байты, поэтому ничего не говорит о тексте и в список не входит
+TEXT_ENCODINGS = ('utf-8', 'cp1251')
+CHUNK_SIZE = 64 * 1024
+
+
+def detect_encoding(data: bytes) -> Optional[str]:
+    """
+    Определяет кодировку текстового содержимого; для двоичных данных возвращает None.
+    """
+    if data.startswith(codecs.BOM_UTF8):
+        return 'utf-8-sig'
+    if data.startswith((codecs.BOM_UTF16_LE, codecs.BOM_UTF16_BE)):
+        return 'utf-16'
+    # Нулевые байты - признак двоичного файла (pdf и т.п.)
+    if b'\x00' in data[:8192]:
+        return None
+    for encoding in TEXT_ENCODINGS:
+        try:
+            data.decode(encoding)
+            return encoding
+        except UnicodeDecodeError:
+            continue
+    return None
+
+
+def detect_file_encoding(file_path: str, chunk_size: int = CHUNK_SIZE) -> Optional[str]:
+    """
+    То же, что detect_encoding, но файл проверяется по частям, без чтения целиком.
+    """
+    with open(file_path, 'rb') as f:
+        head = f.read(chunk_size)
+        if head.startswith(codecs.BOM_UTF8):
+            return 'utf-8-sig'
+        if head.startswith((codecs.BOM_UTF16_LE, codecs.BOM_UTF16_BE)):
+            return 'utf-16'
+        if b'\x00' in head[:8192]:
+            return None
+        for encoding in TEXT_ENCODINGS:
+            f.seek(0)
+            decoder = codecs.getincrementaldecoder(encoding)()
+            try:
+                for chunk in iter(lambda: f.read(chunk_size), b''):
+                    decoder.decode(chunk)
+                decoder.decode(b'', final=True)
+                return encoding
+            except UnicodeDecodeError:
+                continue
+    return None
+
+
+def iter_utf8(file_path: str, encoding: str, chunk_size: int = CHUNK_SIZE) -> Iterator[bytes]:
+    """
+    Перекодирует файл в UTF-8 по частям.
+
+    Инкрементальный декодер сам собирает многобайтовые символы на границах частей.
+    """
+    decoder = codecs.getincrementaldecoder(encoding)()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            text = decoder.decode(chunk)
+            if text:
+                yield text.encode('utf-8')
+    tail = decoder.decode(b'', final=True)
+    if tail:
+        yield tail.encode('utf-8')
+
+
+def read_text(file_path: str, encoding: Optional[str] = None) -> str:
+    """
+    Читает текстовый файл за один проход.
+
+    Для шаблонов без сохраненной кодировки (загруженных раньше) она
+    подбирается по уже прочитанным байтам, а не повторным чтением файла.
+    """
+    with open(file_path, 'rb') as f:
+        data = f.read()
+    if encoding:
+        return data.decode(encoding)
+    return data.decode(detect_encoding(data) or 'utf-8', errors='replace')
@@ -0,0 +1,145 @@
+import os
+import re
+from typing import Iterator, Optional, Tuple, Union
+from urllib.parse import quote
+
+from fastapi import Request
+from fastapi.responses import FileResponse, Response, StreamingResponse
+from starlette.background import BackgroundTask
+
+from app.core.config import settings
+
+RANGE_PATTERN = re.compile(r"^bytes=(\d*)-(\d*)$")
+# Шаблоны меняются по тому же URL, поэтому клиент каждый раз перепроверяет ETag
+CACHE_CONTROL = "private, no-cache"
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    if_none_match = request.headers.get("if-none-match", "")
+    return if_none_match.strip() == "*" or etag in [tag.strip() for tag in if_none_match.split(",")]
+
+
+def parse_range(header: str, size: int) -> Optional[Tuple[int, int]]:
+    """
+    Разбирает одиночный диапазон "bytes=a-b". Возвращает (start, end) включительно.
+
+    Для нескольких диапазонов возвращает None - отдается весь файл.
+    Для невыполнимого диапазона бросает ValueError.
+    """
+    match = RANGE_PATTERN.match(header.strip())
+    if not match:
+        return None
+    start, end = match.groups()
+    if not start and not end:
+        return None
+    if not start:
+        # Суффикс: последние N байт
+        length = int(end)
+        if length == 0:
+            raise ValueError("Unsatisfiable range")
+        return max(0, size - length), size - 1
+    start = int(start)
+    end = min(int(end), size - 1) if end else size - 1
+    if start >= size or start > end:
+        raise ValueError("Unsatisfiable range")
+    return start, end
+
+
+def _iter_file_range(path: str, start: int, end: int, chunk_size: int = 64 * 1024) -> Iterator[bytes]:
+    with open(path, "rb") as f:
+        f.seek(start)
+        remaining = end - start + 1
+        while remaining > 0:
+            chunk = f.read(min(chunk_size, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+
+def _iter_file(path: str, chunk_size: int = 64 * 1024) -> Iterator[bytes]:
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            yield chunk
+
+
+def _remove_file(path: str) -> None:
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def _content_disposition(filename: str) -> str:
+    return f"attachment; filename*=utf-8''{quote(filename)}"
+
+
+def file_download(
+    request: Request,
+    path: str,
+    filename: str,
+    media_type: Optional[str],
+    etag: str,
+) -> Response:
+    """
+    Отдает файл с сильным ETag, ответом 304 и поддержкой Range.
+
+    Если задан X_ACCEL_REDIRECT_PREFIX, байты отдает nginx из внутренней
+    location, а воркер приложения только проверяет права и заголовки.
+    """
+    headers = {"ETag": etag, "Cache-Control": CACHE_CONTROL}
+    if etag_matches(request, etag):
+        return Response(status_code=304, headers=headers)
+
+    if settings.X_ACCEL_REDIRECT_PREFIX:
+        relative = os.path.relpath(path, settings.UPLOAD_DIR).replace(os.sep, "/")
+        headers["X-Accel-Redirect"] = settings.X_ACCEL_REDIRECT_PREFIX.rstrip("/") + "/" + quote(relative)
+        headers["Content-Disposition"] = _content_disposition(filename)
+        return Response(media_type=media_type, headers=headers)
+
+    headers["Accept-Ranges"] = "bytes"
+    range_header = request.headers.get("range")
+    if_range = request.headers.get("if-range")
+    if range_header and (not if_range or if_range.strip() == etag):
+        size = os.path.getsize(path)
+        try:
+            byte_range = parse_range(range_header, size)
+        except ValueError:
+            headers["Content-Range"] = f"bytes */{size}"
+            return Response(status_code=416, headers=headers)
+        if byte_range is not None:
+            start, end = byte_range
+            headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+            headers["Content-Length"] = str(end - start + 1)
+            headers["Content-Disposition"] = _content_disposition(filename)
+            return StreamingResponse(
+                _iter_file_range(path, start, end), status_code=206, media_type=media_type, headers=headers
+            )
+
+    return FileResponse(path, filename=filename, media_type=media_type, headers=headers)
+
+
+def spooled_download(
+    result: Union[bytes, str],
+    filename: str,
+    media_type: Optional[str],
+    etag: str,
+) -> Response:
+    """
+    Отдает результат render_spooled: байты из памяти или временный файл,
+    который удаляется после отправки.
+    """
+    headers = {
+        "ETag": etag,
+        "Cache-Control": CACHE_CONTROL,
+        "Content-Disposition": _content_disposition(filename),
+    }
+    if isinstance(result, bytes):
+        return Response(content=result, media_type=media_type, headers=headers)
+
+    headers["Content-Length"] = str(os.path.getsize(result))
+    # Фоновая задача выполняется и при обрыве соединения, в отличие от finally генератора
+    return StreamingResponse(
+        _iter_file(result), media_type=media_type, headers=headers,
+        background=BackgroundTask(_remove_file, result),
+    )
@@ -0,0 +1,43 @@
+import threading
+from typing import Any, Dict, List
+
+# Границы корзин гистограммы, в миллисекундах
+LATENCY_BUCKETS_MS = [1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000]
+
+
+class LatencyHistogram:
+    """
+    Потокобезопасная гистограмма длительностей операций.
+    """
+
+    def __init__(self, buckets_ms: List[float] = LATENCY_BUCKETS_MS):
+        self.buckets_ms = list(buckets_ms)
+        self._counts = [0] * (len(self.buckets_ms) + 1)
+        self._count = 0
+        self._sum = 0.0
+        self._max = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, seconds: float) -> None:
+        ms = seconds * 1000
+        index = len(self.buckets_ms)
+        for i, bound in enumerate(self.buckets_ms):
+            if ms <= bound:
+                index = i
+                break
+        with self._lock:
+            self._counts[index] += 1
+            self._count += 1
+            self._sum += ms
+            self._max = max(self._max, ms)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            buckets = {f"le_{bound}ms": count for bound, count in zip(self.buckets_ms, self._counts)}
+            buckets["inf"] = self._counts[-1]
+            return {
+                "count": self._count,
+                "avg_ms": round(self._sum / self._count, 3) if self._count else 0.0,
+                "max_ms": round(self._max, 3),
+                "buckets": buckets,
+            }
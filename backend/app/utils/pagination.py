@@ -0,0 +1,20 @@
+import base64
+from datetime import datetime
+from typing import Tuple
+
+
+def encode_cursor(created_at: datetime, id: int) -> str:
+    """
+    Непрозрачный курсор на позицию (created_at, id) последней записи страницы.
+    """
+    raw = f"{created_at.isoformat()}|{id}"
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_at, id = base64.urlsafe_b64decode(padded.encode("ascii")).decode("utf-8").split("|")
+        return datetime.fromisoformat(created_at), int(id)
+    except (ValueError, UnicodeError):
+        raise ValueError("Invalid cursor")
@@ -0,0 +1,69 @@
+import asyncio
+import random
+import threading
+import time
+from typing import Hashable, Optional
+
+from app.utils.cache import LRUCache
+
+
+class TokenBucket:
+    """
+    Корзина токенов: rate токенов в секунду, не больше capacity про запас.
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def try_acquire(self, tokens: float = 1.0) -> float:
+        """
+        Забирает токены, если они есть. Иначе возвращает, сколько секунд ждать.
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            if self._tokens >= tokens:
+                self._tokens -= tokens
+                return 0.0
+            return (tokens - self._tokens) / self.rate
+
+    async def acquire(self, tokens: float = 1.0) -> None:
+        while True:
+            wait = self.try_acquire(tokens)
+            if wait <= 0:
+                return
+            await asyncio.sleep(wait)
+
+
+class TokenBucketRegistry:
+    """
+    Отдельная корзина на каждый ключ (например, на пользователя).
+    """
+
+    def __init__(self, rate: float, capacity: float, maxsize: int = 1024):
+        self.rate = rate
+        self.capacity = capacity
+        self._buckets = LRUCache(maxsize=maxsize)
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> TokenBucket:
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = TokenBucket(self.rate, self.capacity)
+                self._buckets.set(key, bucket)
+            return bucket
+
+
+def backoff_delay(attempt: int, base: float, cap: float, retry_after: Optional[float] = None) -> float:
+    """
+    Экспоненциальная задержка с полным джиттером; Retry-After сервера имеет приоритет.
+    """
+    if retry_after is not None:
+        return min(cap, retry_after)
+    return random.uniform(0, min(cap, base * 2 ** attempt))
@@ -0,0 +1,317 @@
+import hashlib
+import io
+import os
+import re
+import uuid
+import zipfile
+from dataclasses import dataclass
+from typing import Dict, IO, List, Optional, Tuple, Union
+
+from app.core.config import settings
+from app.utils import docx_xml
+from app.utils.cache import LRUCache
+from app.utils.encoding import detect_encoding
+from app.utils.zip_stream import RawZipWriter
+
+VARIABLE_PATTERN = re.compile(r'##([^#]+)##')
+FIXED_ZIP_DATE = (1980, 1, 1, 0, 0, 0)
+
+
+@dataclass(frozen=True)
+class RenderSlot:
+    """
+    Параграф шаблона, содержащий переменные.
+
+    part - часть пакета (word/document.xml, колонтитул, сноски),
+    paragraph_index - позиция параграфа в порядке обхода w:p этой части
+    (включая таблицы и надписи). split=True означает, что хотя бы один
+    плейсхолдер разбит между несколькими runs.
+    """
+    part: str
+    paragraph_index: int
+    variables: Tuple[str, ...]
+    split: bool
+
+
+@dataclass(frozen=True)
+class RenderPlan:
+    """
+    Скомпилированный план рендеринга DOCX-шаблона.
+    """
+    content_hash: str
+    slots: Tuple[RenderSlot, ...]
+    variables: Tuple[str, ...]
+
+
+# Кэш планов по хэшу содержимого файла
+_plan_cache = LRUCache(maxsize=settings.RENDER_PLAN_CACHE_SIZE)
+# Кэш хэшей по (путь, размер, mtime), чтобы не перечитывать файл на каждый запрос
+_hash_cache = LRUCache(maxsize=settings.RENDER_PLAN_CACHE_SIZE * 4)
+# Кэш содержимого шаблонов по хэшу: рендеринг не читает файл с диска
+_template_cache = LRUCache(maxsize=settings.TEMPLATE_BUFFER_CACHE_SIZE)
+
+
+def file_content_hash(file_path: str) -> str:
+    """
+    Возвращает SHA-256 содержимого файла.
+    """
+    stat = os.stat(file_path)
+    key = (os.path.abspath(file_path), stat.st_size, stat.st_mtime_ns)
+    content_hash = _hash_cache.get(key)
+    if content_hash is None:
+        digest = hashlib.sha256()
+        with open(file_path, "rb") as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(chunk)
+        content_hash = digest.hexdigest()
+        _hash_cache.set(key, content_hash)
+    return content_hash
+
+
+def load_template_bytes(file_path: str, content_hash: Optional[str] = None) -> bytes:
+    """
+    Возвращает содержимое шаблона из кэша, читая файл только при промахе.
+
+    Объекты хранилища неизменяемы, поэтому ключом служит хэш содержимого.
+    """
+    if content_hash is None:
+        content_hash = file_content_hash(file_path)
+    data = _template_cache.get(content_hash)
+    if data is None:
+        with open(file_path, "rb") as f:
+            data = f.read()
+        if len(data) <= settings.TEMPLATE_BUFFER_MAX_BYTES:
+            _template_cache.set(content_hash, data)
+    return data
+
+
+def open_template(file_path: str, content_hash: Optional[str] = None) -> IO[bytes]:
+    """
+    Открывает шаблон для чтения архива.
+
+    Шаблон до TEMPLATE_BUFFER_MAX_BYTES берется из кэша содержимого; больший
+    читается прямо с диска, не загружаясь в память целиком.
+    """
+    if content_hash is None:
+        content_hash = file_content_hash(file_path)
+    data = _template_cache.get(content_hash)
+    if data is None and os.path.getsize(file_path) <= settings.TEMPLATE_BUFFER_MAX_BYTES:
+        data = load_template_bytes(file_path, content_hash)
+    if data is None:
+        return open(file_path, "rb")
+    return io.BytesIO(data)
+
+
+def normalize_zip(data: bytes) -> bytes:
+    """
+    Переписывает ZIP-архив с фиксированной датой у всех членов.
+    """
+    output = io.BytesIO()
+    _write_rendered_zip(io.BytesIO(data), {}, {}, output)
+    return output.getvalue()
+
+
+def compile_render_plan(file_path: str, content_hash: Optional[str] = None) -> RenderPlan:
+    """
+    Один раз обходит XML всех частей документа и запоминает, где находятся
+    плейсхолдеры ##var##.
+    """
+    if content_hash is None:
+        content_hash = file_content_hash(file_path)
+
+    slots = []
+    with open_template(file_path, content_hash) as source, zipfile.ZipFile(source) as archive:
+        for part in docx_xml.story_parts(archive):
+            root = docx_xml.parse_part(archive.read(part))
+            for index, paragraph in enumerate(docx_xml.iter_paragraphs(root)):
+                matches, split = docx_xml.find_placeholders(paragraph, VARIABLE_PATTERN)
+                if matches:
+                    variables = tuple(dict.fromkeys(match.group(1) for match in matches))
+                    slots.append(RenderSlot(part=part, paragraph_index=index, variables=variables, split=split))
+
+    variables = tuple(dict.fromkeys(v for slot in slots for v in slot.variables))
+    return RenderPlan(content_hash=content_hash, slots=tuple(slots), variables=variables)
+
+
+def get_render_plan(file_path: str, content_hash: Optional[str] = None) -> RenderPlan:
+    """
+    Возвращает план из LRU-кэша, компилируя его при промахе.
+    """
+    if content_hash is None:
+        content_hash = file_content_hash(file_path)
+    plan = _plan_cache.get(content_hash)
+    if plan is None:
+        plan = compile_render_plan(file_path, content_hash=content_hash)
+        _plan_cache.set(content_hash, plan)
+    return plan
+
+
+def replace_variables(text: str, values: Dict[str, str]) -> str:
+    """
+    Подставляет значения в плейсхолдеры; неизвестные переменные остаются как есть.
+    """
+    return VARIABLE_PATTERN.sub(lambda m: values.get(m.group(1), m.group(0)), text)
+
+
+def _render_part(data: bytes, slots: List[RenderSlot], values: Dict[str, str]) -> bytes:
+    root = docx_xml.parse_part(data)
+    paragraphs = list(docx_xml.iter_paragraphs(root))
+
+    def replacement(match):
+        return values.get(match.group(1), match.group(0))
+
+    for slot in slots:
+        docx_xml.replace_in_paragraph(paragraphs[slot.paragraph_index], VARIABLE_PATTERN, replacement)
+    return docx_xml.serialize_part(root)
+
+
+def _write_rendered_zip(
+    source_file: IO[bytes],
+    parts: Dict[str, List[RenderSlot]],
+    values: Dict[str, str],
+    output: IO[bytes],
+) -> None:
+    target = RawZipWriter(output)
+    with zipfile.ZipFile(source_file) as source:
+        for info in source.infolist():
+            if info.filename in parts:
+                content = _render_part(source.read(info), parts[info.filename], values)
+                target.write(info.filename, content, info.compress_type, FIXED_ZIP_DATE, info.external_attr)
+            else:
+                # Картинки, шрифты и стили копируются сжатыми, без распаковки
+                target.copy_from(source_file, info, FIXED_ZIP_DATE)
+    target.close()
+
+
+def render_docx(
+    file_path: str,
+    values: Dict[str, str],
+    output: Union[str, IO[bytes]],
+    plan: Optional[RenderPlan] = None,
+    content_hash: Optional[str] = None,
+) -> None:
+    """
+    Рендерит DOCX-шаблон по плану прямо в XML частей пакета.
+
+    Разбираются только части с нужными переменными и только параграфы из
+    плана; остальные члены архива копируются как есть. values должен
+    содержать только те переменные, которые нужно заменить.
+    """
+    if content_hash is None:
+        content_hash = file_content_hash(file_path)
+    if plan is None:
+        plan = get_render_plan(file_path, content_hash=content_hash)
+
+    parts: Dict[str, List[RenderSlot]] = {}
+    for slot in plan.slots:
+        if any(name in values for name in slot.variables):
+            parts.setdefault(slot.part, []).append(slot)
+
+    # Фиксированные метки времени: одинаковый ввод дает побайтно одинаковый файл
+    with open_template(file_path, content_hash) as source:
+        if isinstance(output, str):
+            with open(output, "wb") as f:
+                _write_rendered_zip(source, parts, values, f)
+        else:
+            _write_rendered_zip(source, parts, values, output)
+
+
+def render_docx_bytes(file_path: str, values: Dict[str, str], content_hash: Optional[str] = None) -> bytes:
+    """
+    Рендерит DOCX-шаблон в память и возвращает содержимое файла.
+    """
+    output = io.BytesIO()
+    render_docx(file_path, values, output, content_hash=content_hash)
+    return output.getvalue()
+
+
+def render_text_bytes(
+    file_path: str,
+    values: Dict[str, str],
+    encoding: Optional[str] = None,
+    content_hash: Optional[str] = None,
+) -> bytes:
+    """
+    Подставляет значения в текстовый шаблон; результат всегда в UTF-8.
+    """
+    data = load_template_bytes(file_path, content_hash)
+    if encoding:
+        content = data.decode(encoding)
+    else:
+        # Шаблон загружен до сохранения кодировки - подбираем ее по байтам
+        content = data.decode(detect_encoding(data) or 'utf-8', errors='replace')
+    return replace_variables(content, values).encode('utf-8')
+
+
+def render_text(
+    file_path: str,
+    values: Dict[str, str],
+    output_path: str,
+    encoding: Optional[str] = None,
+    content_hash: Optional[str] = None,
+) -> None:
+    with open(output_path, 'wb') as f:
+        f.write(render_text_bytes(file_path, values, encoding, content_hash))
+
+
+class _SpoolOutput:
+    """
+    Приемник результата: до max_size байт копит их в памяти, при превышении
+    переносит накопленное во временный файл в spool_dir и дописывает туда.
+    """
+
+    def __init__(self, max_size: int, spool_dir: str):
+        self._max_size = max_size
+        self._spool_dir = spool_dir
+        self._buffer: Optional[io.BytesIO] = io.BytesIO()
+        self._file: Optional[IO[bytes]] = None
+        self.path: Optional[str] = None
+
+    def write(self, data) -> int:
+        if self._file is None and self._buffer.tell() + len(data) > self._max_size:
+            os.makedirs(self._spool_dir, exist_ok=True)
+            self.path = os.path.join(self._spool_dir, uuid.uuid4().hex)
+            self._file = open(self.path, "wb")
+            self._file.write(self._buffer.getbuffer())
+            self._buffer = None
+        if self._file is not None:
+            return self._file.write(data)
+        return self._buffer.write(data)
+
+    def result(self) -> Union[bytes, str]:
+        if self._file is None:
+            return self._buffer.getvalue()
+        self._file.close()
+        return self.path
+
+    def discard(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            os.remove(self.path)
+
+
+def render_spooled(
+    file_path: str,
+    values: Dict[str, str],
+    spool_dir: str,
+    content_hash: Optional[str] = None,
+    encoding: Optional[str] = None,
+) -> Union[bytes, str]:
+    """
+    Рендерит документ без промежуточных файлов.
+
+    Результат до GENERATE_SPOOL_MAX_SIZE возвращается байтами; больший
+    пишется во временный файл в spool_dir по мере рендеринга и возвращается
+    его путь, так что в памяти одновременно не больше GENERATE_SPOOL_MAX_SIZE
+    байт результата.
+    """
+    output = _SpoolOutput(settings.GENERATE_SPOOL_MAX_SIZE, spool_dir)
+    try:
+        if file_path.endswith('.docx'):
+            render_docx(file_path, values, output, content_hash=content_hash)
+        else:
+            output.write(render_text_bytes(file_path, values, encoding, content_hash))
+    except BaseException:
+        output.discard()
+        raise
+    return output.result()
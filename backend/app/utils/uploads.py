@@ -0,0 +1,59 @@
+import hashlib
+import os
+from dataclasses import dataclass
+from typing import Optional
+
+from fastapi import HTTPException, UploadFile
+
+from app.core.config import settings
+
+
+class UploadTooLarge(HTTPException):
+    def __init__(self, max_size: int):
+        super().__init__(
+            status_code=413,
+            detail=f"File is too large, maximum size is {max_size} bytes",
+        )
+
+
+@dataclass(frozen=True)
+class StoredUpload:
+    file_path: str
+    content_hash: str
+    size: int
+
+
+async def save_upload(
+    file: UploadFile,
+    file_path: str,
+    max_size: Optional[int] = None,
+    chunk_size: Optional[int] = None,
+) -> StoredUpload:
+    """
+    Сохраняет загруженный файл на диск блоками фиксированного размера.
+
+    SHA-256 и размер считаются на лету; при превышении max_size запись
+    прерывается, а частично записанный файл удаляется.
+    """
+    max_size = settings.MAX_UPLOAD_SIZE if max_size is None else max_size
+    chunk_size = chunk_size or settings.UPLOAD_CHUNK_SIZE
+
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        with open(file_path, "wb") as buffer:
+            while True:
+                chunk = await file.read(chunk_size)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if max_size and size > max_size:
+                    raise UploadTooLarge(max_size)
+                digest.update(chunk)
+                buffer.write(chunk)
+    except BaseException:
+        if os.path.exists(file_path):
+            os.remove(file_path)
+        raise
+
+    return StoredUpload(file_path=file_path, content_hash=digest.hexdigest(), size=size)
@@ -0,0 +1,205 @@
+import io
+import struct
+import zipfile
+import zlib
+from typing import IO, AsyncIterable, AsyncIterator, Iterable, Iterator, List, Tuple, Union
+
+# Форматы заголовков ZIP (APPNOTE.TXT, разделы 4.3.7, 4.3.12, 4.3.16)
+LOCAL_HEADER = struct.Struct("<4s2B4HL2L2H")
+CENTRAL_HEADER = struct.Struct("<4s4B4HL2L5H2L")
+END_OF_CENTRAL_DIR = struct.Struct("<4s4H2LH")
+ZIP32_LIMIT = 0xFFFFFFFF
+FLAG_DATA_DESCRIPTOR = 0x08
+FLAG_UTF8 = 0x800
+
+
+class _StreamBuffer(io.RawIOBase):
+    """
+    Несекабельный приемник для zipfile: копит записанные байты до выгрузки.
+    """
+
+    def __init__(self):
+        self._chunks = []
+        self._position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def iter_zip(members: Iterable[Tuple[str, bytes]], compression: int = zipfile.ZIP_STORED) -> Iterator[bytes]:
+    """
+    Собирает ZIP-архив на лету и отдает его по частям.
+
+    В памяти держится только текущий файл: каждый член архива выгружается
+    сразу после записи, центральный каталог - в самом конце.
+    """
+    buffer = _StreamBuffer()
+    with zipfile.ZipFile(buffer, mode="w", compression=compression) as archive:
+        for name, data in members:
+            archive.writestr(name, data)
+            chunk = buffer.drain()
+            if chunk:
+                yield chunk
+    tail = buffer.drain()
+    if tail:
+        yield tail
+
+
+async def aiter_zip(
+    members: AsyncIterable[Tuple[str, bytes]], compression: int = zipfile.ZIP_STORED
+) -> AsyncIterator[bytes]:
+    """
+    То же, что iter_zip, для асинхронного источника членов архива.
+    """
+    buffer = _StreamBuffer()
+    with zipfile.ZipFile(buffer, mode="w", compression=compression) as archive:
+        async for name, data in members:
+            archive.writestr(name, data)
+            chunk = buffer.drain()
+            if chunk:
+                yield chunk
+    tail = buffer.drain()
+    if tail:
+        yield tail
+
+
+def raw_member(data: Union[bytes, memoryview], info: zipfile.ZipInfo) -> memoryview:
+    """
+    Сжатые байты члена архива без распаковки.
+    """
+    view = memoryview(data)
+    header = LOCAL_HEADER.unpack_from(view, info.header_offset)
+    name_length, extra_length = header[-2], header[-1]
+    start = info.header_offset + LOCAL_HEADER.size + name_length + extra_length
+    return view[start:start + info.compress_size]
+
+
+def read_raw_member(source: IO[bytes], info: zipfile.ZipInfo) -> bytes:
+    """
+    То же, что raw_member, для архива в открытом файле.
+    """
+    source.seek(info.header_offset)
+    header = LOCAL_HEADER.unpack(source.read(LOCAL_HEADER.size))
+    source.seek(header[-2] + header[-1], io.SEEK_CUR)
+    return source.read(info.compress_size)
+
+
+class RawZipWriter:
+    """
+    Минимальный писатель ZIP, умеющий копировать уже сжатые члены другого
+    архива байт в байт, без распаковки и повторного сжатия.
+
+    ZIP64 не поддерживается: шаблоны ограничены размером загрузки.
+    """
+
+    def __init__(self, output: IO[bytes]):
+        self._output = output
+        self._offset = 0
+        # Поля записей центрального каталога в порядке CENTRAL_HEADER
+        self._entries: List[Tuple[bytes, Tuple[int, ...]]] = []
+
+    @staticmethod
+    def _dos_time(date_time: Tuple[int, ...]) -> Tuple[int, int]:
+        year, month, day, hour, minute, second = date_time[:6]
+        return (hour << 11) | (minute << 5) | (second // 2), ((year - 1980) << 9) | (month << 5) | day
+
+    def _emit(self, chunk) -> None:
+        self._output.write(chunk)
+        self._offset += len(chunk)
+
+    def write_raw(
+        self,
+        name: str,
+        compressed,
+        compress_type: int,
+        crc: int,
+        file_size: int,
+        date_time: Tuple[int, ...],
+        external_attr: int = 0,
+    ) -> None:
+        """
+        Записывает член архива из уже сжатых байт.
+        """
+        if self._offset > ZIP32_LIMIT or len(compressed) > ZIP32_LIMIT or file_size > ZIP32_LIMIT:
+            raise ValueError("ZIP64 archives are not supported")
+
+        encoded_name = name.encode("utf-8")
+        flags = 0 if name.isascii() else FLAG_UTF8
+        dos_time, dos_date = self._dos_time(date_time)
+        header_offset = self._offset
+        self._emit(LOCAL_HEADER.pack(
+            b"PK\x03\x04", 20, 0, flags, compress_type, dos_time, dos_date,
+            crc, len(compressed), file_size, len(encoded_name), 0,
+        ))
+        self._emit(encoded_name)
+        self._emit(compressed)
+        self._entries.append((encoded_name, (
+            flags, compress_type, dos_time, dos_date, crc, len(compressed), file_size,
+            len(encoded_name), 0, 0, 0, 0, external_attr, header_offset,
+        )))
+
+    def write(
+        self,
+        name: str,
+        data: bytes,
+        compress_type: int = zipfile.ZIP_DEFLATED,
+        date_time: Tuple[int, ...] = (1980, 1, 1, 0, 0, 0),
+        external_attr: int = 0,
+    ) -> None:
+        """
+        Сжимает и записывает член архива.
+        """
+        if compress_type == zipfile.ZIP_STORED:
+            compressed = data
+        else:
+            compress_type = zipfile.ZIP_DEFLATED
+            compressor = zlib.compressobj(zlib.Z_DEFAULT_COMPRESSION, zlib.DEFLATED, -15)
+            compressed = compressor.compress(data) + compressor.flush()
+        self.write_raw(name, compressed, compress_type, zlib.crc32(data), len(data), date_time, external_attr)
+
+    def copy_from(
+        self, source: Union[bytes, memoryview, IO[bytes]], info: zipfile.ZipInfo, date_time: Tuple[int, ...]
+    ) -> None:
+        """
+        Копирует член исходного архива (его байты или открытый файл) без повторного сжатия.
+        """
+        if info.flag_bits & 0x01:
+            raise ValueError(f"Encrypted archive member: {info.filename}")
+        if isinstance(source, (bytes, memoryview)):
+            compressed = raw_member(source, info)
+        else:
+            compressed = read_raw_member(source, info)
+        self.write_raw(
+            info.filename, compressed, info.compress_type, info.CRC, info.file_size,
+            date_time, info.external_attr,
+        )
+
+    def close(self) -> None:
+        """
+        Дописывает центральный каталог.
+        """
+        if len(self._entries) >= 0xFFFF:
+            raise ValueError("ZIP64 archives are not supported")
+        directory_offset = self._offset
+        for name, fields in self._entries:
+            self._emit(CENTRAL_HEADER.pack(b"PK\x01\x02", 20, 3, 20, 0, *fields))
+            self._emit(name)
+        directory_size = self._offset - directory_offset
+        if directory_offset > ZIP32_LIMIT:
+            raise ValueError("ZIP64 archives are not supported")
+        self._emit(END_OF_CENTRAL_DIR.pack(
+            b"PK\x05\x06", 0, 0, len(self._entries), len(self._entries), directory_size, directory_offset, 0,
+        ))